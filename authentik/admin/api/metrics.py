@@ -1,13 +1,12 @@
 """authentik administration metrics"""
 import time
-from collections import Counter
 from datetime import timedelta
 
-from django.db.models import Count, ExpressionWrapper, F
-from django.db.models.fields import DurationField
-from django.db.models.functions import ExtractHour
+from django.db.models import Sum
 from django.utils.timezone import now
-from drf_spectacular.utils import extend_schema, extend_schema_field
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_field
+from rest_framework.exceptions import ValidationError
 from rest_framework.fields import IntegerField, SerializerMethodField
 from rest_framework.permissions import IsAdminUser
 from rest_framework.request import Request
@@ -15,31 +14,46 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from authentik.core.api.utils import PassiveSerializer
-from authentik.events.models import Event, EventAction
-
-
-def get_events_per_1h(**filter_kwargs) -> list[dict[str, int]]:
-    """Get event count by hour in the last day, fill with zeros"""
-    date_from = now() - timedelta(days=1)
+from authentik.events.models import EventAction, EventRollup
+from authentik.events.rollups import ROLLUP_WINDOWS
+
+METRICS_DAYS_PARAMETER = OpenApiParameter(
+    name="days",
+    location=OpenApiParameter.QUERY,
+    type=OpenApiTypes.INT,
+    enum=ROLLUP_WINDOWS,
+    description="Amount of days to return metrics for, defaults to 1",
+)
+
+
+def get_metrics_days(request: Request) -> int:
+    """Get the metrics window from the `days` query parameter"""
+    days = request.query_params.get("days", "1")
+    if not days.isdigit() or int(days) not in ROLLUP_WINDOWS:
+        raise ValidationError({"days": f"Must be one of {ROLLUP_WINDOWS}"})
+    return int(days)
+
+
+def get_events_per_1h(days: int = 1, **filter_kwargs) -> list[dict[str, int]]:
+    """Get event count by hour in the last `days` days from the hourly rollups,
+    fill with zeros. `filter_kwargs` are applied to the rollups."""
+    current_hour = now().replace(minute=0, second=0, microsecond=0)
+    hours = days * 24
     result = (
-        Event.objects.filter(created__gte=date_from, **filter_kwargs)
-        .annotate(
-            age=ExpressionWrapper(now() - F("created"), output_field=DurationField())
+        EventRollup.objects.filter(
+            hour__gt=current_hour - timedelta(hours=hours), **filter_kwargs
         )
-        .annotate(age_hours=ExtractHour("age"))
-        .values("age_hours")
-        .annotate(count=Count("pk"))
-        .order_by("age_hours")
+        .values("hour")
+        .annotate(total=Sum("count"))
     )
-    data = Counter({int(d["age_hours"]): d["count"] for d in result})
+    data = {row["hour"]: row["total"] for row in result}
     results = []
-    _now = now()
-    for hour in range(0, -24, -1):
+    for hour in range(0, -hours, -1):
+        bucket = current_hour + timedelta(hours=hour)
         results.append(
             {
-                "x_cord": time.mktime((_now + timedelta(hours=hour)).timetuple())
-                * 1000,
-                "y_cord": data[hour * -1],
+                "x_cord": time.mktime(bucket.timetuple()) * 1000,
+                "y_cord": data.get(bucket, 0),
             }
         )
     return results
@@ -61,12 +75,14 @@ class LoginMetricsSerializer(PassiveSerializer):
     @extend_schema_field(CoordinateSerializer(many=True))
     def get_logins_per_1h(self, _):
         """Get successful logins per hour for the last 24 hours"""
-        return get_events_per_1h(action=EventAction.LOGIN)
+        return get_events_per_1h(self.context.get("days", 1), action=EventAction.LOGIN)
 
     @extend_schema_field(CoordinateSerializer(many=True))
     def get_logins_failed_per_1h(self, _):
         """Get failed logins per hour for the last 24 hours"""
-        return get_events_per_1h(action=EventAction.LOGIN_FAILED)
+        return get_events_per_1h(
+            self.context.get("days", 1), action=EventAction.LOGIN_FAILED
+        )
 
 
 class AdministrationMetricsViewSet(APIView):
@@ -74,8 +90,12 @@ class AdministrationMetricsViewSet(APIView):
 
     permission_classes = [IsAdminUser]
 
-    @extend_schema(responses={200: LoginMetricsSerializer(many=False)})
+    @extend_schema(
+        responses={200: LoginMetricsSerializer(many=False)},
+        parameters=[METRICS_DAYS_PARAMETER],
+    )
     def get(self, request: Request) -> Response:
         """Login Metrics per 1h"""
         serializer = LoginMetricsSerializer(True)
+        serializer.context["days"] = get_metrics_days(request)
         return Response(serializer.data)
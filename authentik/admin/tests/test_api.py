@@ -7,6 +7,7 @@ from django.urls import reverse
 from authentik import __version__
 from authentik.core.models import Group, User
 from authentik.core.tasks import clean_expired_models
+from authentik.events.models import Event, EventAction
 from authentik.events.monitored_tasks import TaskResultStatus
 
 
@@ -88,8 +89,24 @@ class TestAdminAPI(TestCase):
 
     def test_metrics(self):
         """Test metrics API"""
+        Event.new(EventAction.LOGIN).set_user(self.user).save()
+        Event.new(EventAction.LOGIN).set_user(self.user).save()
         response = self.client.get(reverse("authentik_api:admin_metrics"))
         self.assertEqual(response.status_code, 200)
+        body = loads(response.content)
+        self.assertEqual(len(body["logins_per_1h"]), 24)
+        self.assertEqual(
+            body["logins_per_1h"][0]["y_cord"],
+            Event.objects.filter(action=EventAction.LOGIN).count(),
+        )
+        response = self.client.get(
+            reverse("authentik_api:admin_metrics"), data={"days": 7}
+        )
+        self.assertEqual(len(loads(response.content)["logins_failed_per_1h"]), 168)
+        response = self.client.get(
+            reverse("authentik_api:admin_metrics"), data={"days": 2}
+        )
+        self.assertEqual(response.status_code, 400)
 
     def test_apps(self):
         """Test apps API"""
@@ -22,20 +22,28 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework_guardian.filters import ObjectPermissionsFilter
 from structlog.stdlib import get_logger
 
-from authentik.admin.api.metrics import CoordinateSerializer, get_events_per_1h
+from authentik.admin.api.metrics import (
+    METRICS_DAYS_PARAMETER,
+    CoordinateSerializer,
+    get_events_per_1h,
+    get_metrics_days,
+)
 from authentik.api.decorators import permission_required
 from authentik.core.api.providers import ProviderSerializer
 from authentik.core.models import Application
 from authentik.events.models import EventAction
-from authentik.policies.engine import PolicyEngine
+from authentik.lib.utils.cache import get_version
+from authentik.policies.batch import BatchPolicyEngine
 from authentik.stages.user_login.stage import USER_LOGIN_AUTHENTICATED
 
 LOGGER = get_logger()
+# Cache version of all users' application lists
+CACHE_VERSION_USER_APPS = "user_app_cache"
 
 
 def user_app_cache_key(user_pk: str) -> str:
     """Cache key where application list for user is saved"""
-    return f"user_app_cache_{user_pk}"
+    return f"user_app_cache_{get_version(CACHE_VERSION_USER_APPS)}_{user_pk}"
 
 
 class ApplicationSerializer(ModelSerializer):
@@ -103,13 +111,12 @@ class ApplicationViewSet(ModelViewSet):
         return queryset
 
     def _get_allowed_applications(self, queryset: QuerySet) -> list[Application]:
-        applications = []
-        for application in queryset:
-            engine = PolicyEngine(application, self.request.user, self.request)
-            engine.build()
-            if engine.passing:
-                applications.append(application)
-        return applications
+        applications = list(queryset)
+        engine = BatchPolicyEngine(applications, self.request.user, self.request)
+        engine.build()
+        return [
+            application for application in applications if engine.passing(application)
+        ]
 
     @extend_schema(
         responses={
@@ -124,9 +131,9 @@ class ApplicationViewSet(ModelViewSet):
         # Don't use self.get_object as that checks for view_application permission
         # which the user might not have, even if they have access
         application = get_object_or_404(Application, slug=slug)
-        engine = PolicyEngine(application, self.request.user, self.request)
+        engine = BatchPolicyEngine([application], self.request.user, self.request)
         engine.build()
-        if engine.passing:
+        if engine.passing(application):
             return Response(status=204)
         return Response(status=403)
 
@@ -159,11 +166,12 @@ class ApplicationViewSet(ModelViewSet):
             allowed_applications = self._get_allowed_applications(queryset)
         if should_cache:
             LOGGER.debug("Caching allowed application list")
-            allowed_applications = cache.get(user_app_cache_key(self.request.user.pk))
+            key = user_app_cache_key(self.request.user.pk)
+            allowed_applications = cache.get(key)
             if not allowed_applications:
                 allowed_applications = self._get_allowed_applications(queryset)
                 cache.set(
-                    user_app_cache_key(self.request.user.pk),
+                    key,
                     allowed_applications,
                     timeout=86400,
                 )
@@ -228,7 +236,10 @@ class ApplicationViewSet(ModelViewSet):
     @permission_required(
         "authentik_core.view_application", ["authentik_events.view_event"]
     )
-    @extend_schema(responses={200: CoordinateSerializer(many=True)})
+    @extend_schema(
+        responses={200: CoordinateSerializer(many=True)},
+        parameters=[METRICS_DAYS_PARAMETER],
+    )
     @action(detail=True, pagination_class=None, filter_backends=[])
     # pylint: disable=unused-argument
     def metrics(self, request: Request, slug: str):
@@ -236,7 +247,8 @@ class ApplicationViewSet(ModelViewSet):
         app = self.get_object()
         return Response(
             get_events_per_1h(
+                get_metrics_days(request),
                 action=EventAction.AUTHORIZE_APPLICATION,
-                context__authorized_application__pk=app.pk.hex,
+                application=app.pk.hex,
             )
         )
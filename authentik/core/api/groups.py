@@ -1,12 +1,14 @@
 """Groups API Viewset"""
 from django.db.models.query import QuerySet
+from django_filters.filters import ModelChoiceFilter
+from django_filters.filterset import FilterSet
 from rest_framework.fields import JSONField
 from rest_framework.serializers import ModelSerializer
 from rest_framework.viewsets import ModelViewSet
 from rest_framework_guardian.filters import ObjectPermissionsFilter
 
 from authentik.core.api.utils import is_dict
-from authentik.core.models import Group
+from authentik.core.models import Group, User
 
 
 class GroupSerializer(ModelSerializer):
@@ -20,13 +22,60 @@ class GroupSerializer(ModelSerializer):
         fields = ["pk", "name", "is_superuser", "parent", "users", "attributes"]
 
 
+class GroupFilter(FilterSet):
+    """Filter for groups"""
+
+    ancestors_of = ModelChoiceFilter(
+        queryset=Group.objects.all(),
+        label="Only return ancestors of this group",
+        method="filter_ancestors_of",
+    )
+    descendants_of = ModelChoiceFilter(
+        queryset=Group.objects.all(),
+        label="Only return descendants of this group",
+        method="filter_descendants_of",
+    )
+    effective_member = ModelChoiceFilter(
+        queryset=User.objects.all(),
+        label="Only return groups this user is a member of, directly or inherited",
+        method="filter_effective_member",
+    )
+
+    # pylint: disable=unused-argument
+    def filter_ancestors_of(self, queryset: QuerySet, name, value: Group) -> QuerySet:
+        """Filter for ancestors of a group, including the group itself"""
+        return queryset.filter(descendancy__descendant=value)
+
+    # pylint: disable=unused-argument
+    def filter_descendants_of(self, queryset: QuerySet, name, value: Group) -> QuerySet:
+        """Filter for descendants of a group, including the group itself"""
+        return queryset.filter(ancestry__ancestor=value)
+
+    # pylint: disable=unused-argument
+    def filter_effective_member(
+        self, queryset: QuerySet, name, value: User
+    ) -> QuerySet:
+        """Filter for groups a user is a member of, including inherited membership"""
+        return queryset.filter(descendancy__descendant__users=value).distinct()
+
+    class Meta:
+        model = Group
+        fields = [
+            "name",
+            "is_superuser",
+            "ancestors_of",
+            "descendants_of",
+            "effective_member",
+        ]
+
+
 class GroupViewSet(ModelViewSet):
     """Group Viewset"""
 
     queryset = Group.objects.all()
     serializer_class = GroupSerializer
     search_fields = ["name", "is_superuser"]
-    filterset_fields = ["name", "is_superuser"]
+    filterset_class = GroupFilter
     ordering = ["name"]
 
     def _filter_queryset_for_list(self, queryset: QuerySet) -> QuerySet:
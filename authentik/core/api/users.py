@@ -22,7 +22,12 @@ from rest_framework.serializers import (
 from rest_framework.viewsets import ModelViewSet
 from rest_framework_guardian.filters import ObjectPermissionsFilter
 
-from authentik.admin.api.metrics import CoordinateSerializer, get_events_per_1h
+from authentik.admin.api.metrics import (
+    METRICS_DAYS_PARAMETER,
+    CoordinateSerializer,
+    get_events_per_1h,
+    get_metrics_days,
+)
 from authentik.api.decorators import permission_required
 from authentik.core.api.groups import GroupSerializer
 from authentik.core.api.utils import LinkSerializer, PassiveSerializer, is_dict
@@ -81,14 +86,18 @@ class UserMetricsSerializer(PassiveSerializer):
     def get_logins_per_1h(self, _):
         """Get successful logins per hour for the last 24 hours"""
         user = self.context["user"]
-        return get_events_per_1h(action=EventAction.LOGIN, user__pk=user.pk)
+        return get_events_per_1h(
+            self.context.get("days", 1), action=EventAction.LOGIN, user_pk=user.pk
+        )
 
     @extend_schema_field(CoordinateSerializer(many=True))
     def get_logins_failed_per_1h(self, _):
         """Get failed logins per hour for the last 24 hours"""
         user = self.context["user"]
         return get_events_per_1h(
-            action=EventAction.LOGIN_FAILED, context__username=user.username
+            self.context.get("days", 1),
+            action=EventAction.LOGIN_FAILED,
+            username=user.username,
         )
 
     @extend_schema_field(CoordinateSerializer(many=True))
@@ -96,7 +105,9 @@ class UserMetricsSerializer(PassiveSerializer):
         """Get failed logins per hour for the last 24 hours"""
         user = self.context["user"]
         return get_events_per_1h(
-            action=EventAction.AUTHORIZE_APPLICATION, user__pk=user.pk
+            self.context.get("days", 1),
+            action=EventAction.AUTHORIZE_APPLICATION,
+            user_pk=user.pk,
         )
 
 
@@ -158,7 +169,10 @@ class UserViewSet(ModelViewSet):
         return Response(serializer.data)
 
     @permission_required("authentik_core.view_user", ["authentik_events.view_event"])
-    @extend_schema(responses={200: UserMetricsSerializer(many=False)})
+    @extend_schema(
+        responses={200: UserMetricsSerializer(many=False)},
+        parameters=[METRICS_DAYS_PARAMETER],
+    )
     @action(detail=True, pagination_class=None, filter_backends=[])
     # pylint: disable=invalid-name, unused-argument
     def metrics(self, request: Request, pk: int) -> Response:
@@ -166,6 +180,7 @@ class UserViewSet(ModelViewSet):
         user: User = self.get_object()
         serializer = UserMetricsSerializer(True)
         serializer.context["user"] = user
+        serializer.context["days"] = get_metrics_days(request)
         return Response(serializer.data)
 
     @permission_required("authentik_core.reset_user_password")
@@ -0,0 +1,122 @@
+"""Request-scoped authorization context of users"""
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from threading import local
+from typing import TYPE_CHECKING, Any, Iterator, Optional
+
+from django.db.models import Min
+
+if TYPE_CHECKING:
+    from authentik.core.models import Group, User
+
+LOCAL = local()
+
+
+@dataclass
+class UserAuthorization:
+    """Groups a user is a member of, loaded once per scope. Members of a group are
+    also members of all of its parent groups."""
+
+    # Direct groups and their ancestors, parents before their children
+    groups: list["Group"] = field(default_factory=list)
+    group_pks: set[Any] = field(default_factory=set)
+    direct_group_pks: set[Any] = field(default_factory=set)
+
+    @property
+    def is_superuser(self) -> bool:
+        """Check if any of the direct groups grants superuser status. Superuser status
+        is not inherited from parent groups."""
+        return any(
+            group.is_superuser
+            for group in self.groups
+            if group.pk in self.direct_group_pks
+        )
+
+    def is_member(self, **group_filters: Any) -> bool:
+        """Check if any of the groups matches `group_filters`. Filters on plain fields
+        are checked in memory, all other lookups are done with a single query."""
+        from authentik.core.models import Group
+
+        fields = {field.attname: field for field in Group._meta.concrete_fields}
+        fields["pk"] = Group._meta.pk
+        if all(key in fields for key in group_filters):
+            # Convert values like the database lookup would, e.g. UUIDs given as strings
+            values = {
+                key: fields[key].to_python(value)
+                for key, value in group_filters.items()
+            }
+            return any(
+                all(getattr(group, key) == value for key, value in values.items())
+                for group in self.groups
+            )
+        return Group.objects.filter(pk__in=self.group_pks, **group_filters).exists()
+
+    @staticmethod
+    def load(user: "User") -> "UserAuthorization":
+        """Load the direct groups of `user` and their ancestors with a single query"""
+        if not user or not user.pk:
+            return UserAuthorization()
+        # Distance to the closest group the user is a direct member of
+        groups = list(user.all_groups().annotate(distance=Min("descendancy__depth")))
+        return UserAuthorization(
+            groups,
+            {group.pk for group in groups},
+            {group.pk for group in groups if group.distance == 0},
+        )
+
+
+@dataclass
+class AuthorizationScope:
+    """Authorization contexts and user lookups shared within a scope"""
+
+    users: dict[Any, UserAuthorization] = field(default_factory=dict)
+    lookups: dict[tuple, Optional["User"]] = field(default_factory=dict)
+
+
+def get_authorization(user: "User") -> UserAuthorization:
+    """Get the authorization context of `user`, which is only loaded once within an
+    `authorization_scope`. Outside of a scope, it's loaded on every call."""
+    scope: Optional[AuthorizationScope] = getattr(LOCAL, "authorization", None)
+    if scope is None:
+        return UserAuthorization.load(user)
+    key = getattr(user, "pk", None)
+    if key not in scope.users:
+        scope.users[key] = UserAuthorization.load(user)
+    return scope.users[key]
+
+
+def get_user_by(**filters: Any) -> Optional["User"]:
+    """Get the first user matching `filters`, only querying once per scope"""
+    from authentik.core.models import User
+
+    scope: Optional[AuthorizationScope] = getattr(LOCAL, "authorization", None)
+    key = tuple(sorted(filters.items()))
+    try:
+        hash(key)
+    except TypeError:
+        scope = None
+    if scope is not None and key in scope.lookups:
+        return scope.lookups[key]
+    user = User.objects.filter(**filters).first()
+    if scope is not None:
+        scope.lookups[key] = user
+    return user
+
+
+@contextmanager
+def authorization_scope() -> Iterator[None]:
+    """Share authorization contexts until the end of the scope, e.g. a request"""
+    previous = getattr(LOCAL, "authorization", None)
+    LOCAL.authorization = previous or AuthorizationScope()
+    try:
+        yield
+    finally:
+        LOCAL.authorization = previous
+
+
+def clear_authorization_scope():
+    """Drop everything shared in the current scope, after users or groups changed"""
+    scope: Optional[AuthorizationScope] = getattr(LOCAL, "authorization", None)
+    if scope:
+        scope.users.clear()
+        scope.lookups.clear()
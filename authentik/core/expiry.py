@@ -0,0 +1,92 @@
+"""Chunked removal of expired objects"""
+from dataclasses import dataclass
+from time import monotonic, sleep, time
+from typing import Any, Optional
+
+from django.core.cache import cache
+from django.utils.timezone import now
+from structlog.stdlib import get_logger
+
+from authentik.core.models import ExpiringModel
+from authentik.lib.config import CONFIG
+
+LOGGER = get_logger()
+CACHE_KEY_EXPIRY_STATE = "goauthentik.io/core/expiry/%s"
+
+
+@dataclass
+class ExpiryProgress:
+    """Result of cleaning up one model in a single run"""
+
+    model: type[ExpiringModel]
+    deleted: int = 0
+    # False when the time budget ran out before all expired objects were deleted
+    finished: bool = True
+    skipped: bool = False
+
+    @property
+    def message(self) -> str:
+        """Progress of the model for the task result"""
+        name = self.model._meta.verbose_name_plural
+        if self.skipped:
+            return f"Skipped {name}, cleaned up recently"
+        message = f"Deleted {self.deleted} expired {name}"
+        if not self.finished:
+            message += ", continuing in the next run"
+        return message
+
+
+def get_expiry_setting(model: type[ExpiringModel], key: str, default: Any) -> float:
+    """Get `key` from the model's settings in `expiry.models`, falling back to the
+    settings for all models"""
+    model_key = f"{model._meta.app_label}_{model._meta.model_name}"
+    value = CONFIG.y(f"expiry.models.{model_key}.{key}")
+    if value is None:
+        value = CONFIG.y(f"expiry.{key}")
+    return float(default if value is None else value)
+
+
+def clean_expired(model: type[ExpiringModel]) -> ExpiryProgress:
+    """Delete expired objects of `model` in batches ordered by primary key, until all
+    are deleted or the model's time budget is used up. An unfinished cleanup is
+    resumed from the last deleted primary key in the next run, regardless of the
+    model's interval."""
+    progress = ExpiryProgress(model)
+    cache_key = CACHE_KEY_EXPIRY_STATE % model._meta.label_lower
+    state: dict[str, Any] = cache.get(cache_key, {})
+    cursor: Optional[Any] = state.get("cursor")
+    interval = get_expiry_setting(model, "interval", 0)
+    if cursor is None and time() - state.get("last_run", 0) < interval:
+        progress.skipped = True
+        return progress
+    batch_size = int(get_expiry_setting(model, "batch_size", 1000))
+    batch_sleep = get_expiry_setting(model, "batch_sleep", 0)
+    deadline = monotonic() + get_expiry_setting(model, "time_budget", 30)
+    expired = model.objects.filter(expiring=True, expires__lte=now()).order_by("pk")
+    while True:
+        batch = expired
+        if cursor is not None:
+            batch = batch.filter(pk__gt=cursor)
+        pks = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            cursor = None
+            break
+        model.objects.filter(pk__in=pks).delete()
+        progress.deleted += len(pks)
+        cursor = pks[-1]
+        if len(pks) < batch_size:
+            cursor = None
+            break
+        if monotonic() >= deadline:
+            progress.finished = False
+            break
+        if batch_sleep:
+            sleep(batch_sleep)
+    cache.set(cache_key, {"cursor": cursor, "last_run": time()}, timeout=None)
+    LOGGER.debug(
+        "Deleted expired models",
+        model=model,
+        amount=progress.deleted,
+        finished=progress.finished,
+    )
+    return progress
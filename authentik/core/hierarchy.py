@@ -0,0 +1,91 @@
+"""Maintain the closure of the group hierarchy"""
+from contextlib import contextmanager
+from threading import local
+from typing import Any, Iterable, Iterator, Optional
+
+from django.db import connection, transaction
+from structlog.stdlib import get_logger
+
+from authentik.core.models import Group, GroupAncestry
+
+LOGGER = get_logger()
+LOCAL = local()
+
+
+def rebuild_group_hierarchy(group_pks: Optional[Iterable[Any]] = None):
+    """Rebuild the ancestry of the groups `group_pks` and all groups below them,
+    or of all groups when `group_pks` is None"""
+    closure = GroupAncestry._meta.db_table
+    groups = Group._meta.db_table
+    with transaction.atomic():
+        if group_pks is None:
+            GroupAncestry.objects.all().delete()
+            start, params = "", []
+        else:
+            group_pks = set(group_pks)
+            if not group_pks:
+                return
+            group_pks.update(
+                GroupAncestry.objects.filter(ancestor__in=group_pks).values_list(
+                    "descendant_id", flat=True
+                )
+            )
+            GroupAncestry.objects.filter(descendant__in=group_pks).delete()
+            start, params = "WHERE group_uuid = ANY(%s::uuid[])", [
+                [str(pk) for pk in group_pks]
+            ]
+        with connection.cursor() as cursor:
+            # `path` stops the recursion on cycles in the hierarchy
+            cursor.execute(
+                f"""
+                WITH RECURSIVE closure(descendant_id, ancestor_id, depth, path) AS (
+                    SELECT group_uuid, group_uuid, 0, ARRAY[group_uuid]
+                    FROM {groups} {start}
+                    UNION ALL
+                    SELECT c.descendant_id, g.parent_id, c.depth + 1, c.path || g.parent_id
+                    FROM closure c
+                    INNER JOIN {groups} g ON g.group_uuid = c.ancestor_id
+                    WHERE g.parent_id IS NOT NULL AND NOT g.parent_id = ANY(c.path)
+                )
+                INSERT INTO {closure} (descendant_id, ancestor_id, depth)
+                SELECT descendant_id, ancestor_id, depth FROM closure
+                """,  # nosec
+                params,
+            )
+            LOGGER.debug("Rebuilt group hierarchy", rows=cursor.rowcount)
+
+
+def update_group_hierarchy(group: Group):
+    """Update the ancestry of `group` after it was saved, when it's new or its parent
+    has changed. Within `defer_group_hierarchy`, the update is done when it ends."""
+    deferred: Optional[set] = getattr(LOCAL, "deferred", None)
+    if deferred is not None:
+        deferred.add(group.pk)
+        return
+    current = set(
+        GroupAncestry.objects.filter(descendant=group, depth__lte=1).values_list(
+            "ancestor_id", "depth"
+        )
+    )
+    expected = {(group.pk, 0)}
+    if group.parent_id:
+        expected.add((group.parent_id, 1))
+    if current != expected:
+        rebuild_group_hierarchy([group.pk])
+
+
+@contextmanager
+def defer_group_hierarchy() -> Iterator[None]:
+    """Collect changed groups and update their ancestry once at the end, for example
+    while syncing many groups from a source"""
+    if getattr(LOCAL, "deferred", None) is not None:
+        yield
+        return
+    LOCAL.deferred = set()
+    try:
+        yield
+    finally:
+        deferred, LOCAL.deferred = LOCAL.deferred, None
+        rebuild_group_hierarchy(
+            Group.objects.filter(pk__in=deferred).values_list("pk", flat=True)
+        )
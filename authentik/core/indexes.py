@@ -0,0 +1,83 @@
+"""Indexes on attribute paths of users and groups declared in the configuration"""
+from hashlib import sha256
+from re import compile as re_compile
+
+from django.db import connection
+from django.db.models import Model
+from structlog.stdlib import get_logger
+
+from authentik.core.models import Group, User
+from authentik.lib.config import CONFIG
+
+LOGGER = get_logger()
+# Prefix of indexes managed by `apply_attribute_indexes`
+ATTRIBUTE_INDEX_PREFIX = "ak_attr_"
+ATTRIBUTE_PATH = re_compile(r"^[A-Za-z0-9_-]+(\.[A-Za-z0-9_-]+)*$")
+INDEXED_MODELS: dict[str, type[Model]] = {"users": User, "groups": Group}
+
+
+def get_attribute_paths(kind: str) -> list[str]:
+    """Attribute paths to index for `kind` (users or groups), nested keys are separated
+    by dots"""
+    paths = CONFIG.y(f"attributes.indexes.{kind}", [])
+    if isinstance(paths, str):
+        paths = paths.split(",")
+    valid = []
+    for path in paths:
+        path = path.strip()
+        if not path:
+            continue
+        if not ATTRIBUTE_PATH.match(path):
+            LOGGER.warning("Invalid attribute path, not indexing", path=path)
+            continue
+        valid.append(path)
+    return valid
+
+
+def attribute_index_name(kind: str, path: str) -> str:
+    """Name of the index for `path`, short enough for PostgreSQL"""
+    digest = sha256(path.encode()).hexdigest()[:16]
+    return f"{ATTRIBUTE_INDEX_PREFIX}{kind}_{digest}"
+
+
+def attribute_index_expression(path: str) -> str:
+    """Expression matching the SQL of `attributes__<path>` lookups"""
+    keys = path.split(".")
+    if len(keys) == 1:
+        return f"(\"attributes\" -> '{keys[0]}')"
+    return f"(\"attributes\" #> '{{{','.join(keys)}}}')"
+
+
+def apply_attribute_indexes() -> tuple[list[str], list[str]]:
+    """Create indexes for all configured attribute paths, and drop indexes for paths
+    which were removed. Returns the names of created and dropped indexes."""
+    # Indexes can only be created concurrently outside of transactions
+    concurrently = "" if connection.in_atomic_block else "CONCURRENTLY"
+    created, dropped = [], []
+    with connection.cursor() as cursor:
+        for kind, model in INDEXED_MODELS.items():
+            table = model._meta.db_table
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = %s "
+                "AND indexname LIKE %s",
+                [table, f"{ATTRIBUTE_INDEX_PREFIX}{kind}_%"],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+            expected = {
+                attribute_index_name(kind, path): path
+                for path in get_attribute_paths(kind)
+            }
+            for name, path in expected.items():
+                if name in existing:
+                    continue
+                cursor.execute(
+                    f'CREATE INDEX {concurrently} IF NOT EXISTS "{name}" '
+                    f'ON "{table}" ({attribute_index_expression(path)})'
+                )
+                LOGGER.info("Created attribute index", path=path, name=name)
+                created.append(name)
+            for name in existing - expected.keys():
+                cursor.execute(f'DROP INDEX {concurrently} IF EXISTS "{name}"')
+                LOGGER.info("Dropped attribute index", name=name)
+                dropped.append(name)
+    return created, dropped
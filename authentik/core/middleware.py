@@ -6,6 +6,8 @@ from uuid import uuid4
 
 from django.http import HttpRequest, HttpResponse
 
+from authentik.core.authorization import authorization_scope
+
 SESSION_IMPERSONATE_USER = "authentik_impersonate_user"
 SESSION_IMPERSONATE_ORIGINAL_USER = "authentik_impersonate_original_user"
 LOCAL = local()
@@ -30,6 +32,19 @@ class ImpersonateMiddleware:
         return self.get_response(request)
 
 
+class AuthorizationScopeMiddleware:
+    """Share the authorization context of users for the duration of a request"""
+
+    get_response: Callable[[HttpRequest], HttpResponse]
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with authorization_scope():
+            return self.get_response(request)
+
+
 class RequestIDMiddleware:
     """Add a unique ID to every request"""
 
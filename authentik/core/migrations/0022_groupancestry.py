@@ -0,0 +1,72 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def build_group_ancestry(apps: Apps, schema_editor: BaseDatabaseSchemaEditor):
+    Group = apps.get_model("authentik_core", "Group")
+    GroupAncestry = apps.get_model("authentik_core", "GroupAncestry")
+    groups = Group._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            WITH RECURSIVE closure(descendant_id, ancestor_id, depth, path) AS (
+                SELECT group_uuid, group_uuid, 0, ARRAY[group_uuid] FROM {groups}
+                UNION ALL
+                SELECT c.descendant_id, g.parent_id, c.depth + 1, c.path || g.parent_id
+                FROM closure c
+                INNER JOIN {groups} g ON g.group_uuid = c.ancestor_id
+                WHERE g.parent_id IS NOT NULL AND NOT g.parent_id = ANY(c.path)
+            )
+            INSERT INTO {GroupAncestry._meta.db_table} (descendant_id, ancestor_id, depth)
+            SELECT descendant_id, ancestor_id, depth FROM closure
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_core", "0021_alter_application_slug"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GroupAncestry",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("depth", models.PositiveIntegerField()),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendancy",
+                        to="authentik_core.group",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestry",
+                        to="authentik_core.group",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("descendant", "ancestor")},
+            },
+        ),
+        migrations.RunPython(build_group_ancestry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:35
+
+import django.db.models.fields.json
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are created concurrently, so users and groups can still be saved
+    atomic = False
+
+    dependencies = [
+        ("authentik_core", "0022_groupancestry"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="group",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform("ldap_uniq", "attributes"),
+                name="ak_group_attr_ldap_uniq",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="group",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform(
+                    "distinguishedName", "attributes"
+                ),
+                name="ak_group_attr_dn",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform("ldap_uniq", "attributes"),
+                name="ak_user_attr_ldap_uniq",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform(
+                    "distinguishedName", "attributes"
+                ),
+                name="ak_user_attr_dn",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("attributes__saml__isnull", False)),
+                fields=["last_login"],
+                name="ak_user_attr_saml",
+            ),
+        ),
+    ]
@@ -9,7 +9,8 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import UserManager as DjangoUserManager
 from django.db import models
-from django.db.models import Q, QuerySet
+from django.db.models import Max, Q, QuerySet
+from django.db.models.fields.json import KeyTransform
 from django.http import HttpRequest
 from django.templatetags.static import static
 from django.utils.functional import cached_property
@@ -69,6 +70,20 @@ class Group(models.Model):
     )
     attributes = models.JSONField(default=dict, blank=True)
 
+    def ancestors(self, include_self: bool = True) -> QuerySet:
+        """All groups this group inherits from, starting at the root"""
+        filters = {"descendancy__descendant": self}
+        if not include_self:
+            filters["descendancy__depth__gt"] = 0
+        return Group.objects.filter(**filters).order_by("-descendancy__depth")
+
+    def descendants(self, include_self: bool = True) -> QuerySet:
+        """All groups inheriting from this group, closest first"""
+        filters = {"ancestry__ancestor": self}
+        if not include_self:
+            filters["ancestry__depth__gt"] = 0
+        return Group.objects.filter(**filters).order_by("ancestry__depth", "name")
+
     def __str__(self):
         return f"Group {self.name}"
 
@@ -80,6 +95,40 @@ class Group(models.Model):
                 "parent",
             ),
         )
+        indexes = [
+            models.Index(
+                KeyTransform("ldap_uniq", "attributes"), name="ak_group_attr_ldap_uniq"
+            ),
+            models.Index(
+                KeyTransform("distinguishedName", "attributes"), name="ak_group_attr_dn"
+            ),
+        ]
+
+
+class GroupAncestry(models.Model):
+    """Closure of the group hierarchy, with one row for every ancestor of a group and
+    one for the group itself (with a depth of 0). Maintained by
+    `authentik.core.hierarchy`."""
+
+    descendant = models.ForeignKey(
+        Group, on_delete=models.CASCADE, related_name="ancestry"
+    )
+    ancestor = models.ForeignKey(
+        Group, on_delete=models.CASCADE, related_name="descendancy"
+    )
+    depth = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"Group Ancestry {self.descendant_id} -> {self.ancestor_id}"
+
+    class Meta:
+
+        unique_together = (
+            (
+                "descendant",
+                "ancestor",
+            ),
+        )
 
 
 class UserManager(DjangoUserManager):
@@ -104,11 +153,23 @@ class User(GuardianUserMixin, AbstractUser):
 
     objects = UserManager()
 
+    def all_groups(self) -> QuerySet:
+        """All groups the user is a member of, directly or by inheritance. Parents are
+        returned before their children."""
+        return (
+            Group.objects.filter(descendancy__descendant__users=self)
+            .annotate(level=Max("ancestry__depth"))
+            .order_by("level", "name")
+        )
+
     def group_attributes(self) -> dict[str, Any]:
         """Get a dictionary containing the attributes from all groups the user belongs to,
-        including the users attributes"""
+        including the users attributes. Attributes of child groups override the ones of
+        their parents."""
+        from authentik.core.authorization import get_authorization
+
         final_attributes = {}
-        for group in self.ak_groups.all().order_by("name"):
+        for group in get_authorization(self).groups:
             final_attributes.update(group.attributes)
         final_attributes.update(self.attributes)
         return final_attributes
@@ -116,7 +177,9 @@ class User(GuardianUserMixin, AbstractUser):
     @cached_property
     def is_superuser(self) -> bool:
         """Get supseruser status based on membership in a group with superuser status"""
-        return self.ak_groups.filter(is_superuser=True).exists()
+        from authentik.core.authorization import get_authorization
+
+        return get_authorization(self).is_superuser
 
     @property
     def is_staff(self) -> bool:
@@ -159,6 +222,20 @@ class User(GuardianUserMixin, AbstractUser):
             ("reset_user_password", "Reset Password"),
             ("impersonate", "Can impersonate other users"),
         )
+        indexes = [
+            models.Index(
+                KeyTransform("ldap_uniq", "attributes"), name="ak_user_attr_ldap_uniq"
+            ),
+            models.Index(
+                KeyTransform("distinguishedName", "attributes"), name="ak_user_attr_dn"
+            ),
+            # Temporary users created by SAML sources
+            models.Index(
+                fields=["last_login"],
+                condition=Q(attributes__saml__isnull=False),
+                name="ak_user_attr_saml",
+            ),
+        ]
         verbose_name = _("User")
         verbose_name_plural = _("Users")
 
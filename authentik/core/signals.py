@@ -2,34 +2,91 @@
 from django.core.cache import cache
 from django.core.signals import Signal
 from django.db.models import Model
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
 from django.dispatch import receiver
-from prometheus_client import Gauge
+
+from authentik.lib.utils.cache import bump_version
 
 # Arguments: user: User, password: str
 password_changed = Signal()
 
-GAUGE_MODELS = Gauge(
-    "authentik_models", "Count of various objects", ["model_name", "app"]
-)
-
 
 @receiver(post_save)
 # pylint: disable=unused-argument
 def post_save_application(sender: type[Model], instance, created: bool, **_):
-    """Clear user's application cache upon application creation"""
-    from authentik.core.api.applications import user_app_cache_key
-    from authentik.core.models import Application
-
-    GAUGE_MODELS.labels(
-        model_name=sender._meta.model_name,
-        app=sender._meta.app_label,
-    ).set(sender.objects.count())
-
-    if sender != Application:
-        return
-    if not created:  # pragma: no cover
-        return
-    # Also delete user application cache
-    keys = cache.keys(user_app_cache_key("*"))
-    cache.delete_many(keys)
+    """Clear user's application cache upon application, provider or group changes"""
+    from authentik.core.api.applications import (
+        CACHE_VERSION_USER_APPS,
+        user_app_cache_key,
+    )
+    from authentik.core.models import Application, Group, Provider, User
+
+    if isinstance(instance, User):
+        cache.delete(user_app_cache_key(instance.pk))
+    if isinstance(instance, (Application, Provider, Group)):
+        bump_version(CACHE_VERSION_USER_APPS)
+
+
+@receiver(post_save)
+@receiver(post_delete, sender="authentik_core.PropertyMapping")
+@receiver(post_delete, sender="authentik_policies_expression.ExpressionPolicy")
+# pylint: disable=unused-argument
+def invalidate_compiled_expressions(sender: type[Model], instance, **_):
+    """Clear compiled expressions when a property mapping or expression policy is changed"""
+    from authentik.core.models import PropertyMapping
+    from authentik.lib.expression.evaluator import compile_expression
+    from authentik.policies.expression.models import ExpressionPolicy
+
+    if isinstance(instance, (PropertyMapping, ExpressionPolicy)):
+        compile_expression.cache_clear()
+
+
+@receiver(post_save)
+@receiver(post_delete, sender="authentik_core.Group")
+@receiver(post_delete, sender="authentik_core.User")
+@receiver(m2m_changed, sender="authentik_core.User_ak_groups")
+# pylint: disable=unused-argument
+def invalidate_authorization_scope(sender: type[Model], instance, **_):
+    """Clear authorization contexts of the current scope when users, groups or their
+    memberships are changed"""
+    from authentik.core.authorization import clear_authorization_scope
+    from authentik.core.models import Group, User
+
+    if isinstance(instance, (Group, User)):
+        clear_authorization_scope()
+
+
+@receiver(post_save)
+# pylint: disable=unused-argument
+def post_save_group_hierarchy(sender: type[Model], instance, **_):
+    """Update the group hierarchy when a group is created or moved"""
+    from authentik.core.hierarchy import update_group_hierarchy
+    from authentik.core.models import Group
+
+    if isinstance(instance, Group):
+        update_group_hierarchy(instance)
+
+
+@receiver(pre_delete, sender="authentik_core.Group")
+# pylint: disable=unused-argument
+def pre_delete_group_hierarchy(sender: type[Model], instance, **_):
+    """Remember the groups below a group which is deleted, as they lose their parent"""
+    from authentik.core.models import Group, GroupAncestry
+
+    if isinstance(instance, Group):
+        instance.hierarchy_descendants = list(
+            GroupAncestry.objects.filter(ancestor=instance, depth__gt=0).values_list(
+                "descendant_id", flat=True
+            )
+        )
+
+
+@receiver(post_delete, sender="authentik_core.Group")
+# pylint: disable=unused-argument
+def post_delete_group_hierarchy(sender: type[Model], instance, **_):
+    """Rebuild the ancestry of the groups below a deleted group"""
+    from authentik.core.hierarchy import rebuild_group_hierarchy
+    from authentik.core.models import Group
+
+    if isinstance(instance, Group):
+        rebuild_group_hierarchy(getattr(instance, "hierarchy_descendants", []))
@@ -8,32 +8,104 @@ from botocore.exceptions import BotoCoreError, ClientError
 from dbbackup.db.exceptions import CommandConnectorError
 from django.contrib.humanize.templatetags.humanize import naturaltime
 from django.core import management
-from django.utils.timezone import now
+from django.core.cache import cache
+from django.db import DatabaseError, connection
 from kubernetes.config.incluster_config import SERVICE_HOST_ENV_NAME
+from prometheus_client import Gauge
 from structlog.stdlib import get_logger
 
+from authentik.core.expiry import clean_expired
+from authentik.core.indexes import apply_attribute_indexes
 from authentik.core.models import ExpiringModel
 from authentik.events.monitored_tasks import MonitoredTask, TaskResult, TaskResultStatus
 from authentik.lib.config import CONFIG
+from authentik.lib.utils.reflection import get_apps
 from authentik.root.celery import CELERY_APP
 
 LOGGER = get_logger()
+GAUGE_MODELS = Gauge(
+    "authentik_models", "Count of various objects", ["model_name", "app"]
+)
+CACHE_KEY_MODEL_COUNTS = "goauthentik.io/core/model_counts"
+# Tables with at least this many estimated rows aren't counted exactly
+EXACT_COUNT_THRESHOLD = 10000
+
+
+def get_model_counts() -> dict[tuple[str, str], int]:
+    """Count objects of all authentik models, keyed by app label and model name.
+    Large tables use PostgreSQL's row estimate instead of a full table scan. Partitioned
+    tables have no estimate of their own, so those of their partitions are summed."""
+    models = [model for app in get_apps() for model in app.get_models()]
+    estimates = {}
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                (
+                    "SELECT c.relname, CASE WHEN c.relkind = 'p' THEN ("
+                    "SELECT coalesce(sum(greatest(p.reltuples, 0)), -1) "
+                    "FROM pg_inherits i INNER JOIN pg_class p ON p.oid = i.inhrelid "
+                    "WHERE i.inhparent = c.oid) ELSE c.reltuples END FROM pg_class c "
+                    "WHERE c.relkind IN ('r', 'p') AND pg_table_is_visible(c.oid) "
+                    "AND c.relname = ANY(%s)"
+                ),
+                [list({model._meta.db_table for model in models})],
+            )
+            estimates = dict(cursor.fetchall())
+    counts = {}
+    for model in models:
+        key = (model._meta.app_label, model._meta.model_name)
+        # reltuples is -1 or 0 for tables which haven't been analyzed yet
+        estimate = estimates.get(model._meta.db_table, -1)
+        if estimate >= EXACT_COUNT_THRESHOLD:
+            counts[key] = int(estimate)
+        else:
+            counts[key] = model.objects.count()
+    return counts
+
+
+def set_model_gauges(counts: dict[tuple[str, str], int]):
+    """Update model gauge from counts collected by `update_model_counts`"""
+    for (app, model_name), count in counts.items():
+        GAUGE_MODELS.labels(model_name=model_name, app=app).set(count)
+
+
+@CELERY_APP.task(bind=True, base=MonitoredTask)
+def update_model_counts(self: MonitoredTask):
+    """Count objects of all models, for the model gauge"""
+    counts = get_model_counts()
+    cache.set(CACHE_KEY_MODEL_COUNTS, counts, timeout=None)
+    set_model_gauges(counts)
+    self.set_status(
+        TaskResult(
+            TaskResultStatus.SUCCESSFUL, [f"Counted objects of {len(counts)} models"]
+        )
+    )
+
+
+@CELERY_APP.task(bind=True, base=MonitoredTask)
+def reconcile_attribute_indexes(self: MonitoredTask):
+    """Create and drop indexes on user and group attributes declared in the
+    configuration"""
+    try:
+        created, dropped = apply_attribute_indexes()
+    except DatabaseError as exc:
+        self.set_status(TaskResult(TaskResultStatus.ERROR).with_error(exc))
+        return
+    self.set_status(
+        TaskResult(
+            TaskResultStatus.SUCCESSFUL,
+            [f"Created {len(created)} and dropped {len(dropped)} attribute indexes"],
+        )
+    )
 
 
 @CELERY_APP.task(bind=True, base=MonitoredTask)
 def clean_expired_models(self: MonitoredTask):
-    """Remove expired objects"""
+    """Remove expired objects in batches, within each model's time budget"""
     messages = []
     for cls in ExpiringModel.__subclasses__():
         cls: ExpiringModel
-        amount, _ = (
-            cls.objects.all()
-            .exclude(expiring=False)
-            .exclude(expiring=True, expires__gt=now())
-            .delete()
-        )
-        LOGGER.debug("Deleted expired models", model=cls, amount=amount)
-        messages.append(f"Deleted {amount} expired {cls._meta.verbose_name_plural}")
+        messages.append(clean_expired(cls).message)
     self.set_status(TaskResult(TaskResultStatus.SUCCESSFUL, messages))
 
 
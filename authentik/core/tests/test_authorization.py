@@ -0,0 +1,60 @@
+"""authorization context tests"""
+from django.test import TestCase
+
+from authentik.core.authorization import authorization_scope, get_authorization
+from authentik.core.models import Group, User
+from authentik.lib.expression.evaluator import BaseEvaluator
+from authentik.policies.models import PolicyBinding, PolicyBindingModel
+from authentik.policies.types import PolicyRequest
+
+
+class TestAuthorization(TestCase):
+    """Test request-scoped authorization context"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="authz")
+        self.parent = Group.objects.create(
+            name="parent", is_superuser=True, attributes={"foo": "parent", "bar": 1}
+        )
+        self.child = Group.objects.create(
+            name="child", parent=self.parent, attributes={"foo": "child"}
+        )
+        self.other = Group.objects.create(name="other")
+        self.user.ak_groups.add(self.child)
+
+    def test_ancestry(self):
+        """Test parent groups are inherited"""
+        authz = get_authorization(self.user)
+        self.assertEqual(authz.groups, [self.parent, self.child])
+        # Superuser status is only granted by direct groups
+        self.assertFalse(self.user.is_superuser)
+        self.assertEqual(self.user.group_attributes(), {"foo": "child", "bar": 1})
+        self.assertTrue(authz.is_member(name="parent"))
+        self.assertTrue(authz.is_member(name__startswith="par"))
+        self.assertFalse(authz.is_member(name="other"))
+        self.assertTrue(authz.is_member(pk=str(self.parent.pk)))
+        self.assertTrue(authz.is_member(group_uuid=str(self.child.pk)))
+        self.assertFalse(authz.is_member(pk=str(self.other.pk)))
+        self.assertTrue(
+            BaseEvaluator.expr_func_is_group_member(self.user, name="child")
+        )
+
+    def test_superuser(self):
+        """Test direct groups grant superuser status"""
+        self.user.ak_groups.add(self.parent)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_superuser)
+
+    def test_scope(self):
+        """Test memberships are only loaded once per scope"""
+        pbm = PolicyBindingModel.objects.create()
+        bindings = [
+            PolicyBinding.objects.create(target=pbm, group=group, order=idx)
+            for idx, group in enumerate([self.parent, self.child, self.other])
+        ]
+        request = PolicyRequest(self.user)
+        with authorization_scope():
+            with self.assertNumQueries(1):
+                results = [binding.passes(request).passing for binding in bindings]
+            self.assertEqual(results, [True, True, False])
+            self.user.ak_groups.add(self.other)
+            self.assertTrue(bindings[2].passes(request).passing)
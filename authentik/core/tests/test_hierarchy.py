@@ -0,0 +1,98 @@
+"""group hierarchy tests"""
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from authentik.core.hierarchy import defer_group_hierarchy, rebuild_group_hierarchy
+from authentik.core.models import Group, GroupAncestry, User
+
+
+class TestGroupHierarchy(APITestCase):
+    """Test group hierarchy closure"""
+
+    def setUp(self):
+        self.root = Group.objects.create(name="root")
+        self.middle = Group.objects.create(name="middle", parent=self.root)
+        self.leaf = Group.objects.create(name="leaf", parent=self.middle)
+        self.other = Group.objects.create(name="other")
+        self.user = User.objects.create_user(username="hierarchy")
+        self.user.ak_groups.add(self.leaf)
+
+    def test_ancestors(self):
+        """Test ancestors and descendants"""
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(self.leaf.ancestors()), [self.root, self.middle, self.leaf]
+            )
+        self.assertEqual(
+            list(self.leaf.ancestors(include_self=False)), [self.root, self.middle]
+        )
+        self.assertEqual(
+            list(self.root.descendants()), [self.root, self.middle, self.leaf]
+        )
+        self.assertEqual(list(self.middle.descendants(include_self=False)), [self.leaf])
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(self.user.all_groups()), [self.root, self.middle, self.leaf]
+            )
+
+    def test_move(self):
+        """Test moving a group updates its descendants"""
+        self.middle.parent = self.other
+        self.middle.save()
+        self.assertEqual(
+            list(self.leaf.ancestors()), [self.other, self.middle, self.leaf]
+        )
+        self.assertEqual(list(self.root.descendants(include_self=False)), [])
+        # Saving without moving doesn't rebuild anything
+        with self.assertNumQueries(2):
+            self.leaf.save()
+
+    def test_delete(self):
+        """Test deleting a group detaches its descendants"""
+        self.middle.delete()
+        self.leaf.refresh_from_db()
+        self.assertIsNone(self.leaf.parent)
+        self.assertEqual(list(self.leaf.ancestors()), [self.leaf])
+        self.assertEqual(list(self.user.all_groups()), [self.leaf])
+
+    def test_cycle(self):
+        """Test cycles in the hierarchy don't recurse infinitely"""
+        self.root.parent = self.leaf
+        self.root.save()
+        self.assertEqual(
+            set(self.middle.ancestors()), {self.root, self.middle, self.leaf}
+        )
+
+    def test_defer(self):
+        """Test deferred updates and full rebuilds"""
+        with defer_group_hierarchy():
+            group = Group.objects.create(name="deferred", parent=self.leaf)
+            self.assertFalse(GroupAncestry.objects.filter(descendant=group).exists())
+        self.assertEqual(
+            list(group.ancestors()), [self.root, self.middle, self.leaf, group]
+        )
+        GroupAncestry.objects.all().delete()
+        rebuild_group_hierarchy()
+        self.assertEqual(
+            list(group.ancestors()), [self.root, self.middle, self.leaf, group]
+        )
+
+    def test_api_filter(self):
+        """Test group API hierarchy filters"""
+        self.client.force_login(User.objects.get(username="akadmin"))
+        response = self.client.get(
+            reverse("authentik_api:group-list"),
+            data={"effective_member": self.user.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {group["name"] for group in response.json()["results"]},
+            {"root", "middle", "leaf"},
+        )
+        response = self.client.get(
+            reverse("authentik_api:group-list"),
+            data={"descendants_of": self.middle.pk},
+        )
+        self.assertEqual(
+            [group["name"] for group in response.json()["results"]], ["leaf", "middle"]
+        )
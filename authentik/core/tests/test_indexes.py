@@ -0,0 +1,47 @@
+"""attribute index tests"""
+from django.db import connection
+from django.test import TestCase
+
+from authentik.core.indexes import apply_attribute_indexes, attribute_index_name
+from authentik.core.models import User
+from authentik.lib.config import CONFIG
+
+
+class TestAttributeIndexes(TestCase):
+    """Test attribute indexes"""
+
+    def _explain(self, **filters) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return User.objects.filter(**filters).explain()
+
+    def test_well_known(self):
+        """Test lookups on well-known attributes use an index"""
+        self.assertIn(
+            "ak_user_attr_ldap_uniq", self._explain(attributes__ldap_uniq="a")
+        )
+        self.assertIn(
+            "ak_user_attr_dn", self._explain(attributes__distinguishedName__in=["a"])
+        )
+
+    def test_configured(self):
+        """Test indexes for configured paths are created and dropped"""
+        with CONFIG.patch("attributes.indexes.users", "foo,bar.baz,invalid path"):
+            created, dropped = apply_attribute_indexes()
+            self.assertEqual(
+                created,
+                [
+                    attribute_index_name("users", "foo"),
+                    attribute_index_name("users", "bar.baz"),
+                ],
+            )
+            self.assertEqual(dropped, [])
+            self.assertEqual(apply_attribute_indexes(), ([], []))
+        self.assertIn(
+            attribute_index_name("users", "bar.baz"),
+            self._explain(attributes__bar__baz="a"),
+        )
+        with CONFIG.patch("attributes.indexes.users", "foo"):
+            created, dropped = apply_attribute_indexes()
+            self.assertEqual(created, [])
+            self.assertEqual(dropped, [attribute_index_name("users", "bar.baz")])
@@ -5,6 +5,7 @@ from guardian.shortcuts import get_anonymous_user
 from authentik.core.exceptions import PropertyMappingExpressionException
 from authentik.core.models import PropertyMapping
 from authentik.events.models import Event, EventAction
+from authentik.lib.expression.evaluator import compile_expression
 
 
 class TestPropertyMappings(TestCase):
@@ -21,6 +22,36 @@ class TestPropertyMappings(TestCase):
         )
         self.assertEqual(mapping.evaluate(None, None), "test")
 
+    def test_expression_cache(self):
+        """Test compiled expressions are re-used and cleared on save"""
+        mapping = PropertyMapping.objects.create(
+            name="test", expression="return 'test'"
+        )
+        self.assertEqual(compile_expression.cache_info().currsize, 0)
+        self.assertEqual(mapping.evaluate(None, None), "test")
+        hits = compile_expression.cache_info().hits
+        self.assertEqual(mapping.evaluate(None, None), "test")
+        self.assertEqual(compile_expression.cache_info().hits, hits + 1)
+        mapping.expression = "return 'foo'"
+        mapping.save()
+        self.assertEqual(compile_expression.cache_info().currsize, 0)
+        self.assertEqual(mapping.evaluate(None, None), "foo")
+
+    def test_expression_requests(self):
+        """Test evaluations get their own requests session, sharing connections"""
+        mapping = PropertyMapping.objects.create(
+            name="test", expression="return requests"
+        )
+        first = mapping.evaluate(None, None)
+        first.cookies.set("session", "foo")
+        second = mapping.evaluate(None, None)
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(second.cookies), 0)
+        self.assertEqual(
+            first.get_adapter("https://goauthentik.io"),
+            second.get_adapter("https://goauthentik.io"),
+        )
+
     def test_expression_syntax(self):
         """Test expression syntax error"""
         mapping = PropertyMapping.objects.create(name="test", expression="-")
@@ -1,10 +1,18 @@
 """authentik core task tests"""
+from django.core.cache import cache
 from django.test import TestCase
 from django.utils.timezone import now
 from guardian.shortcuts import get_anonymous_user
 
-from authentik.core.models import Token
-from authentik.core.tasks import clean_expired_models
+from authentik.core.expiry import CACHE_KEY_EXPIRY_STATE, clean_expired
+from authentik.core.models import Token, User
+from authentik.core.tasks import (
+    CACHE_KEY_MODEL_COUNTS,
+    GAUGE_MODELS,
+    clean_expired_models,
+    update_model_counts,
+)
+from authentik.lib.config import CONFIG
 
 
 class TestTasks(TestCase):
@@ -16,3 +24,43 @@ class TestTasks(TestCase):
         self.assertEqual(Token.objects.all().count(), 1)
         clean_expired_models.delay().get()
         self.assertEqual(Token.objects.all().count(), 0)
+
+    def test_expiry_batches(self):
+        """Test expired objects are deleted in batches, resuming in the next run"""
+        self.addCleanup(cache.delete, CACHE_KEY_EXPIRY_STATE % "authentik_core.token")
+        for _ in range(5):
+            Token.objects.create(expires=now(), user=get_anonymous_user())
+        with CONFIG.patch("expiry.batch_size", 2), CONFIG.patch(
+            "expiry.time_budget", 0
+        ):
+            progress = clean_expired(Token)
+            self.assertEqual(progress.deleted, 2)
+            self.assertFalse(progress.finished)
+            self.assertIn("continuing in the next run", progress.message)
+            self.assertEqual(Token.objects.all().count(), 3)
+            # Objects before the last deleted primary key are deleted in the next pass
+            for _ in range(5):
+                if not Token.objects.exists():
+                    break
+                clean_expired(Token)
+        self.assertEqual(Token.objects.all().count(), 0)
+
+    def test_expiry_interval(self):
+        """Test models are only cleaned up once per interval"""
+        self.addCleanup(cache.delete, CACHE_KEY_EXPIRY_STATE % "authentik_core.token")
+        with CONFIG.patch("expiry.models.authentik_core_token.interval", 3600):
+            self.assertFalse(clean_expired(Token).skipped)
+            Token.objects.create(expires=now(), user=get_anonymous_user())
+            self.assertTrue(clean_expired(Token).skipped)
+            self.assertEqual(Token.objects.all().count(), 1)
+
+    def test_model_counts(self):
+        """Test model count collector"""
+        User.objects.create(username="test-count")
+        update_model_counts.delay().get()
+        counts = cache.get(CACHE_KEY_MODEL_COUNTS)
+        self.assertEqual(counts[("authentik_core", "user")], User.objects.all().count())
+        self.assertEqual(
+            GAUGE_MODELS.labels(model_name="user", app="authentik_core")._value.get(),
+            User.objects.all().count(),
+        )
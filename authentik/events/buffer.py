@@ -0,0 +1,143 @@
+"""authentik event ingestion buffer"""
+from pickle import PickleError, dumps, loads  # nosec
+from time import time
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from structlog.stdlib import get_logger
+
+from authentik.events.rollups import record_events
+from authentik.lib.config import CONFIG
+
+if TYPE_CHECKING:
+    from authentik.events.models import Event
+
+LOGGER = get_logger()
+# Accessed with the raw redis client, so prefixed the same way as cache keys
+BUFFER_KEY = cache.make_key("goauthentik.io/events/buffer")
+# Sorted set of the processing lists of running flushes, scored by their last claim
+PROCESSING_KEY = cache.make_key("goauthentik.io/events/buffer/processing")
+# Events claimed by a flush which didn't save them within this many seconds are put
+# back into the buffer
+CLAIM_TIMEOUT = 120
+
+# Move the first ARGV[1] events of the buffer to the processing list of a flush
+CLAIM_SCRIPT = """
+local events = redis.call("LRANGE", KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #events > 0 then
+    redis.call("LTRIM", KEYS[1], #events, -1)
+    redis.call("RPUSH", KEYS[2], unpack(events))
+    redis.call("ZADD", KEYS[3], ARGV[2], KEYS[2])
+end
+return events
+"""
+# Put the events of a processing list back at the start of the buffer
+REQUEUE_SCRIPT = """
+local events = redis.call("LRANGE", KEYS[2], 0, -1)
+for idx = #events, 1, -1 do
+    redis.call("LPUSH", KEYS[1], events[idx])
+end
+redis.call("DEL", KEYS[2])
+redis.call("ZREM", KEYS[3], KEYS[2])
+return #events
+"""
+
+
+def get_sync_actions() -> set[str]:
+    """Actions which are always saved synchronously, accepts a list or a
+    comma-separated string"""
+    actions = CONFIG.y("events.buffer.sync_actions", [])
+    if isinstance(actions, str):
+        actions = actions.split(",")
+    return {action.strip() for action in actions}
+
+
+def should_buffer(event: "Event") -> bool:
+    """Check if `event` should be buffered instead of being saved right away"""
+    if not CONFIG.y_bool("events.buffer.enabled"):
+        return False
+    return event.action not in get_sync_actions()
+
+
+def buffer_event(event: "Event") -> bool:
+    """Add `event` to the buffer, and schedule a flush once a batch is full.
+    Returns False if the event couldn't be buffered and has to be saved directly."""
+    from authentik.events.tasks import flush_events
+
+    try:
+        length = get_redis_connection().rpush(BUFFER_KEY, dumps(event))
+    except (RedisError, NotImplementedError, PickleError, TypeError) as exc:
+        LOGGER.warning("Failed to buffer event, saving directly", exc=exc)
+        return False
+    if length % int(CONFIG.y("events.buffer.batch_size", 100)) == 0:
+        flush_events.apply_async(queue="authentik_events")
+    return True
+
+
+def insert_events(events: list["Event"]) -> list["Event"]:
+    """Insert `events` with a single query, skipping events which are already saved.
+    Returns the events which were actually inserted."""
+    from authentik.events.models import Event
+
+    # bulk_create doesn't return which rows were inserted when ignoring conflicts
+    rows = Event.objects._insert(  # pylint: disable=protected-access
+        events,
+        fields=Event._meta.concrete_fields,
+        returning_fields=[Event._meta.pk],
+        ignore_conflicts=True,
+    )
+    # A single event is inserted without a bulk query, which returns [None] instead
+    # of rows when the event already exists
+    inserted = {row[0] for row in rows or [] if row}
+    return [event for event in events if event.pk in inserted]
+
+
+def flush_buffer() -> int:
+    """Save all buffered events in batches, and return the amount of saved events.
+    Each batch is atomically moved from the buffer to a processing list of this flush,
+    so concurrent flushes never claim the same events. Batches which can't be saved,
+    and batches of flushes which didn't finish within `CLAIM_TIMEOUT`, are put back
+    into the buffer. Saving a batch twice is a no-op, so a failed flush can always be
+    retried."""
+    from authentik.events.models import Event
+    from authentik.events.tasks import event_notification_batch_handler
+
+    batch_size = int(CONFIG.y("events.buffer.batch_size", 100))
+    client = get_redis_connection()
+    claim = client.register_script(CLAIM_SCRIPT)
+    requeue = client.register_script(REQUEUE_SCRIPT)
+    for stale in client.zrangebyscore(PROCESSING_KEY, 0, time() - CLAIM_TIMEOUT):
+        requeued = requeue(keys=[BUFFER_KEY, stale, PROCESSING_KEY])
+        LOGGER.info("Requeued events of unfinished flush", events=requeued)
+    keys = [BUFFER_KEY, f"{PROCESSING_KEY}/{uuid4().hex}", PROCESSING_KEY]
+    total = 0
+    while True:
+        raw_events = claim(keys=keys, args=[batch_size, time()])
+        if not raw_events:
+            break
+        events: list[Event] = [loads(raw) for raw in raw_events]  # nosec
+        for event in events:
+            # GeoIP lookups are deferred to the flush
+            if event.client_ip and "geo" not in event.context:
+                event.with_geoip()
+        try:
+            with transaction.atomic():
+                # Events saved by an earlier attempt are only counted once
+                record_events(insert_events(events))
+        except DatabaseError as exc:
+            LOGGER.warning("Failed to flush events, retrying later", exc=exc)
+            requeue(keys=keys)
+            break
+        client.pipeline().delete(keys[1]).zrem(PROCESSING_KEY, keys[1]).execute()
+        total += len(events)
+        # bulk_create doesn't send post_save, so trigger notifications here
+        event_notification_batch_handler.apply_async(
+            args=[[event.event_uuid.hex for event in events]],
+            queue="authentik_events",
+        )
+    LOGGER.debug("Flushed event buffer", events=total)
+    return total
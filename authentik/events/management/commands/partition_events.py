@@ -0,0 +1,29 @@
+"""authentik partition_events command"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.translation import gettext as _
+
+from authentik.events.partitions import (
+    get_partition_interval,
+    is_partitioned,
+    partition_event_table,
+)
+
+
+class Command(BaseCommand):
+    """Convert the event table into a partitioned table"""
+
+    help = _(
+        "Convert the event table into a table partitioned by creation time. "
+        "Events can't be saved until all existing events are copied."
+    )
+
+    def handle(self, *args, **options):
+        """Convert the event table into a partitioned table"""
+        interval = get_partition_interval()
+        if not interval:
+            raise CommandError("events.partitioning.interval is not configured.")
+        if is_partitioned():
+            self.stdout.write("Event table is already partitioned.")
+            return
+        partition_event_table(interval)
+        self.stdout.write(f"Event table is now partitioned {interval}.")
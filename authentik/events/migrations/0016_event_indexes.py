@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:46
+
+import django.db.models.expressions
+import django.db.models.fields.json
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # Indexes are created concurrently, so events can still be saved meanwhile
+    atomic = False
+
+    dependencies = [
+        ("authentik_events", "0015_event_created_default"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="event",
+            index=models.Index(fields=["created"], name="ak_event_created"),
+        ),
+        AddIndexConcurrently(
+            model_name="event",
+            index=models.Index(
+                fields=["action", "created"], name="ak_event_action_created"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="event",
+            index=models.Index(
+                django.db.models.fields.json.KeyTransform("pk", "user"),
+                django.db.models.expressions.F("action"),
+                django.db.models.expressions.F("created"),
+                name="ak_event_user_pk",
+            ),
+        ),
+    ]
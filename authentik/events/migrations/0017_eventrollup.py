@@ -0,0 +1,111 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:51
+
+from datetime import timedelta
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.utils.timezone import now
+
+import authentik.core.models
+
+
+def build_event_rollups(apps: Apps, schema_editor: BaseDatabaseSchemaEditor):
+    """Roll up the events of the longest metrics window"""
+    Event = apps.get_model("authentik_events", "Event")
+    EventRollup = apps.get_model("authentik_events", "EventRollup")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {EventRollup._meta.db_table}
+            (hour, action, application, user_pk, username, count, expires, expiring)
+            SELECT date_trunc('hour', created), action,
+                COALESCE(context #>> '{{authorized_application,pk}}', ''),
+                CASE WHEN jsonb_typeof("user" -> 'pk') = 'number'
+                    THEN ("user" ->> 'pk')::integer ELSE 0 END,
+                COALESCE(CASE WHEN action = 'login_failed' THEN context ->> 'username'
+                    ELSE "user" ->> 'username' END, ''),
+                count(*), date_trunc('hour', created) + interval '31 days', true
+            FROM {Event._meta.db_table}
+            WHERE created >= %s
+            GROUP BY 1, 2, 3, 4, 5
+            """,
+            [now() - timedelta(days=31)],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_events", "0016_event_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EventRollup",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "expires",
+                    models.DateTimeField(
+                        default=authentik.core.models.default_token_duration
+                    ),
+                ),
+                ("expiring", models.BooleanField(default=True)),
+                ("hour", models.DateTimeField()),
+                (
+                    "action",
+                    models.TextField(
+                        choices=[
+                            ("login", "Login"),
+                            ("login_failed", "Login Failed"),
+                            ("logout", "Logout"),
+                            ("user_write", "User Write"),
+                            ("suspicious_request", "Suspicious Request"),
+                            ("password_set", "Password Set"),
+                            ("secret_view", "Secret View"),
+                            ("invitation_used", "Invite Used"),
+                            ("authorize_application", "Authorize Application"),
+                            ("source_linked", "Source Linked"),
+                            ("impersonation_started", "Impersonation Started"),
+                            ("impersonation_ended", "Impersonation Ended"),
+                            ("policy_execution", "Policy Execution"),
+                            ("policy_exception", "Policy Exception"),
+                            (
+                                "property_mapping_exception",
+                                "Property Mapping Exception",
+                            ),
+                            ("system_task_execution", "System Task Execution"),
+                            ("system_task_exception", "System Task Exception"),
+                            ("configuration_error", "Configuration Error"),
+                            ("model_created", "Model Created"),
+                            ("model_updated", "Model Updated"),
+                            ("model_deleted", "Model Deleted"),
+                            ("update_available", "Update Available"),
+                            ("custom_", "Custom Prefix"),
+                        ]
+                    ),
+                ),
+                ("application", models.TextField(blank=True, default="")),
+                ("user_pk", models.IntegerField(default=0)),
+                ("username", models.TextField(blank=True, default="")),
+                ("count", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Event rollup",
+                "verbose_name_plural": "Event rollups",
+                "unique_together": {
+                    ("action", "hour", "application", "user_pk", "username")
+                },
+            },
+        ),
+        migrations.RunPython(build_event_rollups, migrations.RunPython.noop),
+    ]
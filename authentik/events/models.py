@@ -6,7 +6,8 @@ from typing import Optional, Union
 from uuid import uuid4
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from django.db.models.fields.json import KeyTransform
 from django.http import HttpRequest
 from django.utils.timezone import now
 from django.utils.translation import gettext as _
@@ -21,7 +22,9 @@ from authentik.core.middleware import (
     SESSION_IMPERSONATE_USER,
 )
 from authentik.core.models import ExpiringModel, Group, User
+from authentik.events.buffer import buffer_event, should_buffer
 from authentik.events.geo import GEOIP_READER
+from authentik.events.rollups import record_events
 from authentik.events.utils import cleanse_dict, get_user, sanitize_dict
 from authentik.lib.sentry import SentryIgnoredException
 from authentik.lib.utils.http import get_client_ip
@@ -93,7 +96,8 @@ class Event(ExpiringModel):
     app = models.TextField()
     context = models.JSONField(default=dict, blank=True)
     client_ip = models.GenericIPAddressField(null=True)
-    created = models.DateTimeField(auto_now_add=True)
+    # Set on creation instead of using auto_now_add, so buffered events keep their time
+    created = models.DateTimeField(default=now, editable=False)
 
     # Shadow the expires attribute from ExpiringModel to override the default duration
     expires = models.DateTimeField(default=default_event_duration)
@@ -150,8 +154,9 @@ class Event(ExpiringModel):
                 )
         # User 255.255.255.255 as fallback if IP cannot be determined
         self.client_ip = get_client_ip(request) or "255.255.255.255"
-        # Apply GeoIP Data, when enabled
-        self.with_geoip()
+        # Apply GeoIP Data, when enabled. Buffered events get it when they're flushed
+        if not should_buffer(self):
+            self.with_geoip()
         # If there's no app set, we get it from the requests too
         if not self.app:
             self.app = Event._get_app_from_request(request)
@@ -192,7 +197,15 @@ class Event(ExpiringModel):
                 client_ip=self.client_ip,
                 user=self.user,
             )
-        super().save(*args, **kwargs)
+            if should_buffer(self) and buffer_event(self):
+                self._set_prom_metrics()
+                return
+        adding = self._state.adding
+        # The rollup is only counted together with the event
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                record_events([self])
         self._set_prom_metrics()
 
     @property
@@ -209,6 +222,37 @@ class Event(ExpiringModel):
 
         verbose_name = _("Event")
         verbose_name_plural = _("Events")
+        indexes = [
+            models.Index(fields=["created"], name="ak_event_created"),
+            models.Index(fields=["action", "created"], name="ak_event_action_created"),
+            # Matches lookups on `user__pk`, optionally with an action
+            models.Index(
+                KeyTransform("pk", "user"), "action", "created", name="ak_event_user_pk"
+            ),
+        ]
+
+
+class EventRollup(ExpiringModel):
+    """Amount of events per hour, action, application and user, maintained as events
+    are saved, so metrics don't have to aggregate events"""
+
+    hour = models.DateTimeField()
+    action = models.TextField(choices=EventAction.choices)
+    # Primary key of the authorized application, if any
+    application = models.TextField(default="", blank=True)
+    user_pk = models.IntegerField(default=0)
+    # Username given for failed logins, otherwise the username of the event's user
+    username = models.TextField(default="", blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"Event rollup {self.action} {self.hour}: {self.count}"
+
+    class Meta:
+
+        verbose_name = _("Event rollup")
+        verbose_name_plural = _("Event rollups")
+        unique_together = (("action", "hour", "application", "user_pk", "username"),)
 
 
 class TransportMode(models.TextChoices):
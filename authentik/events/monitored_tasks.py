@@ -11,7 +11,10 @@ from django.core.cache import cache
 from prometheus_client import Gauge
 
 from authentik.events.models import Event, EventAction
+from authentik.lib.utils.cache import get_tracked, set_tracked, untrack
 
+# Cache index of all saved TaskInfo objects
+CACHE_INDEX_TASKS = "task"
 GAUGE_TASKS = Gauge(
     "authentik_system_tasks",
     "System tasks and their status",
@@ -72,7 +75,7 @@ class TaskInfo:
     @staticmethod
     def all() -> dict[str, "TaskInfo"]:
         """Get all TaskInfo objects"""
-        return cache.get_many(cache.keys("task_*"))
+        return cache.get_many(get_tracked(CACHE_INDEX_TASKS))
 
     @staticmethod
     def by_name(name: str) -> Optional["TaskInfo"]:
@@ -81,6 +84,7 @@ class TaskInfo:
 
     def delete(self):
         """Delete task info from cache"""
+        untrack(CACHE_INDEX_TASKS, f"task_{self.task_name}")
         return cache.delete(f"task_{self.task_name}")
 
     def set_prom_metrics(self):
@@ -102,7 +106,7 @@ class TaskInfo:
             key += f"_{self.result.uid}"
             self.task_name += f"_{self.result.uid}"
         self.set_prom_metrics()
-        cache.set(key, self, timeout=timeout_hours * 60 * 60)
+        set_tracked(key, self, [CACHE_INDEX_TASKS], timeout=timeout_hours * 60 * 60)
 
 
 class MonitoredTask(Task):
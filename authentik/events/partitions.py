@@ -0,0 +1,218 @@
+"""Range partitioning of the event table by creation time"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from re import compile as re_compile
+from typing import Optional
+
+from django.db import connection, transaction
+from django.utils.timezone import now
+from structlog.stdlib import get_logger
+
+from authentik.events.models import Event, Notification
+from authentik.lib.config import CONFIG
+
+LOGGER = get_logger()
+PARTITION_INTERVALS = ["monthly", "daily"]
+PARTITION_BOUND = re_compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+PARTITION_OFFSET = re_compile(r"([+-]\d{2})$")
+
+
+@dataclass
+class EventPartition:
+    """Partition holding events created in [start, end)"""
+
+    name: str
+    start: datetime
+    end: datetime
+
+
+def get_partition_interval() -> Optional[str]:
+    """Configured partition interval, or None when partitioning is disabled"""
+    interval = CONFIG.y("events.partitioning.interval", "")
+    if not interval:
+        return None
+    if interval not in PARTITION_INTERVALS:
+        LOGGER.warning("Invalid event partition interval", interval=interval)
+        return None
+    return interval
+
+
+def partition_period(interval: str, when: datetime) -> tuple[datetime, datetime]:
+    """Start and end of the period of `interval` containing `when`"""
+    start = when.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "daily":
+        return start, start + timedelta(days=1)
+    start = start.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(interval: str, start: datetime) -> str:
+    """Name of the partition starting at `start`"""
+    suffix = start.strftime("%Y%m%d" if interval == "daily" else "%Y%m")
+    return f"{Event._meta.db_table}_p{suffix}"
+
+
+def is_partitioned() -> bool:
+    """Check if the event table is partitioned"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [Event._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def get_partitions() -> list[EventPartition]:
+    """All partitions of the event table ordered by time, except the default
+    partition"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "INNER JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [Event._meta.db_table],
+        )
+        rows = cursor.fetchall()
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_BOUND.search(bound)
+        if not match:
+            continue
+        # PostgreSQL shortens UTC offsets to hours, which fromisoformat doesn't parse
+        start, end = (
+            datetime.fromisoformat(PARTITION_OFFSET.sub(r"\1:00", value))
+            for value in match.groups()
+        )
+        partitions.append(EventPartition(name, start, end))
+    return sorted(partitions, key=lambda partition: partition.start)
+
+
+def create_partition(interval: str, start: datetime, end: datetime) -> str:
+    """Create and attach the partition for [start, end). Events in that range which
+    were saved to the default partition are moved to it."""
+    table = Event._meta.db_table
+    name = partition_name(interval, start)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS '
+            "INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{table}_default" '
+            "WHERE created >= %s AND created < %s RETURNING *) "
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [start, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+            "FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+    LOGGER.info("Created event partition", name=name)
+    return name
+
+
+def ensure_partitions(interval: str) -> list[str]:
+    """Create partitions for the current and the next `events.partitioning.premake`
+    periods, unless they are already covered by existing partitions"""
+    existing = get_partitions()
+    created = []
+    start, end = partition_period(interval, now())
+    for _ in range(int(CONFIG.y("events.partitioning.premake", 3)) + 1):
+        if not any(
+            partition.start < end and partition.end > start for partition in existing
+        ):
+            created.append(create_partition(interval, start, end))
+        start, end = partition_period(interval, end)
+    return created
+
+
+def drop_expired_partitions() -> list[str]:
+    """Drop partitions which only contain expired events. Notifications of these
+    events are kept, without their event. Expired events in other partitions, including
+    the default partition, are deleted row by row by `clean_expired_models`."""
+    dropped = []
+    for partition in get_partitions():
+        if partition.end > now():
+            break
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT 1 FROM "{partition.name}" '
+                "WHERE expiring = false OR expires > now() LIMIT 1"
+            )
+            if cursor.fetchone():
+                continue
+            cursor.execute(
+                f'UPDATE "{Notification._meta.db_table}" SET event_id = NULL '
+                f'WHERE event_id IN (SELECT event_uuid FROM "{partition.name}")'
+            )
+            cursor.execute(f'DROP TABLE "{partition.name}"')
+        LOGGER.info("Dropped expired event partition", name=partition.name)
+        dropped.append(partition.name)
+    return dropped
+
+
+def partition_event_table(interval: str):
+    """Convert the event table into a table partitioned by `created`, and copy all
+    events into it. The table is locked until all events are copied.
+
+    The primary key of a partitioned table has to contain the partition key, so it is
+    extended to (event_uuid, created), and foreign keys referencing events (from
+    notifications) are dropped."""
+    table = Event._meta.db_table
+    old_table = f"{table}_unpartitioned"
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Constraints can't be altered while checks are pending
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(
+            "SELECT conname, contype, conrelid::regclass::text FROM pg_constraint "
+            "WHERE (conrelid = to_regclass(%s) AND contype = 'p') "
+            "OR (confrelid = to_regclass(%s) AND contype = 'f')",
+            [table, table],
+        )
+        primary_key = None
+        for name, kind, relation in cursor.fetchall():
+            if kind == "p":
+                primary_key = name
+                continue
+            cursor.execute(f'ALTER TABLE {relation} DROP CONSTRAINT "{name}"')
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND indexname != %s",
+            [table, primary_key],
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX "{name}"')
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old_table}"')
+        cursor.execute(
+            f'ALTER TABLE "{old_table}" RENAME CONSTRAINT "{primary_key}" '
+            f'TO "{primary_key}_unpartitioned"'
+        )
+        cursor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{old_table}" INCLUDING DEFAULTS '
+            "INCLUDING CONSTRAINTS) PARTITION BY RANGE (created)"
+        )
+        cursor.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{primary_key}" '
+            "PRIMARY KEY (event_uuid, created)"
+        )
+        # Definitions still reference the original table name
+        for _, definition in indexes:
+            cursor.execute(definition)
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+        cursor.execute(f'SELECT min(created) FROM "{old_table}"')
+        oldest = cursor.fetchone()[0] or now()
+        current, _ = partition_period(interval, now())
+        start, end = partition_period(interval, oldest)
+        while start < current:
+            cursor.execute(
+                f'CREATE TABLE "{partition_name(interval, start)}" PARTITION OF '
+                f'"{table}" FOR VALUES FROM (%s) TO (%s)',
+                [start, end],
+            )
+            start, end = partition_period(interval, end)
+        ensure_partitions(interval)
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old_table}"')
+        LOGGER.info("Copied events into partitioned table", events=cursor.rowcount)
+        cursor.execute(f'DROP TABLE "{old_table}"')
@@ -0,0 +1,59 @@
+"""Hourly rollups of events, used for metrics"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Iterable
+
+from django.db import connection
+
+if TYPE_CHECKING:
+    from authentik.events.models import Event
+
+# Rollups are kept as long as the longest metrics window
+ROLLUP_RETENTION = timedelta(days=31)
+ROLLUP_WINDOWS = [1, 7, 30]
+# Failed logins have the anonymous user set, so the username which was attempted is
+# used instead
+CONTEXT_USERNAME_ACTIONS = ["login_failed"]
+
+
+def rollup_key(event: "Event") -> tuple[datetime, str, str, int, str]:
+    """Hour, action, application, user pk and username `event` is counted for"""
+    application = event.context.get("authorized_application", None)
+    application = application.get("pk", "") if isinstance(application, dict) else ""
+    user_pk = event.user.get("pk", 0)
+    if not isinstance(user_pk, int):
+        user_pk = 0
+    if event.action in CONTEXT_USERNAME_ACTIONS:
+        username = event.context.get("username", "")
+    else:
+        username = event.user.get("username", "")
+    return (
+        event.created.replace(minute=0, second=0, microsecond=0),
+        event.action,
+        str(application or ""),
+        user_pk,
+        str(username or ""),
+    )
+
+
+def record_events(events: Iterable["Event"]):
+    """Add `events` to the rollups, with a single upsert"""
+    from authentik.events.models import EventRollup
+
+    counts = Counter(rollup_key(event) for event in events)
+    if not counts:
+        return
+    rows: list[Any] = []
+    for (hour, *key), count in counts.items():
+        rows.extend([hour, *key, count, hour + ROLLUP_RETENTION])
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, true)"] * len(counts))
+    table = EventRollup._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} "
+            "(hour, action, application, user_pk, username, count, expires, expiring) "
+            f"VALUES {values} "
+            "ON CONFLICT (action, hour, application, user_pk, username) "
+            f"DO UPDATE SET count = {table}.count + EXCLUDED.count",  # nosec
+            rows,
+        )
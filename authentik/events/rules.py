@@ -0,0 +1,111 @@
+"""Notification rule matching"""
+from typing import Iterator
+
+from guardian.shortcuts import get_anonymous_user
+from structlog.stdlib import get_logger
+
+from authentik.core.models import User
+from authentik.events.models import Event, NotificationRule
+from authentik.policies.engine import PolicyEngine
+from authentik.policies.event_matcher.models import EventMatcherPolicy
+from authentik.policies.models import PolicyBinding, PolicyEngineMode
+
+LOGGER = get_logger()
+# Fields of EventMatcherPolicy which are compared to the same field of the event
+MATCHER_FIELDS = ("action", "app", "client_ip")
+
+
+class NotificationRuleIndex:
+    """Index of all notification rules, built once for a batch of events.
+
+    Rules which are only bound to event matcher policies are indexed by the fields of
+    those policies, so they can be matched without running a policy engine. All other
+    rules are checked with a policy engine for every event."""
+
+    rules: list[NotificationRule]
+    # Policies bound to any notification rule, events created by them are ignored
+    rule_policies: set[str]
+    # Rules which have to be checked with a policy engine
+    unindexed: set[NotificationRule]
+    # field -> value -> indexed rules which match events with that value
+    index: dict[str, dict[str, set[NotificationRule]]]
+
+    def __init__(self):
+        self.rules = list(
+            NotificationRule.objects.filter(group__isnull=False).order_by("name")
+        )
+        self.rule_policies = {
+            pk.hex
+            for pk in PolicyBinding.objects.filter(
+                target__in=NotificationRule.objects.all().values_list(
+                    "pbm_uuid", flat=True
+                ),
+                policy__isnull=False,
+            ).values_list("policy_id", flat=True)
+        }
+        self.unindexed = set()
+        self.index = {field: {} for field in MATCHER_FIELDS}
+        self._build()
+
+    def _build(self):
+        """Sort rules into indexed and unindexed rules"""
+        bindings: dict[str, list[dict]] = {rule.pk: [] for rule in self.rules}
+        for binding in PolicyBinding.objects.filter(
+            target__in=bindings.keys(), enabled=True
+        ).values("target_id", "policy_id", "negate"):
+            bindings[binding["target_id"]].append(binding)
+        matchers = EventMatcherPolicy.objects.filter(
+            pk__in=[x["policy_id"] for y in bindings.values() for x in y],
+            execution_logging=False,
+        ).in_bulk()
+        for rule in self.rules:
+            rule_bindings = bindings[rule.pk]
+            # Only non-negated event matchers can be indexed, a rule without any
+            # bindings can't match at all
+            if not all(
+                not binding["negate"] and binding["policy_id"] in matchers
+                for binding in rule_bindings
+            ):
+                self.unindexed.add(rule)
+                continue
+            for binding in rule_bindings:
+                matcher = matchers[binding["policy_id"]]
+                for field in MATCHER_FIELDS:
+                    self.index[field].setdefault(getattr(matcher, field), set()).add(
+                        rule
+                    )
+        LOGGER.debug(
+            "e(trigger): built rule index",
+            rules=len(self.rules),
+            unindexed=len(self.unindexed),
+        )
+
+    def matching(self, event: Event) -> Iterator[NotificationRule]:
+        """Get all rules which match `event`"""
+        if event.context.get("policy_uuid", None) in self.rule_policies:
+            # If policy that caused this event to be created is attached
+            # to *any* NotificationRule, we return early.
+            # This is the most effective way to prevent infinite loops.
+            LOGGER.debug("e(trigger): attempting to prevent infinite loop")
+            return
+        matched = set()
+        for field in MATCHER_FIELDS:
+            matched.update(self.index[field].get(getattr(event, field), set()))
+        for rule in self.rules:
+            if rule in matched:
+                yield rule
+            elif rule in self.unindexed and rule_matches(rule, event):
+                yield rule
+
+
+def rule_matches(rule: NotificationRule, event: Event) -> bool:
+    """Check if the policies attached to `rule` match `event`"""
+    LOGGER.debug("e(trigger): checking if trigger applies", trigger=rule)
+    user = User.objects.filter(pk=event.user.get("pk")).first() or get_anonymous_user()
+    policy_engine = PolicyEngine(rule, user)
+    policy_engine.mode = PolicyEngineMode.MODE_ANY
+    policy_engine.empty_result = False
+    policy_engine.use_cache = False
+    policy_engine.request.context["event"] = event
+    policy_engine.build()
+    return policy_engine.result.passing
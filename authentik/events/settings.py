@@ -0,0 +1,19 @@
+"""Events Settings"""
+from datetime import timedelta
+
+from celery.schedules import crontab
+
+from authentik.lib.config import CONFIG
+
+CELERY_BEAT_SCHEDULE = {
+    "events_flush": {
+        "task": "authentik.events.tasks.flush_events",
+        "schedule": timedelta(seconds=int(CONFIG.y("events.buffer.flush_interval", 5))),
+        "options": {"queue": "authentik_events"},
+    },
+    "events_maintain_partitions": {
+        "task": "authentik.events.tasks.maintain_event_partitions",
+        "schedule": crontab(minute=30),
+        "options": {"queue": "authentik_scheduled"},
+    },
+}
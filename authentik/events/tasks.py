@@ -1,8 +1,8 @@
 """Event notification tasks"""
-from guardian.shortcuts import get_anonymous_user
+from django.db import DatabaseError
 from structlog.stdlib import get_logger
 
-from authentik.core.models import User
+from authentik.events.buffer import flush_buffer
 from authentik.events.models import (
     Event,
     Notification,
@@ -11,75 +11,52 @@ from authentik.events.models import (
     NotificationTransportError,
 )
 from authentik.events.monitored_tasks import MonitoredTask, TaskResult, TaskResultStatus
-from authentik.policies.engine import PolicyEngine
-from authentik.policies.models import PolicyBinding, PolicyEngineMode
+from authentik.events.partitions import (
+    drop_expired_partitions,
+    ensure_partitions,
+    get_partition_interval,
+    is_partitioned,
+)
+from authentik.events.rules import NotificationRuleIndex
 from authentik.root.celery import CELERY_APP
 
 LOGGER = get_logger()
 
 
 @CELERY_APP.task()
-def event_notification_handler(event_uuid: str):
-    """Start task for each trigger definition"""
-    for trigger in NotificationRule.objects.all():
-        event_trigger_handler.apply_async(
-            args=[event_uuid, trigger.name], queue="authentik_events"
-        )
+def flush_events():
+    """Save buffered events to the database"""
+    flush_buffer()
 
 
 @CELERY_APP.task()
-def event_trigger_handler(event_uuid: str, trigger_name: str):
-    """Check if policies attached to NotificationRule match event"""
-    events = Event.objects.filter(event_uuid=event_uuid)
-    if not events.exists():
-        LOGGER.warning("event doesn't exist yet or anymore", event_uuid=event_uuid)
-        return
-    event: Event = events.first()
-    triggers: NotificationRule = NotificationRule.objects.filter(name=trigger_name)
-    if not triggers.exists():
-        return
-    trigger = triggers.first()
-
-    if "policy_uuid" in event.context:
-        policy_uuid = event.context["policy_uuid"]
-        if PolicyBinding.objects.filter(
-            target__in=NotificationRule.objects.all().values_list(
-                "pbm_uuid", flat=True
-            ),
-            policy=policy_uuid,
-        ).exists():
-            # If policy that caused this event to be created is attached
-            # to *any* NotificationRule, we return early.
-            # This is the most effective way to prevent infinite loops.
-            LOGGER.debug(
-                "e(trigger): attempting to prevent infinite loop", trigger=trigger
-            )
-            return
+def event_notification_handler(event_uuid: str):
+    """Check if any notification rules match the event"""
+    event_notification_batch_handler([event_uuid])
 
-    if not trigger.group:
-        LOGGER.debug("e(trigger): trigger has no group", trigger=trigger)
-        return
 
-    LOGGER.debug("e(trigger): checking if trigger applies", trigger=trigger)
-    try:
-        user = (
-            User.objects.filter(pk=event.user.get("pk")).first() or get_anonymous_user()
+@CELERY_APP.task()
+def event_notification_batch_handler(event_uuids: list[str]):
+    """Check all notification rules against a batch of events, and create
+    notifications for all matching rules"""
+    events = list(Event.objects.filter(event_uuid__in=event_uuids))
+    if len(events) < len(event_uuids):
+        LOGGER.warning(
+            "events don't exist yet or anymore",
+            missing=len(event_uuids) - len(events),
         )
-    except User.DoesNotExist:
-        LOGGER.warning("e(trigger): failed to get user", trigger=trigger)
-        return
-    policy_engine = PolicyEngine(trigger, user)
-    policy_engine.mode = PolicyEngineMode.MODE_ANY
-    policy_engine.empty_result = False
-    policy_engine.use_cache = False
-    policy_engine.request.context["event"] = event
-    policy_engine.build()
-    result = policy_engine.result
-    if not result.passing:
+    if not events:
         return
+    index = NotificationRuleIndex()
+    for event in events:
+        for rule in index.matching(event):
+            LOGGER.debug("e(trigger): event trigger matched", trigger=rule)
+            create_notifications(rule, event)
+
 
-    LOGGER.debug("e(trigger): event trigger matched", trigger=trigger)
-    # Create the notification objects
+def create_notifications(trigger: NotificationRule, event: Event):
+    """Create notifications for all members of the trigger's group,
+    and send them with the trigger's transports"""
     for transport in trigger.transports.all():
         for user in trigger.group.users.all():
             LOGGER.debug("created notification")
@@ -114,3 +91,41 @@ def notification_transport(
     except NotificationTransportError as exc:
         self.set_status(TaskResult(TaskResultStatus.ERROR).with_error(exc))
         raise exc
+
+
+@CELERY_APP.task(bind=True, base=MonitoredTask)
+def maintain_event_partitions(self: MonitoredTask):
+    """Create partitions for upcoming events and drop partitions of expired events"""
+    interval = get_partition_interval()
+    try:
+        if not is_partitioned():
+            status = TaskResultStatus.SUCCESSFUL
+            messages = ["Event table is not partitioned"]
+            if interval:
+                status = TaskResultStatus.WARNING
+                messages = [
+                    "Event partitioning is configured, but the event table is not "
+                    "partitioned yet. Run the partition_events command to convert it."
+                ]
+            self.set_status(TaskResult(status, messages))
+            return
+        messages = []
+        if interval:
+            created = ensure_partitions(interval)
+            messages.append(f"Created {len(created)} event partitions")
+        else:
+            messages.append(
+                "No partition interval configured, new events are saved to the "
+                "default partition"
+            )
+        dropped = drop_expired_partitions()
+        messages.append(f"Dropped {len(dropped)} expired event partitions")
+    except DatabaseError as exc:
+        self.set_status(TaskResult(TaskResultStatus.ERROR).with_error(exc))
+        return
+    self.set_status(
+        TaskResult(
+            TaskResultStatus.SUCCESSFUL if interval else TaskResultStatus.WARNING,
+            messages,
+        )
+    )
@@ -0,0 +1,143 @@
+"""event buffer tests"""
+from pickle import dumps  # nosec
+from time import time
+from unittest.mock import MagicMock, patch
+
+from django.db import DatabaseError
+from django.test import TestCase
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from authentik.events.buffer import (
+    BUFFER_KEY,
+    CLAIM_SCRIPT,
+    CLAIM_TIMEOUT,
+    PROCESSING_KEY,
+    flush_buffer,
+)
+from authentik.events.models import Event, EventAction, EventRollup
+from authentik.events.rollups import record_events
+from authentik.lib.config import CONFIG
+
+
+class TestEventBuffer(TestCase):
+    """Test event buffer"""
+
+    def setUp(self):
+        get_redis_connection().delete(BUFFER_KEY, PROCESSING_KEY)
+
+    def _buffer(self, count: int) -> set:
+        """Add `count` events to the buffer, and return their primary keys"""
+        events = [Event.new("unittest") for _ in range(count)]
+        get_redis_connection().rpush(BUFFER_KEY, *[dumps(event) for event in events])
+        return {event.pk for event in events}
+
+    def _saved(self) -> set:
+        return set(
+            Event.objects.filter(action="custom_unittest").values_list("pk", flat=True)
+        )
+
+    def test_buffer(self):
+        """Test events are only saved when the buffer is flushed"""
+        with CONFIG.patch("events.buffer.enabled", True):
+            event = Event.new("unittest")
+            event.save()
+        self.assertFalse(Event.objects.filter(pk=event.pk).exists())
+        self.assertEqual(flush_buffer(), 1)
+        saved = Event.objects.get(pk=event.pk)
+        self.assertEqual(saved.created, event.created)
+        self.assertEqual(get_redis_connection().llen(BUFFER_KEY), 0)
+
+    def test_batch_size(self):
+        """Test full batches are flushed right away"""
+        with CONFIG.patch("events.buffer.enabled", True), CONFIG.patch(
+            "events.buffer.batch_size", 2
+        ):
+            Event.new("unittest").save()
+            self.assertEqual(Event.objects.filter(action="custom_unittest").count(), 0)
+            Event.new("unittest").save()
+        self.assertEqual(Event.objects.filter(action="custom_unittest").count(), 2)
+
+    def test_sync_action(self):
+        """Test security-critical actions skip the buffer"""
+        with CONFIG.patch("events.buffer.enabled", True):
+            event = Event.new(EventAction.LOGIN_FAILED)
+            event.save()
+        self.assertTrue(Event.objects.filter(pk=event.pk).exists())
+
+    def test_fallback(self):
+        """Test events are saved directly when they can't be buffered"""
+        connection = MagicMock()
+        connection.rpush.side_effect = RedisError
+        with CONFIG.patch("events.buffer.enabled", True), patch(
+            "authentik.events.buffer.get_redis_connection",
+            MagicMock(return_value=connection),
+        ):
+            event = Event.new("unittest")
+            event.save()
+        self.assertTrue(Event.objects.filter(pk=event.pk).exists())
+
+    def test_concurrent_flush(self):
+        """Test overlapping flushes save every event exactly once"""
+        pks = self._buffer(4)
+        nested = []
+
+        def record(events: list[Event]):
+            # Another flush runs while the first batch is being saved
+            if not nested:
+                nested.append(None)
+                nested[0] = flush_buffer()
+            record_events(events)
+
+        with CONFIG.patch("events.buffer.batch_size", 2), patch(
+            "authentik.events.buffer.record_events", record
+        ):
+            self.assertEqual(flush_buffer(), 2)
+        self.assertEqual(nested, [2])
+        self.assertEqual(self._saved(), pks)
+        self.assertEqual(get_redis_connection().llen(BUFFER_KEY), 0)
+        self.assertEqual(get_redis_connection().zcard(PROCESSING_KEY), 0)
+
+    def test_requeue(self):
+        """Test events are put back into the buffer when they aren't saved"""
+        pks = self._buffer(2)
+        with patch(
+            "authentik.events.buffer.insert_events",
+            MagicMock(side_effect=DatabaseError),
+        ):
+            self.assertEqual(flush_buffer(), 0)
+        self.assertEqual(get_redis_connection().llen(BUFFER_KEY), 2)
+        # Events claimed by a flush which never finished
+        client = get_redis_connection()
+        client.register_script(CLAIM_SCRIPT)(
+            keys=[BUFFER_KEY, f"{PROCESSING_KEY}/crashed", PROCESSING_KEY],
+            args=[10, time() - CLAIM_TIMEOUT - 1],
+        )
+        self.assertEqual(client.llen(BUFFER_KEY), 0)
+        self.assertEqual(flush_buffer(), 2)
+        self.assertEqual(self._saved(), pks)
+        self.assertEqual(client.zcard(PROCESSING_KEY), 0)
+
+    def test_flush_twice(self):
+        """Test events saved by an earlier flush are not counted again"""
+        self._buffer(2)
+        self.assertEqual(flush_buffer(), 2)
+        # Put the same events into the buffer again
+        get_redis_connection().rpush(
+            BUFFER_KEY,
+            *[dumps(event) for event in Event.objects.filter(action="custom_unittest")],
+        )
+        self.assertEqual(flush_buffer(), 2)
+        self.assertEqual(EventRollup.objects.get(action="custom_unittest").count, 2)
+
+    def test_flush_single_duplicate(self):
+        """Test a batch of a single event which is already saved"""
+        self._buffer(1)
+        self.assertEqual(flush_buffer(), 1)
+        get_redis_connection().rpush(
+            BUFFER_KEY,
+            *[dumps(event) for event in Event.objects.filter(action="custom_unittest")],
+        )
+        self.assertEqual(flush_buffer(), 1)
+        self.assertEqual(get_redis_connection().llen(BUFFER_KEY), 0)
+        self.assertEqual(EventRollup.objects.get(action="custom_unittest").count, 1)
@@ -54,6 +54,32 @@ class TestEventsNotifications(TestCase):
             Event.new(EventAction.CUSTOM_PREFIX).save()
         self.assertEqual(execute_mock.call_count, 1)
 
+    def test_trigger_indexed(self):
+        """Test rules with only event matchers are matched without a policy engine"""
+        transport = NotificationTransport.objects.create(name="transport")
+        NotificationRule.objects.filter(name__startswith="default").delete()
+        trigger = NotificationRule.objects.create(name="trigger", group=self.group)
+        trigger.transports.add(transport)
+        trigger.save()
+        for idx, app in enumerate(["foo", "bar"]):
+            PolicyBinding.objects.create(
+                target=trigger,
+                policy=EventMatcherPolicy.objects.create(
+                    name=f"matcher-{app}", app=app
+                ),
+                order=idx,
+            )
+
+        execute_mock = MagicMock()
+        engine_mock = MagicMock()
+        with patch(
+            "authentik.events.models.NotificationTransport.send", execute_mock
+        ), patch("authentik.events.rules.PolicyEngine", engine_mock):
+            Event.new(EventAction.CUSTOM_PREFIX, app="bar").save()
+            Event.new(EventAction.CUSTOM_PREFIX, app="baz").save()
+        self.assertEqual(execute_mock.call_count, 1)
+        self.assertEqual(engine_mock.call_count, 0)
+
     def test_trigger_no_group(self):
         """Test trigger without group"""
         trigger = NotificationRule.objects.create(name="trigger")
@@ -74,8 +100,9 @@ class TestEventsNotifications(TestCase):
         trigger = NotificationRule.objects.create(name="trigger", group=self.group)
         trigger.transports.add(transport)
         trigger.save()
+        # Execution logging makes sure the matcher is evaluated by the policy engine
         matcher = EventMatcherPolicy.objects.create(
-            name="matcher", action=EventAction.CUSTOM_PREFIX
+            name="matcher", action=EventAction.CUSTOM_PREFIX, execution_logging=True
         )
         PolicyBinding.objects.create(target=trigger, policy=matcher, order=0)
 
@@ -0,0 +1,132 @@
+"""event partitioning tests"""
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from authentik.core.expiry import CACHE_KEY_EXPIRY_STATE, clean_expired
+from authentik.core.models import User
+from authentik.core.tasks import get_model_counts
+from authentik.events.models import Event, EventAction, Notification
+from authentik.events.partitions import (
+    drop_expired_partitions,
+    ensure_partitions,
+    get_partitions,
+    is_partitioned,
+    partition_event_table,
+    partition_name,
+    partition_period,
+)
+from authentik.events.tasks import maintain_event_partitions
+from authentik.lib.config import CONFIG
+
+
+class TestEventPartitions(TestCase):
+    """Test event partitioning"""
+
+    def setUp(self):
+        self.user = User.objects.get(username="akadmin")
+        self.old = Event.objects.create(
+            action=EventAction.LOGIN,
+            created=now() - timedelta(days=400),
+            expires=now() - timedelta(days=35),
+        )
+        self.recent = Event.new(EventAction.LOGIN).set_user(self.user)
+        self.recent.save()
+
+    def _explain(self, **filters) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return Event.objects.filter(**filters).explain()
+
+    def test_indexes(self):
+        """Test common event lookups use an index"""
+        self.assertIn(
+            "ak_event_action_created",
+            self._explain(action=EventAction.LOGIN, created__gte=now()),
+        )
+        self.assertIn("ak_event_user_pk", self._explain(user__pk=self.user.pk))
+
+    def test_partition(self):
+        """Test converting the event table and maintaining partitions"""
+        self.assertFalse(is_partitioned())
+        notification = Notification.objects.create(
+            severity="notice", body="", event=self.old, user=self.user
+        )
+        partition_event_table("monthly")
+        self.assertTrue(is_partitioned())
+        self.assertEqual(
+            set(Event.objects.values_list("pk", flat=True)),
+            {self.old.pk, self.recent.pk},
+        )
+        partitions = get_partitions()
+        # Consecutive months from the oldest event up to 3 months ahead
+        self.assertEqual(
+            partitions[0].name, partition_name("monthly", self.old.created)
+        )
+        for previous, partition in zip(partitions, partitions[1:]):
+            self.assertEqual(previous.end, partition.start)
+        self.assertEqual(partitions[-4].start, partition_period("monthly", now())[0])
+        self.assertEqual(ensure_partitions("monthly"), [])
+        # Indexes are created on all partitions
+        self.assertNotIn("Seq Scan", self._explain(user__pk=self.user.pk))
+
+        # Past partitions without unexpired events are dropped, even when empty
+        self.assertEqual(
+            drop_expired_partitions(),
+            [partition.name for partition in partitions if partition.end <= now()],
+        )
+        self.assertEqual(
+            list(Event.objects.values_list("pk", flat=True)), [self.recent.pk]
+        )
+        notification.refresh_from_db()
+        self.assertIsNone(notification.event)
+
+        with CONFIG.patch("events.partitioning.interval", "daily"):
+            maintain_event_partitions.delay().get()
+        # The next days are covered by the monthly partitions already
+        self.assertEqual(get_partitions()[0].start, partitions[-4].start)
+        self.assertEqual(len(get_partitions()), 4)
+
+    def test_clean_expired(self):
+        """Test expired events which can't be dropped with their partition are
+        deleted row by row"""
+        self.addCleanup(cache.delete, CACHE_KEY_EXPIRY_STATE % "authentik_events.event")
+        partition_event_table("monthly")
+        # Shares its partition with an event which doesn't expire yet
+        expired = Event.objects.create(
+            action=EventAction.LOGIN, expires=now() - timedelta(days=1)
+        )
+        # Too far in the future for the premade partitions
+        default = Event.objects.create(
+            action=EventAction.LOGIN,
+            created=now() + timedelta(days=400),
+            expires=now() - timedelta(days=1),
+        )
+        drop_expired_partitions()
+        self.assertTrue(Event.objects.filter(pk__in=[expired.pk, default.pk]).exists())
+        self.assertEqual(clean_expired(Event).deleted, 2)
+        self.assertEqual(
+            list(Event.objects.values_list("pk", flat=True)), [self.recent.pk]
+        )
+
+    def test_model_counts(self):
+        """Test partitioned tables are counted with the estimates of their partitions"""
+        partition_event_table("monthly")
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE "{Event._meta.db_table}"')
+        with patch(
+            "authentik.core.tasks.EXACT_COUNT_THRESHOLD", 1
+        ), CaptureQueriesContext(connection) as queries:
+            counts = get_model_counts()
+        self.assertEqual(counts[("authentik_events", "event")], 2)
+        self.assertFalse(
+            any(
+                f'"{Event._meta.db_table}"' in query["sql"] and "COUNT" in query["sql"]
+                for query in queries
+            )
+        )
@@ -0,0 +1,45 @@
+"""event rollup tests"""
+from unittest.mock import patch
+
+from django.db import DatabaseError
+from django.test import TestCase
+
+from authentik.core.models import Application, User
+from authentik.events.models import Event, EventAction, EventRollup
+
+
+class TestEventRollups(TestCase):
+    """Test event rollups"""
+
+    def setUp(self):
+        self.user = User.objects.get(username="akadmin")
+
+    def test_record(self):
+        """Test events are counted as they are saved"""
+        app = Application.objects.create(name="test", slug="test")
+        for _ in range(3):
+            Event.new(
+                EventAction.AUTHORIZE_APPLICATION, authorized_application=app
+            ).set_user(self.user).save()
+        rollup = EventRollup.objects.get(action=EventAction.AUTHORIZE_APPLICATION)
+        self.assertEqual(rollup.count, 3)
+        self.assertEqual(rollup.application, app.pk.hex)
+        self.assertEqual(rollup.user_pk, self.user.pk)
+        self.assertEqual(rollup.username, self.user.username)
+        self.assertEqual(rollup.hour.minute, 0)
+
+    def test_login_failed(self):
+        """Test failed logins are counted for the attempted username"""
+        Event.new(EventAction.LOGIN_FAILED, username="foo").save()
+        rollup = EventRollup.objects.get(action=EventAction.LOGIN_FAILED)
+        self.assertEqual(rollup.username, "foo")
+        self.assertEqual(rollup.application, "")
+
+    def test_record_failed(self):
+        """Test events aren't saved when they can't be counted"""
+        event = Event.new(EventAction.LOGIN_FAILED, username="foo")
+        with patch(
+            "authentik.events.models.record_events", side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            event.save()
+        self.assertFalse(Event.objects.filter(pk=event.pk).exists())
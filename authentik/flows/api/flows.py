@@ -2,7 +2,6 @@
 from dataclasses import dataclass
 from typing import Optional
 
-from django.core.cache import cache
 from django.db.models import Model
 from django.http.response import HttpResponseBadRequest, JsonResponse
 from django.urls import reverse
@@ -28,11 +27,17 @@ from authentik.api.decorators import permission_required
 from authentik.core.api.utils import CacheSerializer, LinkSerializer
 from authentik.flows.exceptions import FlowNonApplicableException
 from authentik.flows.models import Flow
-from authentik.flows.planner import PLAN_CONTEXT_PENDING_USER, FlowPlanner, cache_key
+from authentik.flows.planner import (
+    CACHE_VERSION_FLOWS,
+    PLAN_CONTEXT_PENDING_USER,
+    FlowPlanner,
+    cache_version_namespace,
+)
 from authentik.flows.transfer.common import DataclassEncoder
 from authentik.flows.transfer.exporter import FlowExporter
 from authentik.flows.transfer.importer import FlowImporter
 from authentik.flows.views import SESSION_KEY_PLAN
+from authentik.lib.utils.cache import bump_version, clear_tracked, count_tracked
 from authentik.lib.views import bad_request_message
 
 LOGGER = get_logger()
@@ -55,7 +60,7 @@ class FlowSerializer(ModelSerializer):
 
     def get_cache_count(self, flow: Flow) -> int:
         """Get count of cached flows"""
-        return len(cache.keys(f"{cache_key(flow)}*"))
+        return count_tracked(cache_version_namespace(flow.pk))
 
     class Meta:
 
@@ -116,7 +121,7 @@ class FlowViewSet(ModelViewSet):
     @action(detail=False, pagination_class=None, filter_backends=[])
     def cache_info(self, request: Request) -> Response:
         """Info about cached flows"""
-        return Response(data={"count": len(cache.keys("flow_*"))})
+        return Response(data={"count": count_tracked(CACHE_VERSION_FLOWS)})
 
     @permission_required(None, ["authentik_flows.clear_flow_cache"])
     @extend_schema(
@@ -129,9 +134,15 @@ class FlowViewSet(ModelViewSet):
     @action(detail=False, methods=["POST"])
     def cache_clear(self, request: Request) -> Response:
         """Clear flow cache"""
-        keys = cache.keys("flow_*")
-        cache.delete_many(keys)
-        LOGGER.debug("Cleared flow cache", keys=len(keys))
+        bump_version(CACHE_VERSION_FLOWS)
+        clear_tracked(
+            CACHE_VERSION_FLOWS,
+            *[
+                cache_version_namespace(pk)
+                for pk in Flow.objects.values_list("pk", flat=True)
+            ],
+        )
+        LOGGER.debug("Cleared flow cache")
         return Response(status=204)
 
     @permission_required(
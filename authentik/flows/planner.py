@@ -1,9 +1,16 @@
 """Flows Planner"""
+from copy import copy
 from dataclasses import dataclass, field
-from typing import Any, Optional
+from pickle import dumps, loads  # nosec
+from typing import Any, Optional, Union
+from uuid import UUID
 
+from django.apps import apps
 from django.core.cache import cache
+from django.db.models import Model
+from django.db.models.base import ModelState
 from django.http import HttpRequest
+from django.utils.functional import SimpleLazyObject
 from prometheus_client import Histogram
 from sentry_sdk.hub import Hub
 from sentry_sdk.tracing import Span
@@ -14,7 +21,9 @@ from authentik.events.models import cleanse_dict
 from authentik.flows.exceptions import EmptyFlowException, FlowNonApplicableException
 from authentik.flows.markers import ReevaluateMarker, StageMarker
 from authentik.flows.models import Flow, FlowStageBinding, Stage
+from authentik.lib.utils.cache import count_tracked, get_versions, set_tracked
 from authentik.policies.engine import PolicyEngine
+from authentik.policies.models import PolicyBinding
 from authentik.root.monitoring import UpdatingGauge
 
 LOGGER = get_logger()
@@ -23,24 +32,117 @@ PLAN_CONTEXT_SSO = "is_sso"
 PLAN_CONTEXT_REDIRECT = "redirect"
 PLAN_CONTEXT_APPLICATION = "application"
 PLAN_CONTEXT_SOURCE = "source"
+# Cache version of all flow plans, bumped when the flow cache is cleared
+CACHE_VERSION_FLOWS = "flow"
 GAUGE_FLOWS_CACHED = UpdatingGauge(
     "authentik_flows_cached",
     "Cached flows",
-    update_func=lambda: len(cache.keys("flow_*")),
+    update_func=lambda: count_tracked(CACHE_VERSION_FLOWS),
 )
 HIST_FLOWS_PLAN_TIME = Histogram(
     "authentik_flows_plan_time",
     "Duration to build a plan for a flow",
     ["flow_slug"],
 )
+HIST_FLOWS_PLAN_SIZE = Histogram(
+    "authentik_flows_plan_size",
+    "Size of serialized flow plans in bytes",
+    buckets=(256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536),
+)
+# Stages and bindings referenced by flow plans, keyed by (model label, pk) and
+# stored with the flow cache version they were loaded with
+_MODEL_CACHE: dict[tuple[str, Any], tuple[str, Model]] = {}
+
+
+def cache_version_namespace(flow_pk: Union[UUID, str]) -> str:
+    """Namespace of the cache version of a single flow, bumped when the flow,
+    its bindings or its stages are changed. Also used as index of the flow's plans.
+    `flow_pk` is either the flow's UUID, or its hex representation as used in plans."""
+    if isinstance(flow_pk, UUID):
+        flow_pk = flow_pk.hex
+    return f"flow_{flow_pk}"
+
+
+def cache_key(flow: Flow) -> str:
+    """Generate Cache key for the skeleton of flow"""
+    namespace = cache_version_namespace(flow.pk)
+    versions = get_versions(CACHE_VERSION_FLOWS, namespace)
+    return f"flow_{flow.pk}_{versions[CACHE_VERSION_FLOWS]}.{versions[namespace]}"
+
+
+def model_ref(instance: Model) -> tuple[str, Any]:
+    """Reference to a saved model instance"""
+    return (instance._meta.label_lower, instance.pk)
+
+
+def resolve_refs(
+    refs: list[tuple[str, Any]], version: str
+) -> dict[tuple[str, Any], Model]:
+    """Get the instances of `refs` from the per-process cache, and load the instances
+    which are missing or were cached with another `version` with one query per model"""
+    found = {}
+    missing: dict[str, list[Any]] = {}
+    for ref in refs:
+        cached = _MODEL_CACHE.get(ref)
+        if cached and cached[0] == version:
+            found[ref] = copy(cached[1])
+        else:
+            missing.setdefault(ref[0], []).append(ref[1])
+    for label, pks in missing.items():
+        for pk, instance in apps.get_model(label).objects.in_bulk(pks).items():
+            _MODEL_CACHE[(label, pk)] = (version, instance)
+            found[(label, pk)] = copy(instance)
+    return found
+
+
+@dataclass
+class ContextModel:
+    """Model instance stored in a plan's context. Only the instance's own attributes
+    are kept, so unsaved changes survive, but cached relations are dropped."""
+
+    label: str
+    attrs: dict[str, Any]
+    adding: bool
+    db: Optional[str]
+
+    @staticmethod
+    def from_instance(instance: Model) -> "ContextModel":
+        """Wrap `instance`"""
+        attrs = {
+            key: value
+            for key, value in instance.__dict__.items()
+            if key not in ("_state", "_prefetched_objects_cache")
+        }
+        return ContextModel(
+            instance._meta.label_lower,
+            attrs,
+            instance._state.adding,
+            instance._state.db,
+        )
+
+    def to_instance(self) -> Model:
+        """Re-create the wrapped instance"""
+        model = apps.get_model(self.label)
+        instance = model.__new__(model)
+        instance.__dict__.update(self.attrs)
+        instance._state = ModelState()
+        instance._state.adding = self.adding
+        instance._state.db = self.db
+        return instance
+
 
+class LazyUser(SimpleLazyObject):
+    """User which is only loaded when it's accessed, and can be serialized again
+    without loading it"""
 
-def cache_key(flow: Flow, user: Optional[User] = None) -> str:
-    """Generate Cache key for flow"""
-    prefix = f"flow_{flow.pk}"
-    if user:
-        prefix += f"#{user.pk}"
-    return prefix
+    def __init__(self, user_pk: int):
+        self.__dict__["user_pk"] = user_pk
+        super().__init__(lambda: User.objects.get(pk=user_pk))
+
+
+def _load_plan(data: bytes) -> "FlowPlan":
+    """Unpickle a plan serialized by `FlowPlan.__reduce__`"""
+    return FlowPlan.from_compact(loads(data))  # nosec
 
 
 @dataclass
@@ -94,6 +196,98 @@ class FlowPlan:
         """Check if there are any stages left in this plan"""
         return len(self.markers) + len(self.stages) > 0
 
+    def to_compact(self) -> dict[str, Any]:
+        """Compact representation of this plan, which references stages and bindings
+        by their primary key instead of containing them"""
+        markers = []
+        for marker in self.markers:
+            if isinstance(marker, ReevaluateMarker):
+                user = marker.user
+                if isinstance(user, LazyUser):
+                    marker = (model_ref(marker.binding), user.user_pk, None)
+                elif isinstance(user, Model) and user.pk is not None:
+                    marker = (model_ref(marker.binding), user.pk, None)
+                else:
+                    marker = (model_ref(marker.binding), None, user)
+            markers.append(marker)
+        context = {}
+        for key, value in self.context.items():
+            if isinstance(value, Model):
+                value = ContextModel.from_instance(value)
+            context[key] = value
+        return {
+            "flow_pk": self.flow_pk,
+            # In-memory stages aren't saved, and are kept as they are
+            "stages": [
+                stage if stage._state.adding else model_ref(stage)
+                for stage in self.stages
+            ],
+            "markers": markers,
+            "context": context,
+        }
+
+    @staticmethod
+    def from_compact(data: dict[str, Any]) -> "FlowPlan":
+        """Re-create a plan from `to_compact`. Stages and bindings are taken from the
+        per-process cache, as long as the flow wasn't changed since they were cached,
+        users of re-evaluation markers are only loaded when they're used."""
+        flow_pk = data["flow_pk"]
+        namespace = cache_version_namespace(flow_pk)
+        versions = get_versions(CACHE_VERSION_FLOWS, namespace)
+        refs = [stage for stage in data["stages"] if isinstance(stage, tuple)]
+        refs += [marker[0] for marker in data["markers"] if isinstance(marker, tuple)]
+        instances = resolve_refs(
+            refs, f"{versions[CACHE_VERSION_FLOWS]}.{versions[namespace]}"
+        )
+        plan = FlowPlan(flow_pk=flow_pk)
+        for stage in data["stages"]:
+            if isinstance(stage, tuple):
+                stage = instances.get(stage)
+            plan.stages.append(stage)
+        for marker in data["markers"]:
+            if isinstance(marker, tuple):
+                binding_ref, user_pk, user = marker
+                if user_pk is not None:
+                    user = LazyUser(user_pk)
+                binding = instances.get(binding_ref)
+                marker = (
+                    ReevaluateMarker(binding=binding, user=user) if binding else None
+                )
+            plan.markers.append(marker)
+        for idx in reversed(range(len(plan.stages))):
+            marker = plan.markers[idx] if idx < len(plan.markers) else True
+            if plan.stages[idx] and marker:
+                continue
+            LOGGER.warning(
+                "f(plan): stage was deleted, skipping", stage=data["stages"][idx]
+            )
+            del plan.stages[idx]
+            if idx < len(plan.markers):
+                del plan.markers[idx]
+        for key, value in data["context"].items():
+            if isinstance(value, ContextModel):
+                value = value.to_instance()
+            plan.context[key] = value
+        return plan
+
+    def __reduce__(self):
+        data = dumps(self.to_compact())
+        HIST_FLOWS_PLAN_SIZE.observe(len(data))
+        return (_load_plan, (data,))
+
+
+@dataclass
+class FlowPlanSkeleton:
+    """User-independent part of a flow's plan, which is cached once for every version
+    of the flow. Holds all of the flow's stage bindings in order, and which of them
+    have policies that have to be evaluated when planning."""
+
+    flow_pk: str
+
+    bindings: list[FlowStageBinding] = field(default_factory=list)
+    # pbm_uuid of bindings with enabled policy bindings
+    evaluated: set[UUID] = field(default_factory=set)
+
 
 class FlowPlanner:
     """Execute all policies to plan out a flat list of all Stages
@@ -126,7 +320,7 @@ class FlowPlanner:
                 "f(plan): starting planning process",
             )
             # Bit of a workaround here, if there is a pending user set in the default context
-            # we use that user for our cache key
+            # we use that user to evaluate policies
             # to make sure they don't get the generic response
             if default_context and PLAN_CONTEXT_PENDING_USER in default_context:
                 user = default_context[PLAN_CONTEXT_PENDING_USER]
@@ -142,35 +336,59 @@ class FlowPlanner:
             result = engine.result
             if not result.passing:
                 raise FlowNonApplicableException(",".join(result.messages))
-            # User is passing so far, check if we have a cached plan
-            cached_plan_key = cache_key(self.flow, user)
-            cached_plan = cache.get(cached_plan_key, None)
-            if cached_plan and self.use_cache:
-                self._logger.debug(
-                    "f(plan): taking plan from cache",
-                    key=cached_plan_key,
-                )
-                # Reset the context as this isn't factored into caching
-                cached_plan.context = default_context or {}
-                return cached_plan
-            self._logger.debug(
-                "f(plan): building plan",
-            )
-            plan = self._build_plan(user, request, default_context)
-            cache.set(cache_key(self.flow, user), plan)
-            GAUGE_FLOWS_CACHED.update()
+            skeleton = self._get_skeleton()
+            plan = self._build_plan(skeleton, user, request, default_context)
             if not plan.stages and not self.allow_empty_flows:
                 raise EmptyFlowException()
             return plan
 
+    def _get_skeleton(self) -> FlowPlanSkeleton:
+        """Get the skeleton of this flow from the cache, or build and cache it"""
+        cached_key = cache_key(self.flow)
+        skeleton = cache.get(cached_key, None)
+        if skeleton and self.use_cache:
+            self._logger.debug(
+                "f(plan): taking skeleton from cache",
+                key=cached_key,
+            )
+            return skeleton
+        self._logger.debug(
+            "f(plan): building skeleton",
+        )
+        skeleton = FlowPlanSkeleton(flow_pk=self.flow.pk.hex)
+        for binding in FlowStageBinding.objects.filter(
+            target__pk=self.flow.pk
+        ).order_by("order"):
+            # Load the stage, so it's cached with the binding
+            binding.stage  # pylint: disable=pointless-statement
+            skeleton.bindings.append(binding)
+        skeleton.evaluated = set(
+            PolicyBinding.objects.filter(
+                target__in=[
+                    binding.pbm_uuid
+                    for binding in skeleton.bindings
+                    if binding.evaluate_on_plan
+                ],
+                enabled=True,
+            ).values_list("target_id", flat=True)
+        )
+        set_tracked(
+            cached_key,
+            skeleton,
+            [CACHE_VERSION_FLOWS, cache_version_namespace(self.flow.pk)],
+        )
+        GAUGE_FLOWS_CACHED.update()
+        return skeleton
+
     def _build_plan(
         self,
+        skeleton: FlowPlanSkeleton,
         user: User,
         request: HttpRequest,
         default_context: Optional[dict[str, Any]],
     ) -> FlowPlan:
-        """Build flow plan by checking each stage in their respective
-        order and checking the applied policies"""
+        """Build flow plan from the flow's skeleton, only evaluating the policies
+        of stage bindings which have any"""
         with Hub.current.start_span(
             op="flow.planner.build_plan"
         ) as span, HIST_FLOWS_PLAN_TIME.labels(flow_slug=self.flow.slug).time():
@@ -183,13 +401,11 @@ class FlowPlanner:
             if default_context:
                 plan.context = default_context
             # Check Flow policies
-            for binding in FlowStageBinding.objects.filter(
-                target__pk=self.flow.pk
-            ).order_by("order"):
+            for binding in skeleton.bindings:
                 binding: FlowStageBinding
                 stage = binding.stage
                 marker = StageMarker()
-                if binding.evaluate_on_plan:
+                if binding.pbm_uuid in skeleton.evaluated:
                     self._logger.debug(
                         "f(plan): evaluating on plan",
                         stage=binding.stage,
@@ -217,7 +433,6 @@ class FlowPlanner:
                     marker = ReevaluateMarker(binding=binding, user=user)
                 if stage:
                     plan.append(stage, marker)
-            HIST_FLOWS_PLAN_TIME.labels(flow_slug=self.flow.slug)
         self._logger.debug(
             "f(plan): finished building",
         )
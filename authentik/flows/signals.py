@@ -1,37 +1,56 @@
 """authentik flow signals"""
-from django.core.cache import cache
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from structlog.stdlib import get_logger
 
+from authentik.lib.utils.cache import bump_version, clear_tracked
+
 LOGGER = get_logger()
 
 
-def delete_cache_prefix(prefix: str) -> int:
-    """Delete keys prefixed with `prefix` and return count of deleted keys."""
-    keys = cache.keys(prefix)
-    cache.delete_many(keys)
-    return len(keys)
+def invalidate_flows(*flow_pks: str):
+    """Invalidate cached plans of all flows in `flow_pks`"""
+    from authentik.flows.planner import cache_version_namespace
+
+    namespaces = [cache_version_namespace(pk) for pk in flow_pks]
+    bump_version(*namespaces)
+    clear_tracked(*namespaces)
 
 
 @receiver(post_save)
+@receiver(post_delete, sender="authentik_flows.Flow")
+@receiver(post_delete, sender="authentik_flows.FlowStageBinding")
+@receiver(post_delete, sender="authentik_flows.Stage")
+@receiver(post_delete, sender="authentik_policies.PolicyBinding")
 # pylint: disable=unused-argument
 def invalidate_flow_cache(sender, instance, **_):
-    """Invalidate flow cache when flow is updated"""
+    """Invalidate flow cache when flow is updated or deleted"""
     from authentik.flows.models import Flow, FlowStageBinding, Stage
-    from authentik.flows.planner import cache_key
+    from authentik.policies.models import PolicyBinding
 
     if isinstance(instance, Flow):
-        total = delete_cache_prefix(f"{cache_key(instance)}*")
-        LOGGER.debug("Invalidating Flow cache", flow=instance, len=total)
+        invalidate_flows(instance.pk)
+        LOGGER.debug("Invalidating Flow cache", flow=instance)
     if isinstance(instance, FlowStageBinding):
-        total = delete_cache_prefix(f"{cache_key(instance.target)}*")
+        invalidate_flows(instance.target_id)
+        LOGGER.debug("Invalidating Flow cache from FlowStageBinding", binding=instance)
+    if isinstance(instance, Stage):
+        flow_pks = set(
+            FlowStageBinding.objects.filter(stage=instance).values_list(
+                "target_id", flat=True
+            )
+        )
+        invalidate_flows(*flow_pks)
         LOGGER.debug(
-            "Invalidating Flow cache from FlowStageBinding", binding=instance, len=total
+            "Invalidating Flow cache from Stage", stage=instance, len=len(flow_pks)
         )
-    if isinstance(instance, Stage):
-        total = 0
-        for binding in FlowStageBinding.objects.filter(stage=instance):
-            prefix = cache_key(binding.target)
-            total += delete_cache_prefix(f"{prefix}*")
-        LOGGER.debug("Invalidating Flow cache from Stage", stage=instance, len=total)
+    if isinstance(instance, PolicyBinding):
+        # Plan skeletons record which stage bindings have policies
+        flow_pks = set(
+            FlowStageBinding.objects.filter(pbm_uuid=instance.target_id).values_list(
+                "target_id", flat=True
+            )
+        )
+        if flow_pks:
+            invalidate_flows(*flow_pks)
+            LOGGER.debug("Invalidating Flow cache from PolicyBinding", binding=instance)
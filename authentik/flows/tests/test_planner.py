@@ -1,4 +1,5 @@
 """flow planner tests"""
+from pickle import dumps, loads  # nosec
 from unittest.mock import MagicMock, Mock, PropertyMock, patch
 
 from django.contrib.sessions.middleware import SessionMiddleware
@@ -12,7 +13,13 @@ from authentik.core.models import User
 from authentik.flows.exceptions import EmptyFlowException, FlowNonApplicableException
 from authentik.flows.markers import ReevaluateMarker, StageMarker
 from authentik.flows.models import Flow, FlowDesignation, FlowStageBinding
-from authentik.flows.planner import PLAN_CONTEXT_PENDING_USER, FlowPlanner, cache_key
+from authentik.flows.planner import (
+    PLAN_CONTEXT_PENDING_USER,
+    FlowPlan,
+    FlowPlanner,
+    cache_key,
+)
+from authentik.lib.utils.cache import set_tracked
 from authentik.policies.dummy.models import DummyPolicy
 from authentik.policies.models import PolicyBinding
 from authentik.policies.types import PolicyResult
@@ -20,6 +27,7 @@ from authentik.stages.dummy.models import DummyStage
 
 POLICY_RETURN_FALSE = PropertyMock(return_value=PolicyResult(False))
 CACHE_MOCK = Mock(wraps=cache)
+SET_TRACKED_MOCK = Mock(wraps=set_tracked)
 
 POLICY_RETURN_TRUE = MagicMock(return_value=PolicyResult(True))
 
@@ -72,6 +80,7 @@ class TestFlowPlanner(TestCase):
             planner.plan(request)
 
     @patch("authentik.flows.planner.cache", CACHE_MOCK)
+    @patch("authentik.flows.planner.set_tracked", SET_TRACKED_MOCK)
     def test_planner_cache(self):
         """Test planner cache"""
         flow = Flow.objects.create(
@@ -90,12 +99,12 @@ class TestFlowPlanner(TestCase):
         planner = FlowPlanner(flow)
         planner.plan(request)
         self.assertEqual(
-            CACHE_MOCK.set.call_count, 1
+            SET_TRACKED_MOCK.call_count, 1
         )  # Ensure plan is written to cache
         planner = FlowPlanner(flow)
         planner.plan(request)
         self.assertEqual(
-            CACHE_MOCK.set.call_count, 1
+            SET_TRACKED_MOCK.call_count, 1
         )  # Ensure nothing is written to cache
         self.assertEqual(CACHE_MOCK.get.call_count, 2)  # Get is called twice
 
@@ -117,7 +126,7 @@ class TestFlowPlanner(TestCase):
         request.user = user
         planner = FlowPlanner(flow)
         planner.plan(request, default_context={PLAN_CONTEXT_PENDING_USER: user})
-        key = cache_key(flow, user)
+        key = cache_key(flow)
         self.assertTrue(cache.get(key) is not None)
 
     def test_planner_marker_reevaluate(self):
@@ -187,3 +196,85 @@ class TestFlowPlanner(TestCase):
 
             self.assertIsInstance(plan.markers[0], StageMarker)
             self.assertIsInstance(plan.markers[1], ReevaluateMarker)
+
+    def test_plan_serialization(self):
+        """Test plans are serialized by reference, and re-created from the cache"""
+        flow = Flow.objects.create(
+            name="test-serialization",
+            slug="test-serialization",
+            designation=FlowDesignation.AUTHENTICATION,
+        )
+        binding = FlowStageBinding.objects.create(
+            target=flow, stage=DummyStage.objects.create(name="dummy1"), order=0
+        )
+        binding2 = FlowStageBinding.objects.create(
+            target=flow,
+            stage=DummyStage.objects.create(name="dummy2"),
+            order=1,
+            re_evaluate_policies=True,
+        )
+        user = User.objects.get(username="akadmin")
+        user.name = "unsaved change"
+        plan = FlowPlan(flow_pk=flow.pk.hex)
+        plan.append(binding.stage)
+        plan.append(binding2.stage, ReevaluateMarker(binding=binding2, user=user))
+        plan.context[PLAN_CONTEXT_PENDING_USER] = user
+
+        data = dumps(plan)
+        self.assertNotIn(b"dummy1", data)
+        restored: FlowPlan = loads(data)  # nosec
+        self.assertEqual(restored.stages, [binding.stage, binding2.stage])
+        self.assertEqual(restored.markers[1].binding, binding2)
+        self.assertEqual(restored.context[PLAN_CONTEXT_PENDING_USER], user)
+        self.assertEqual(
+            restored.context[PLAN_CONTEXT_PENDING_USER].name, "unsaved change"
+        )
+        # Stages and bindings are now taken from the per-process cache
+        with self.assertNumQueries(0):
+            restored = loads(data)  # nosec
+        # Users of markers are loaded lazily, also when serializing again
+        with self.assertNumQueries(0):
+            restored = loads(dumps(restored))  # nosec
+        self.assertEqual(restored.markers[1].user.pk, user.pk)
+
+        binding2.stage.delete()
+        restored = loads(data)  # nosec
+        self.assertEqual(restored.stages, [binding.stage])
+        self.assertEqual(len(restored.markers), 1)
+
+    def test_planner_skeleton(self):
+        """Test skeletons are shared between users, and invalidated by policy bindings"""
+        flow = Flow.objects.create(
+            name="test-skeleton",
+            slug="test-skeleton",
+            designation=FlowDesignation.AUTHENTICATION,
+        )
+        binding = FlowStageBinding.objects.create(
+            target=flow, stage=DummyStage.objects.create(name="dummy1"), order=0
+        )
+        binding2 = FlowStageBinding.objects.create(
+            target=flow, stage=DummyStage.objects.create(name="dummy2"), order=1
+        )
+        request = self.request_factory.get(
+            reverse("authentik_api:flow-executor", kwargs={"flow_slug": flow.slug}),
+        )
+        request.user = get_anonymous_user()
+        FlowPlanner(flow).plan(request)
+        skeleton = cache.get(cache_key(flow))
+        self.assertEqual(skeleton.bindings, [binding, binding2])
+        self.assertEqual(skeleton.evaluated, set())
+
+        request.user = User.objects.get(username="akadmin")
+        with patch("authentik.flows.planner.set_tracked") as set_tracked_mock:
+            plan = FlowPlanner(flow).plan(request)
+            set_tracked_mock.assert_not_called()
+        self.assertEqual(plan.stages, [binding.stage, binding2.stage])
+
+        PolicyBinding.objects.create(
+            policy=DummyPolicy.objects.create(result=False, wait_min=1, wait_max=2),
+            target=binding2,
+            order=0,
+        )
+        plan = FlowPlanner(flow).plan(request)
+        self.assertEqual(cache.get(cache_key(flow)).evaluated, {binding2.pbm_uuid})
+        self.assertEqual(plan.stages, [binding.stage])
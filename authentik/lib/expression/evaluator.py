@@ -1,19 +1,42 @@
 """authentik expression policy evaluator"""
 import re
+from functools import lru_cache
 from textwrap import indent
+from types import CodeType
 from typing import Any, Iterable, Optional
 
-from requests import Session
 from rest_framework.serializers import ValidationError
 from sentry_sdk.hub import Hub
 from sentry_sdk.tracing import Span
 from structlog.stdlib import get_logger
 
+from authentik.core.authorization import get_authorization, get_user_by
 from authentik.core.models import User
+from authentik.lib.utils.http import get_http_session
 
 LOGGER = get_logger()
 
 
+def wrap_expression(expression: str, params: Iterable[str]) -> str:
+    """Wrap expression in a function, call it, and save the result as `result`"""
+    handler_signature = ",".join(params)
+    full_expression = ""
+    full_expression += "from ipaddress import ip_address, ip_network\n"
+    full_expression += f"def handler({handler_signature}):\n"
+    full_expression += indent(expression, "    ")
+    full_expression += f"\nresult = handler({handler_signature})"
+    return full_expression
+
+
+@lru_cache(maxsize=512)
+def compile_expression(
+    expression: str, params: tuple[str, ...], filename: str
+) -> CodeType:
+    """Wrap and compile expression. Compiled expressions are cached per process, and the
+    cache is cleared whenever an expression policy or property mapping is saved."""
+    return compile(wrap_expression(expression, params), filename, "exec")
+
+
 class BaseEvaluator:
     """Validate and evaluate python-based expressions"""
 
@@ -33,8 +56,8 @@ class BaseEvaluator:
             "regex_replace": BaseEvaluator.expr_filter_regex_replace,
             "ak_is_group_member": BaseEvaluator.expr_func_is_group_member,
             "ak_user_by": BaseEvaluator.expr_func_user_by,
-            "ak_logger": get_logger(),
-            "requests": Session(),
+            "ak_logger": LOGGER,
+            "requests": get_http_session(),
         }
         self._context = {}
         self._filename = "BaseEvalautor"
@@ -52,25 +75,16 @@ class BaseEvaluator:
     @staticmethod
     def expr_func_user_by(**filters) -> Optional[User]:
         """Get user by filters"""
-        users = User.objects.filter(**filters)
-        if users:
-            return users.first()
-        return None
+        return get_user_by(**filters)
 
     @staticmethod
     def expr_func_is_group_member(user: User, **group_filters) -> bool:
         """Check if `user` is member of group with name `group_name`"""
-        return user.ak_groups.filter(**group_filters).exists()
+        return get_authorization(user).is_member(**group_filters)
 
     def wrap_expression(self, expression: str, params: Iterable[str]) -> str:
         """Wrap expression in a function, call it, and save the result as `result`"""
-        handler_signature = ",".join(params)
-        full_expression = ""
-        full_expression += "from ipaddress import ip_address, ip_network\n"
-        full_expression += f"def handler({handler_signature}):\n"
-        full_expression += indent(expression, "    ")
-        full_expression += f"\nresult = handler({handler_signature})"
-        return full_expression
+        return wrap_expression(expression, params)
 
     def evaluate(self, expression_source: str) -> Any:
         """Parse and evaluate expression. If the syntax is incorrect, a SyntaxError is raised.
@@ -79,12 +93,10 @@ class BaseEvaluator:
         with Hub.current.start_span(op="lib.evaluator.evaluate") as span:
             span: Span
             span.set_data("expression", expression_source)
-            param_keys = self._context.keys()
+            param_keys = tuple(self._context.keys())
             try:
-                ast_obj = compile(
-                    self.wrap_expression(expression_source, param_keys),
-                    self._filename,
-                    "exec",
+                ast_obj = compile_expression(
+                    expression_source, param_keys, self._filename
                 )
             except (SyntaxError, ValueError) as exc:
                 self.handle_error(exc, expression_source)
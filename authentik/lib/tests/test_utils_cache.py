@@ -0,0 +1,53 @@
+"""Test cache utils"""
+from django.core.cache import cache
+from django.test import TestCase
+
+from authentik.lib.utils.cache import (
+    bump_version,
+    clear_tracked,
+    count_tracked,
+    get_tracked,
+    get_version,
+    get_versions,
+    set_tracked,
+    untrack,
+)
+
+
+class TestCacheUtils(TestCase):
+    """Test cache-utils"""
+
+    def setUp(self):
+        clear_tracked("test-index")
+
+    def test_version(self):
+        """Test versions are stable until bumped"""
+        version = get_version("test-a")
+        self.assertEqual(get_version("test-a"), version)
+        bump_version("test-a")
+        self.assertGreater(get_version("test-a"), version)
+        versions = get_versions("test-a", "test-b")
+        self.assertEqual(versions["test-a"], get_version("test-a"))
+        self.assertEqual(versions["test-b"], get_version("test-b"))
+
+    def test_version_evicted(self):
+        """Test bumping a version which was evicted from the cache"""
+        version = get_version("test-evicted")
+        cache.delete("goauthentik.io/cache/version/test-evicted")
+        bump_version("test-evicted")
+        self.assertGreaterEqual(get_version("test-evicted"), version)
+
+    def test_tracked(self):
+        """Test keys are tracked in indexes"""
+        set_tracked("test-key-a", "foo", ["test-index"])
+        set_tracked("test-key-b", "bar", ["test-index"], timeout=None)
+        set_tracked("test-key-c", "baz", ["test-index"], timeout=-1)
+        self.assertEqual(cache.get("test-key-a"), "foo")
+        self.assertEqual(count_tracked("test-index"), 2)
+        self.assertEqual(
+            sorted(get_tracked("test-index")), ["test-key-a", "test-key-b"]
+        )
+        untrack("test-index", "test-key-a")
+        self.assertEqual(get_tracked("test-index"), ["test-key-b"])
+        clear_tracked("test-index")
+        self.assertEqual(count_tracked("test-index"), 0)
@@ -0,0 +1,126 @@
+"""cache helpers"""
+from time import time
+from typing import Any, Optional
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from structlog.stdlib import get_logger
+
+LOGGER = get_logger()
+
+
+def _version_key(namespace: str) -> str:
+    return f"goauthentik.io/cache/version/{namespace}"
+
+
+def _index_key(index: str) -> str:
+    # The index is accessed with the raw redis client, so the key has to be prefixed
+    # the same way the cache prefixes its keys
+    return cache.make_key(f"goauthentik.io/cache/index/{index}")
+
+
+def _initial_version() -> int:
+    """Versions start at the current time in milliseconds, so that a version key which
+    was evicted never starts over at a version which was used before"""
+    return int(time() * 1000)
+
+
+def get_versions(*namespaces: str) -> dict[str, int]:
+    """Get the current version of all `namespaces`, to be embedded into cache keys"""
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys.keys())
+    versions = {}
+    for key, namespace in keys.items():
+        if key not in found:
+            version = _initial_version()
+            # Another process might have initialised the version in the meantime
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            found[key] = version
+        versions[namespace] = found[key]
+    return versions
+
+
+def get_version(namespace: str) -> int:
+    """Get the current version of `namespace`"""
+    return get_versions(namespace)[namespace]
+
+
+def bump_version(*namespaces: str):
+    """Invalidate all keys which were built with the current version of `namespaces`.
+    Keys of old versions are never read again and expire on their own."""
+    for namespace in namespaces:
+        key = _version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), timeout=None)
+
+
+def set_tracked(
+    key: str, value: Any, indexes: list[str], timeout: Optional[int] = DEFAULT_TIMEOUT
+) -> Any:
+    """Set `key` in the cache and record it in all `indexes`, so cached keys can be
+    listed and counted without scanning the keyspace"""
+    result = cache.set(key, value, timeout=timeout)
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = cache.default_timeout
+    expires = time() + timeout if timeout is not None else "+inf"
+    try:
+        client = get_redis_connection()
+        pipeline = client.pipeline()
+        for index in indexes:
+            pipeline.zadd(_index_key(index), {key: expires})
+        pipeline.execute()
+    except (RedisError, NotImplementedError) as exc:
+        LOGGER.warning("Failed to update cache index", exc=exc)
+    return result
+
+
+def untrack(index: str, *keys: str):
+    """Remove `keys` from `index`, for keys which are deleted from the cache"""
+    if not keys:
+        return
+    try:
+        get_redis_connection().zrem(_index_key(index), *keys)
+    except (RedisError, NotImplementedError) as exc:
+        LOGGER.warning("Failed to update cache index", exc=exc)
+
+
+def get_tracked(index: str) -> list[str]:
+    """Get all keys in `index` which haven't expired yet"""
+    try:
+        client = get_redis_connection()
+        pipeline = client.pipeline()
+        pipeline.zremrangebyscore(_index_key(index), "-inf", time())
+        pipeline.zrange(_index_key(index), 0, -1)
+        return [key.decode() for key in pipeline.execute()[1]]
+    except (RedisError, NotImplementedError) as exc:
+        LOGGER.warning("Failed to read cache index", exc=exc)
+        return []
+
+
+def count_tracked(index: str) -> int:
+    """Count keys in `index` which haven't expired yet. Keys which were invalidated
+    by a version bump are counted until they expire, unless the index is cleared."""
+    try:
+        client = get_redis_connection()
+        pipeline = client.pipeline()
+        pipeline.zremrangebyscore(_index_key(index), "-inf", time())
+        pipeline.zcard(_index_key(index))
+        return pipeline.execute()[1]
+    except (RedisError, NotImplementedError) as exc:
+        LOGGER.warning("Failed to count cache index", exc=exc)
+        return 0
+
+
+def clear_tracked(*indexes: str):
+    """Remove all keys from `indexes`"""
+    if not indexes:
+        return
+    try:
+        get_redis_connection().delete(*[_index_key(index) for index in indexes])
+    except (RedisError, NotImplementedError) as exc:
+        LOGGER.warning("Failed to clear cache index", exc=exc)
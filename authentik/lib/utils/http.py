@@ -1,11 +1,17 @@
 """http helpers"""
+from os import getpid
 from typing import Any, Optional
 
 from django.http import HttpRequest
+from requests.adapters import HTTPAdapter
+from requests.sessions import Session
 
 OUTPOST_REMOTE_IP_HEADER = "HTTP_X_AUTHENTIK_REMOTE_IP"
 USER_ATTRIBUTE_CAN_OVERRIDE_IP = "goauthentik.io/user/override-ips"
 
+_ADAPTER: Optional[HTTPAdapter] = None
+_ADAPTER_PID: Optional[int] = None
+
 
 def _get_client_ip_from_meta(meta: dict[str, Any]) -> Optional[str]:
     """Attempt to get the client's IP by checking common HTTP Headers.
@@ -46,3 +52,17 @@ def get_client_ip(request: Optional[HttpRequest]) -> Optional[str]:
             return override
         return _get_client_ip_from_meta(request.META)
     return None
+
+
+def get_http_session() -> Session:
+    """Get a new requests session, which doesn't share cookies, headers or auth with
+    other sessions. Connections are pooled within the current process, so they can be
+    re-used. Forked processes get their own pool, to not share sockets."""
+    global _ADAPTER, _ADAPTER_PID  # pylint: disable=global-statement
+    if not _ADAPTER or _ADAPTER_PID != getpid():
+        _ADAPTER = HTTPAdapter()
+        _ADAPTER_PID = getpid()
+    session = Session()
+    session.mount("http://", _ADAPTER)
+    session.mount("https://", _ADAPTER)
+    return session
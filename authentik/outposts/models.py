@@ -33,6 +33,7 @@ from authentik.crypto.models import CertificateKeyPair
 from authentik.lib.config import CONFIG
 from authentik.lib.models import InheritanceForeignKey
 from authentik.lib.sentry import SentryIgnoredException
+from authentik.lib.utils.cache import get_tracked, set_tracked, untrack
 from authentik.lib.utils.http import USER_ATTRIBUTE_CAN_OVERRIDE_IP
 from authentik.outposts.controllers.k8s.utils import get_namespace
 from authentik.outposts.docker_tls import DockerInlineTLS
@@ -429,7 +430,7 @@ class OutpostState:
     @staticmethod
     def for_outpost(outpost: Outpost) -> list["OutpostState"]:
         """Get all states for an outpost"""
-        keys = cache.keys(f"{outpost.state_cache_prefix}_*")
+        keys = get_tracked(outpost.state_cache_prefix)
         states = []
         for key in keys:
             instance_uid = key.replace(f"{outpost.state_cache_prefix}_", "")
@@ -453,9 +454,12 @@ class OutpostState:
     def save(self, timeout=OUTPOST_HELLO_INTERVAL):
         """Save current state to cache"""
         full_key = f"{self._outpost.state_cache_prefix}_{self.uid}"
-        return cache.set(full_key, asdict(self), timeout=timeout)
+        return set_tracked(
+            full_key, asdict(self), [self._outpost.state_cache_prefix], timeout=timeout
+        )
 
     def delete(self):
         """Manually delete from cache, used on channel disconnect"""
         full_key = f"{self._outpost.state_cache_prefix}_{self.uid}"
         cache.delete(full_key)
+        untrack(self._outpost.state_cache_prefix, full_key)
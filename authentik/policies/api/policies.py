@@ -1,5 +1,4 @@
 """policy API Views"""
-from django.core.cache import cache
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiResponse, extend_schema
 from guardian.shortcuts import get_objects_for_user
@@ -13,16 +12,17 @@ from rest_framework.viewsets import GenericViewSet
 from structlog.stdlib import get_logger
 
 from authentik.api.decorators import permission_required
-from authentik.core.api.applications import user_app_cache_key
+from authentik.core.api.applications import CACHE_VERSION_USER_APPS
 from authentik.core.api.utils import (
     CacheSerializer,
     MetaNameSerializer,
     TypeCreateSerializer,
 )
+from authentik.lib.utils.cache import bump_version, clear_tracked, count_tracked
 from authentik.lib.utils.reflection import all_subclasses
 from authentik.policies.api.exec import PolicyTestResultSerializer, PolicyTestSerializer
 from authentik.policies.models import Policy, PolicyBinding
-from authentik.policies.process import PolicyProcess
+from authentik.policies.process import CACHE_VERSION_POLICIES, PolicyProcess
 from authentik.policies.types import PolicyRequest
 
 LOGGER = get_logger()
@@ -119,7 +119,7 @@ class PolicyViewSet(
     @action(detail=False, pagination_class=None, filter_backends=[])
     def cache_info(self, request: Request) -> Response:
         """Info about cached policies"""
-        return Response(data={"count": len(cache.keys("policy_*"))})
+        return Response(data={"count": count_tracked(CACHE_VERSION_POLICIES)})
 
     @permission_required(None, ["authentik_policies.clear_policy_cache"])
     @extend_schema(
@@ -132,12 +132,11 @@ class PolicyViewSet(
     @action(detail=False, methods=["POST"])
     def cache_clear(self, request: Request) -> Response:
         """Clear policy cache"""
-        keys = cache.keys("policy_*")
-        cache.delete_many(keys)
-        LOGGER.debug("Cleared Policy cache", keys=len(keys))
-        # Also delete user application cache
-        keys = cache.keys(user_app_cache_key("*"))
-        cache.delete_many(keys)
+        bump_version(CACHE_VERSION_POLICIES)
+        clear_tracked(CACHE_VERSION_POLICIES)
+        LOGGER.debug("Cleared Policy cache")
+        # Also invalidate user application cache
+        bump_version(CACHE_VERSION_USER_APPS)
         return Response(status=204)
 
     @permission_required("authentik_policies.view_policy")
@@ -0,0 +1,207 @@
+"""authentik policy engine for many objects at once"""
+from copy import copy
+from typing import Hashable, Optional
+from uuid import UUID
+
+from django.core.cache import cache
+from django.http import HttpRequest
+from sentry_sdk.hub import Hub
+from sentry_sdk.tracing import Span
+from structlog.stdlib import BoundLogger, get_logger
+
+from authentik.core.models import User
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.cache import set_tracked
+from authentik.policies.engine import (
+    PolicyProcessInfo,
+    get_bindings_many,
+    join_process,
+    start_process,
+)
+from authentik.policies.models import (
+    Policy,
+    PolicyBinding,
+    PolicyBindingModel,
+    PolicyEngineMode,
+)
+from authentik.policies.pool import get_pool
+from authentik.policies.process import CACHE_VERSION_POLICIES, PolicyProcess, cache_keys
+from authentik.policies.types import PolicyRequest, PolicyResult
+
+
+class BatchPolicyEngine:
+    """Check the policies of many objects for a single user in one pass.
+
+    All bindings are loaded at once and cached results are fetched with a single
+    cache lookup. Bindings which don't depend on the object they're bound to (group
+    and user bindings, and policies flagged as `obj_independent`) are evaluated once
+    for all objects that share them, everything else is evaluated in parallel."""
+
+    use_cache: bool
+    # Evaluate policies in the policy worker pool instead of forking a process per binding
+    use_pool: bool
+    request: PolicyRequest
+
+    logger: BoundLogger
+    # Allow objects with no policies attached to pass
+    empty_result: bool
+
+    __pbms: list[PolicyBindingModel]
+    __results: dict[UUID, PolicyResult]
+
+    def __init__(
+        self,
+        pbms: list[PolicyBindingModel],
+        user: User,
+        request: Optional[HttpRequest] = None,
+    ):
+        self.logger = get_logger().bind()
+        self.empty_result = True
+        self.__pbms = list(pbms)
+        self.request = PolicyRequest(user)
+        if request:
+            self.request.set_http_request(request)
+        self.__results = {}
+        self.use_cache = True
+        self.use_pool = CONFIG.y_bool("policies.pool.enabled")
+
+    def _request_for(self, pbm: PolicyBindingModel) -> PolicyRequest:
+        """Request for a single object, sharing the http request and geoip lookup"""
+        request = copy(self.request)
+        request.context = dict(self.request.context)
+        request.obj = pbm
+        return request
+
+    def _evaluation_key(self, binding: PolicyBinding) -> Hashable:
+        """Bindings with the same key return the same result before negation"""
+        policy: Optional[Policy] = binding.policy
+        # Policy executions which are logged need an event for each binding
+        if policy and (not policy.obj_independent or policy.execution_logging):
+            return binding.policy_binding_uuid
+        return (binding.policy_id, binding.group_id, binding.user_id)
+
+    def _evaluate(
+        self, tasks: list[tuple[PolicyBinding, PolicyRequest]]
+    ) -> list[PolicyResult]:
+        """Evaluate all tasks in parallel, keeping their order"""
+        results: list[Optional[PolicyResult]] = [None] * len(tasks)
+        parallel: list[int] = []
+        for idx, (binding, request) in enumerate(tasks):
+            if not binding.policy or binding.policy.inline_safe:
+                results[idx] = PolicyProcess(binding, request, None).evaluate()
+            else:
+                parallel.append(idx)
+        if self.use_pool and parallel:
+            pool_results = get_pool().evaluate_many([tasks[idx] for idx in parallel])
+            for idx, result in zip(parallel, pool_results):
+                results[idx] = result
+            return results
+        processes: list[tuple[int, PolicyProcessInfo]] = []
+        for idx in parallel:
+            binding, request = tasks[idx]
+            self.logger.debug("P_ENG(batch): Starting Process", binding=binding)
+            processes.append((idx, start_process(binding, request)))
+        for idx, proc_info in processes:
+            results[idx] = join_process(proc_info)
+        return results
+
+    def build(self) -> "BatchPolicyEngine":
+        """Evaluate the policies of all objects"""
+        with Hub.current.start_span(op="policy.engine.batch.build") as span:
+            span: Span
+            span.set_data("pbms", len(self.__pbms))
+            span.set_data("request", self.request)
+            graphs = get_bindings_many(self.__pbms)
+            all_bindings = [
+                (pbm, binding)
+                for pbm in self.__pbms
+                for binding in graphs[pbm.pbm_uuid]
+            ]
+            for _, binding in all_bindings:
+                # pyright: reportGeneralTypeIssues=false
+                if binding.policy and binding.policy.__class__ == Policy:
+                    raise TypeError(f"Policy '{binding.policy}' is root type")
+            keys = dict(
+                zip(
+                    [binding.policy_binding_uuid for _, binding in all_bindings],
+                    cache_keys([binding for _, binding in all_bindings], self.request),
+                )
+            )
+            cached = {}
+            if self.use_cache and keys:
+                cached = cache.get_many(keys.values())
+            results: dict[UUID, PolicyResult] = {}
+            pending: dict[Hashable, list[tuple[PolicyBindingModel, PolicyBinding]]] = {}
+            for pbm, binding in all_bindings:
+                key = keys[binding.policy_binding_uuid]
+                if key in cached:
+                    results[binding.policy_binding_uuid] = cached[key]
+                    continue
+                pending.setdefault(self._evaluation_key(binding), []).append(
+                    (pbm, binding)
+                )
+            requests = {pbm.pbm_uuid: self._request_for(pbm) for pbm in self.__pbms}
+            tasks = [
+                (binding, requests[pbm.pbm_uuid])
+                for pbm, binding in (group[0] for group in pending.values())
+            ]
+            self.logger.debug(
+                "P_ENG(batch): Evaluating policies",
+                objects=len(self.__pbms),
+                bindings=len(all_bindings),
+                cached=len(results),
+                evaluations=len(tasks),
+            )
+            for group, result in zip(pending.values(), self._evaluate(tasks)):
+                first = group[0][1]
+                results[first.policy_binding_uuid] = result
+                for _, binding in group[1:]:
+                    # Evaluated with the first binding, so negate its raw result for
+                    # this binding. Policies which couldn't be evaluated always fail.
+                    passing = result.passing
+                    if result.raw_passing is not None:
+                        passing = result.raw_passing ^ binding.negate
+                    shared = PolicyResult(passing, *result.messages)
+                    shared.raw_passing = result.raw_passing
+                    shared.source_binding = binding
+                    results[binding.policy_binding_uuid] = shared
+                    if not self.request.debug:
+                        set_tracked(
+                            keys[binding.policy_binding_uuid],
+                            shared,
+                            [CACHE_VERSION_POLICIES],
+                        )
+            for pbm in self.__pbms:
+                self.__results[pbm.pbm_uuid] = self._combine(
+                    pbm,
+                    [
+                        results[binding.policy_binding_uuid]
+                        for binding in graphs[pbm.pbm_uuid]
+                    ],
+                )
+            return self
+
+    def _combine(
+        self, pbm: PolicyBindingModel, results: list[PolicyResult]
+    ) -> PolicyResult:
+        """Combine the results of `pbm`'s bindings according to its engine mode"""
+        # No results, no policies attached -> passing
+        if len(results) == 0:
+            return PolicyResult(self.empty_result)
+        passing = False
+        if pbm.policy_engine_mode == PolicyEngineMode.MODE_ALL:
+            passing = all(x.passing for x in results)
+        if pbm.policy_engine_mode == PolicyEngineMode.MODE_ANY:
+            passing = any(x.passing for x in results)
+        result = PolicyResult(passing)
+        result.source_results = results
+        result.messages = tuple(y for x in results for y in x.messages)
+        return result
+
+    def result(self, pbm: PolicyBindingModel) -> PolicyResult:
+        """Get policy-checking result of `pbm`"""
+        return self.__results[pbm.pbm_uuid]
+
+    def passing(self, pbm: PolicyBindingModel) -> bool:
+        """Only get true/false if user passes `pbm`"""
+        return self.result(pbm).passing
@@ -19,6 +19,10 @@ class DummyPolicy(Policy):
 
     __debug_only__ = True
 
+    # Sleeps, so it's only run with the timeout of a separate process
+    inline_safe = False
+    obj_independent = True
+
     result = models.BooleanField(default=False)
     wait_min = models.IntegerField(default=5)
     wait_max = models.IntegerField(default=30)
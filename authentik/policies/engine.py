@@ -1,7 +1,9 @@
 """authentik policy engine"""
+from copy import copy
 from multiprocessing import Pipe, current_process
 from multiprocessing.connection import Connection
-from typing import Iterator, Optional
+from typing import Iterator, Optional, Union
+from uuid import UUID
 
 from django.core.cache import cache
 from django.http import HttpRequest
@@ -11,13 +13,16 @@ from sentry_sdk.tracing import Span
 from structlog.stdlib import BoundLogger, get_logger
 
 from authentik.core.models import User
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.cache import count_tracked, get_versions
 from authentik.policies.models import (
     Policy,
     PolicyBinding,
     PolicyBindingModel,
     PolicyEngineMode,
 )
-from authentik.policies.process import PolicyProcess, cache_key
+from authentik.policies.pool import get_pool
+from authentik.policies.process import CACHE_VERSION_POLICIES, PolicyProcess, cache_key
 from authentik.policies.types import PolicyRequest, PolicyResult
 from authentik.root.monitoring import UpdatingGauge
 
@@ -25,13 +30,72 @@ CURRENT_PROCESS = current_process()
 GAUGE_POLICIES_CACHED = UpdatingGauge(
     "authentik_policies_cached",
     "Cached Policies",
-    update_func=lambda: len(cache.keys("policy_*")),
+    update_func=lambda: count_tracked(CACHE_VERSION_POLICIES),
 )
 HIST_POLICIES_BUILD_TIME = Histogram(
     "authentik_policies_build_time",
     "Execution times complete policy result to an object",
     ["object_name", "object_type", "user"],
 )
+# Enabled bindings of policy binding models in order, keyed by pbm_uuid and stored
+# with the cache version they were loaded with
+_BINDING_GRAPH: dict[UUID, tuple[str, list[PolicyBinding]]] = {}
+
+
+def binding_graph_namespace(pbm_uuid: Union[UUID, str]) -> str:
+    """Namespace of the cache version of the bindings of a single policy binding
+    model, bumped when any of its bindings or their policies change. Groups and users
+    of bindings are only matched by their primary key, and deleting them deletes their
+    bindings, so they don't bump the version."""
+    if isinstance(pbm_uuid, UUID):
+        pbm_uuid = pbm_uuid.hex
+    return f"policy_pbm_{pbm_uuid}"
+
+
+def get_bindings(pbm: PolicyBindingModel) -> list[PolicyBinding]:
+    """Get the enabled bindings of `pbm` from the per-process cache, with their
+    policies already resolved to their subclass and their groups and users loaded.
+    Bindings are only loaded from the database when `pbm`'s configuration changed."""
+    return get_bindings_many([pbm])[pbm.pbm_uuid]
+
+
+def get_bindings_many(
+    pbms: list[PolicyBindingModel],
+) -> dict[UUID, list[PolicyBinding]]:
+    """Get the enabled bindings of all `pbms` like `get_bindings`, keyed by pbm_uuid.
+    Versions are looked up at once, and missing bindings are loaded with one query."""
+    namespaces = {pbm.pbm_uuid: binding_graph_namespace(pbm.pbm_uuid) for pbm in pbms}
+    versions = get_versions(CACHE_VERSION_POLICIES, *namespaces.values())
+    graphs: dict[UUID, list[PolicyBinding]] = {}
+    missing: dict[UUID, str] = {}
+    for pbm_uuid, namespace in namespaces.items():
+        version = f"{versions[CACHE_VERSION_POLICIES]}.{versions[namespace]}"
+        cached = _BINDING_GRAPH.get(pbm_uuid)
+        if cached and cached[0] == version:
+            graphs[pbm_uuid] = cached[1]
+        else:
+            missing[pbm_uuid] = version
+            graphs[pbm_uuid] = []
+    if missing:
+        bindings = list(
+            PolicyBinding.objects.filter(target__in=missing.keys(), enabled=True)
+            .select_related("group", "user")
+            .order_by("order")
+        )
+        policies = Policy.objects.filter(
+            pk__in=[binding.policy_id for binding in bindings if binding.policy_id]
+        ).in_bulk()
+        for binding in bindings:
+            if binding.policy_id:
+                binding.policy = policies[binding.policy_id]
+            graphs[binding.target_id].append(binding)
+        for pbm_uuid, version in missing.items():
+            _BINDING_GRAPH[pbm_uuid] = (version, graphs[pbm_uuid])
+    # Bindings are passed to other processes and events, so every engine gets copies
+    return {
+        pbm_uuid: [copy(binding) for binding in bindings]
+        for pbm_uuid, bindings in graphs.items()
+    }
 
 
 class PolicyProcessInfo:
@@ -51,10 +115,37 @@ class PolicyProcessInfo:
         self.result = None
 
 
+def start_process(binding: PolicyBinding, request: PolicyRequest) -> PolicyProcessInfo:
+    """Start a separate process to evaluate `binding` against `request`"""
+    our_end, task_end = Pipe(False)
+    task = PolicyProcess(binding, request, task_end)
+    task.daemon = False
+    if not CURRENT_PROCESS._config.get("daemon"):
+        task.run()
+    else:
+        task.start()
+    return PolicyProcessInfo(process=task, connection=our_end, binding=binding)
+
+
+def join_process(proc_info: PolicyProcessInfo) -> PolicyResult:
+    """Wait for a process to finish and return its result"""
+    if proc_info.process.is_alive():
+        proc_info.process.join(proc_info.binding.timeout)
+    # Only call .recv() if no result is saved, otherwise we just deadlock here
+    if not proc_info.result:
+        proc_info.result = proc_info.connection.recv()
+    return proc_info.result
+
+
 class PolicyEngine:
     """Orchestrate policy checking, launch tasks and return result"""
 
     use_cache: bool
+    # Evaluate policies in the policy worker pool instead of forking a process per binding
+    use_pool: bool
+    # Evaluate policies one after another in their order, and stop as soon as the
+    # outcome is decided (first passing policy for ANY, first failing policy for ALL)
+    short_circuit: bool
     request: PolicyRequest
 
     logger: BoundLogger
@@ -65,6 +156,10 @@ class PolicyEngine:
     __pbm: PolicyBindingModel
     __cached_policies: list[PolicyResult]
     __processes: list[PolicyProcessInfo]
+    # Results of policies which were evaluated in this process or by the worker pool
+    __results: list[PolicyResult]
+    # Placeholder results of policies skipped with short_circuit
+    __skipped: list[PolicyResult]
 
     __expected_result_count: int
 
@@ -85,16 +180,16 @@ class PolicyEngine:
             self.request.set_http_request(request)
         self.__cached_policies = []
         self.__processes = []
+        self.__results = []
+        self.__skipped = []
         self.use_cache = True
+        self.use_pool = CONFIG.y_bool("policies.pool.enabled")
+        self.short_circuit = CONFIG.y_bool("policies.short_circuit")
         self.__expected_result_count = 0
 
     def _iter_bindings(self) -> Iterator[PolicyBinding]:
         """Make sure all Policies are their respective classes"""
-        return (
-            PolicyBinding.objects.filter(target=self.__pbm, enabled=True)
-            .order_by("order")
-            .iterator()
-        )
+        return iter(get_bindings(self.__pbm))
 
     def _check_policy_type(self, policy: Policy):
         """Check policy type, make sure it's not the root class as that has no logic implemented"""
@@ -102,6 +197,28 @@ class PolicyEngine:
         if policy.__class__ == Policy:
             raise TypeError(f"Policy '{policy}' is root type")
 
+    def _evaluate_inline(self, binding: PolicyBinding) -> bool:
+        """Check if binding can be evaluated in this process. Group and user bindings and
+        policies flagged as `inline_safe` don't need the isolation of a separate process."""
+        if not binding.policy:
+            return True
+        return binding.policy.inline_safe
+
+    def _start_process(self, binding: PolicyBinding) -> PolicyProcessInfo:
+        """Start a separate process to evaluate `binding`"""
+        self.logger.debug(
+            "P_ENG: Starting Process", binding=binding, request=self.request
+        )
+        return start_process(binding, self.request)
+
+    def _decides_outcome(self, result: PolicyResult) -> bool:
+        """Check if `result` alone decides the outcome, regardless of any other results"""
+        if self.mode == PolicyEngineMode.MODE_ALL:
+            return not result.passing
+        if self.mode == PolicyEngineMode.MODE_ANY:
+            return result.passing
+        return False
+
     def build(self) -> "PolicyEngine":
         """Build wrapper which monitors performance"""
         with Hub.current.start_span(
@@ -114,10 +231,23 @@ class PolicyEngine:
             span: Span
             span.set_data("pbm", self.__pbm)
             span.set_data("request", self.request)
+            pool_bindings: list[PolicyBinding] = []
+            decided = False
             for binding in self._iter_bindings():
                 self.__expected_result_count += 1
 
                 self._check_policy_type(binding.policy)
+                if decided:
+                    self.logger.debug(
+                        "P_ENG: Skipping policy, outcome already decided",
+                        binding=binding,
+                        request=self.request,
+                    )
+                    skipped = PolicyResult(False)
+                    skipped.source_binding = binding
+                    skipped.skipped = True
+                    self.__skipped.append(skipped)
+                    continue
                 key = cache_key(binding, self.request)
                 cached_policy = cache.get(key, None)
                 if cached_policy and self.use_cache:
@@ -128,30 +258,34 @@ class PolicyEngine:
                         request=self.request,
                     )
                     self.__cached_policies.append(cached_policy)
+                    decided = self.short_circuit and self._decides_outcome(
+                        cached_policy
+                    )
                     continue
                 self.logger.debug(
                     "P_ENG: Evaluating policy", binding=binding, request=self.request
                 )
-                our_end, task_end = Pipe(False)
-                task = PolicyProcess(binding, self.request, task_end)
-                task.daemon = False
-                self.logger.debug(
-                    "P_ENG: Starting Process", binding=binding, request=self.request
-                )
-                if not CURRENT_PROCESS._config.get("daemon"):
-                    task.run()
+                if self._evaluate_inline(binding):
+                    result = PolicyProcess(binding, self.request, None).evaluate()
+                    self.__results.append(result)
+                elif self.use_pool:
+                    if not self.short_circuit:
+                        pool_bindings.append(binding)
+                        continue
+                    result = get_pool().evaluate([binding], self.request)[0]
+                    self.__results.append(result)
                 else:
-                    task.start()
-                self.__processes.append(
-                    PolicyProcessInfo(process=task, connection=our_end, binding=binding)
-                )
+                    proc_info = self._start_process(binding)
+                    self.__processes.append(proc_info)
+                    if not self.short_circuit:
+                        continue
+                    result = join_process(proc_info)
+                decided = self.short_circuit and self._decides_outcome(result)
+            if pool_bindings:
+                self.__results.extend(get_pool().evaluate(pool_bindings, self.request))
             # If all policies are cached, we have an empty list here.
             for proc_info in self.__processes:
-                if proc_info.process.is_alive():
-                    proc_info.process.join(proc_info.binding.timeout)
-                # Only call .recv() if no result is saved, otherwise we just deadlock here
-                if not proc_info.result:
-                    proc_info.result = proc_info.connection.recv()
+                join_process(proc_info)
             return self
 
     @property
@@ -160,8 +294,9 @@ class PolicyEngine:
         process_results: list[PolicyResult] = [
             x.result for x in self.__processes if x.result
         ]
-        all_results = list(process_results + self.__cached_policies)
-        if len(all_results) < self.__expected_result_count:  # pragma: no cover
+        all_results = list(process_results + self.__results + self.__cached_policies)
+        evaluated_count = len(all_results) + len(self.__skipped)
+        if evaluated_count < self.__expected_result_count:  # pragma: no cover
             raise AssertionError("Got less results than polices")
         # No results, no policies attached -> passing
         if len(all_results) == 0:
@@ -172,7 +307,7 @@ class PolicyEngine:
         if self.mode == PolicyEngineMode.MODE_ANY:
             passing = any(x.passing for x in all_results)
         result = PolicyResult(passing)
-        result.source_results = all_results
+        result.source_results = all_results + self.__skipped
         result.messages = tuple(y for x in all_results for y in x.messages)
         return result
 
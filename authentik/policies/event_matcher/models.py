@@ -22,6 +22,9 @@ def app_choices() -> list[tuple[str, str]]:
 class EventMatcherPolicy(Policy):
     """Passes when Event matches selected criteria."""
 
+    inline_safe = True
+    obj_independent = True
+
     action = models.TextField(
         choices=EventAction.choices,
         blank=True,
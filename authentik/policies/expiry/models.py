@@ -17,6 +17,9 @@ class PasswordExpiryPolicy(Policy):
     """If password change date is more than x days in the past, invalidate the user's password
     and show a notice"""
 
+    inline_safe = True
+    obj_independent = True
+
     deny_only = models.BooleanField(default=False)
     days = models.IntegerField()
 
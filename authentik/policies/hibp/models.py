@@ -26,6 +26,8 @@ class HaveIBeenPwendPolicy(Policy):
 
     allowed_count = models.IntegerField(default=0)
 
+    obj_independent = True
+
     @property
     def serializer(self) -> BaseSerializer:
         from authentik.policies.hibp.api import HaveIBeenPwendPolicySerializer
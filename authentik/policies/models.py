@@ -6,6 +6,7 @@ from django.utils.translation import gettext_lazy as _
 from model_utils.managers import InheritanceManager
 from rest_framework.serializers import BaseSerializer
 
+from authentik.core.authorization import get_authorization
 from authentik.lib.models import (
     CreatedUpdatedModel,
     InheritanceAutoManager,
@@ -99,8 +100,10 @@ class PolicyBinding(SerializerModel):
         if self.policy:
             self.policy: Policy
             return self.policy.passes(request)
-        if self.group:
-            return PolicyResult(self.group.users.filter(pk=request.user.pk).exists())
+        if self.group_id:
+            return PolicyResult(
+                self.group_id in get_authorization(request.user).group_pks
+            )
         if self.user:
             return PolicyResult(request.user == self.user)
         return PolicyResult(False)
@@ -167,6 +170,14 @@ class Policy(SerializerModel, CreatedUpdatedModel):
 
     objects = InheritanceAutoManager()
 
+    # Policies which don't run any user-supplied code can be evaluated in the calling
+    # process, skipping the overhead of a separate process per evaluation.
+    inline_safe = False
+    # Policies which don't use the object they're bound to (`request.obj`) return
+    # the same result for all objects, so they only need to be evaluated once when
+    # checking many objects at once.
+    obj_independent = False
+
     @property
     def component(self) -> str:
         """Return component used to edit this object"""
@@ -15,6 +15,9 @@ LOGGER = get_logger()
 class PasswordPolicy(Policy):
     """Policy to make sure passwords have certain properties"""
 
+    inline_safe = True
+    obj_independent = True
+
     password_field = models.TextField(
         default="password",
         help_text=_(
@@ -0,0 +1,297 @@
+"""authentik policy worker pool"""
+from collections import deque
+from multiprocessing import current_process
+from multiprocessing.connection import Connection
+from os import getpid, getppid
+from pickle import PicklingError  # nosec
+from queue import Empty, Queue
+from threading import Lock
+from time import monotonic
+from typing import Optional
+
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import close_old_connections, connections
+from django.http import HttpRequest
+from prometheus_client import Gauge
+from structlog.stdlib import get_logger
+
+from authentik.lib.config import CONFIG
+from authentik.policies.models import PolicyBinding
+from authentik.policies.process import FORK_CTX, PROCESS_CLASS, PolicyProcess
+from authentik.policies.types import PolicyRequest, PolicyResult
+
+LOGGER = get_logger()
+# Interval in seconds in which idle workers check if their parent is still alive
+PARENT_CHECK_INTERVAL = 5
+GAUGE_POLICIES_POOL_WORKERS = Gauge(
+    "authentik_policies_pool_workers",
+    "Running policy worker processes",
+)
+
+# Database connections inherited from the parent process. Those are still used by the
+# parent, so they must neither be closed nor garbage-collected in the worker.
+_INHERITED_CONNECTIONS = []
+
+
+class DetachedSession(dict):
+    """Copy of a session's data, which can be sent to a worker process"""
+
+    session_key: Optional[str]
+
+    def __init__(self, session: SessionBase):
+        super().__init__(session.items())
+        self.session_key = session.session_key
+
+
+def detach_http_request(request: HttpRequest) -> HttpRequest:
+    """Create a copy of `request` without any file handles or cache connections,
+    so it can be pickled and sent to a worker process"""
+    detached = HttpRequest()
+    detached.method = request.method
+    detached.path = request.path
+    detached.path_info = request.path_info
+    detached.META = {
+        key: value for key, value in request.META.items() if isinstance(value, str)
+    }
+    detached.GET = request.GET.copy()
+    # Only copy POST data if its been parsed already, since the body might not be readable
+    if hasattr(request, "_post"):
+        detached.POST = request.POST.copy()
+    detached.COOKIES = dict(request.COOKIES)
+    if hasattr(request, "user"):
+        detached.user = request.user
+    if hasattr(request, "session"):
+        detached.session = DetachedSession(request.session)
+    return detached
+
+
+def detach_request(request: PolicyRequest) -> PolicyRequest:
+    """Create a copy of `request` which can be sent to a worker process"""
+    if not request.http_request:
+        return request
+    detached = PolicyRequest(request.user)
+    detached.obj = request.obj
+    detached.context = request.context
+    detached.debug = request.debug
+    # Don't use set_http_request, since the geoip data is already in the context
+    detached.http_request = detach_http_request(request.http_request)
+    return detached
+
+
+class PolicyWorker(PROCESS_CLASS):
+    """Long-lived process which evaluates bindings sent to it by the pool"""
+
+    connection: Connection
+    pool_connection: Connection
+    evaluations: int
+
+    def __init__(self, connection: Connection, pool_connection: Connection):
+        super().__init__()
+        # Make sure workers are stopped when the parent process exits
+        self.daemon = True
+        self.connection = connection
+        self.pool_connection = pool_connection
+        self.evaluations = 0
+        self._parent_pid = getpid()
+
+    def _detach_connections(self):
+        """Make sure we don't use the database connections of our parent process"""
+        for conn in connections.all():
+            _INHERITED_CONNECTIONS.append(conn.connection)
+            conn.connection = None
+
+    def run(self):  # pragma: no cover
+        """Evaluate bindings until the pool stops us or the parent exits"""
+        self._detach_connections()
+        self.pool_connection.close()
+        while True:
+            if not self.connection.poll(PARENT_CHECK_INTERVAL):
+                if getppid() != self._parent_pid:
+                    return
+                continue
+            try:
+                task = self.connection.recv()
+            except EOFError:
+                return
+            if task is None:
+                return
+            binding, request = task
+            self.connection.send(PolicyProcess(binding, request, None).evaluate())
+            close_old_connections()
+
+
+class PolicyWorkerPool:
+    """Size-bounded pool of long-lived policy worker processes. Workers are recycled
+    after `max_evaluations` evaluations, or when a binding exceeds its timeout."""
+
+    size: int
+    max_evaluations: int
+    pid: int
+
+    _idle: Queue
+    _lock: Lock
+    _workers: int
+
+    def __init__(self, size: int, max_evaluations: int):
+        self.size = size
+        self.max_evaluations = max_evaluations
+        self.pid = getpid()
+        self._idle = Queue()
+        self._lock = Lock()
+        self._workers = 0
+
+    def _spawn(self) -> PolicyWorker:
+        """Start a new worker process"""
+        pool_end, worker_end = FORK_CTX.Pipe()
+        worker = PolicyWorker(worker_end, pool_end)
+        worker.start()
+        worker_end.close()
+        GAUGE_POLICIES_POOL_WORKERS.inc()
+        LOGGER.debug("P_ENG(pool): Started worker", pid=worker.pid)
+        return worker
+
+    def _acquire(self, block: bool) -> Optional[PolicyWorker]:
+        """Get an idle worker, starting a new one if the pool isn't full yet"""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self._workers < self.size:
+                self._workers += 1
+                try:
+                    return self._spawn()
+                except OSError:
+                    self._workers -= 1
+                    raise
+        if not block:
+            return None
+        return self._idle.get()
+
+    def _release(self, worker: PolicyWorker):
+        """Return worker to the pool, or recycle it when it's done enough work"""
+        if worker.evaluations >= self.max_evaluations:
+            self._retire(worker)
+            return
+        self._idle.put(worker)
+
+    def _retire(self, worker: PolicyWorker, kill: bool = False):
+        """Stop a worker and free its slot in the pool"""
+        if kill:
+            worker.kill()
+        else:
+            try:
+                worker.pool_connection.send(None)
+            except OSError:
+                pass
+        worker.pool_connection.close()
+        with self._lock:
+            self._workers -= 1
+        GAUGE_POLICIES_POOL_WORKERS.dec()
+        LOGGER.debug("P_ENG(pool): Stopped worker", pid=worker.pid, killed=kill)
+
+    def _collect(
+        self, worker: PolicyWorker, binding: PolicyBinding, deadline: float
+    ) -> PolicyResult:
+        """Wait for the result of `binding`, killing the worker if it exceeds its timeout"""
+        try:
+            if worker.pool_connection.poll(max(deadline - monotonic(), 0)):
+                result = worker.pool_connection.recv()
+                worker.evaluations += 1
+                self._release(worker)
+                return result
+            LOGGER.warning(
+                "P_ENG(pool): Policy timed out",
+                binding=binding,
+                timeout=binding.timeout,
+            )
+            result = PolicyResult(False, "Policy execution timed out")
+        except (EOFError, OSError) as exc:
+            LOGGER.warning("P_ENG(pool): Worker died", binding=binding, exc=exc)
+            result = PolicyResult(False, str(exc))
+        self._retire(worker, kill=True)
+        result.source_binding = binding
+        return result
+
+    def evaluate(
+        self, bindings: list[PolicyBinding], request: PolicyRequest
+    ) -> list[PolicyResult]:
+        """Evaluate all `bindings` against `request` in parallel. Results are returned
+        in the same order as `bindings`."""
+        return self.evaluate_many([(binding, request) for binding in bindings])
+
+    def evaluate_many(
+        self, tasks: list[tuple[PolicyBinding, PolicyRequest]]
+    ) -> list[PolicyResult]:
+        """Evaluate all bindings against their request in parallel. Results are
+        returned in the same order as `tasks`."""
+        # Daemonic processes (like celery workers) can't start child processes. This is
+        # checked on every call, since the pool might be imported before forking.
+        if current_process()._config.get("daemon"):
+            return [
+                PolicyProcess(binding, request, None).evaluate()
+                for binding, request in tasks
+            ]
+        detached_requests: dict[int, PolicyRequest] = {}
+        for _, request in tasks:
+            if id(request) not in detached_requests:
+                detached_requests[id(request)] = detach_request(request)
+        bindings = [binding for binding, _ in tasks]
+        results: list[Optional[PolicyResult]] = [None] * len(tasks)
+        pending = deque(enumerate(bindings))
+        in_flight: deque[tuple[int, PolicyWorker, float]] = deque()
+        while pending or in_flight:
+            while pending:
+                # Only block when we don't hold any workers ourselves, as otherwise
+                # engines holding parts of the pool could wait on each other forever
+                worker = self._acquire(block=not in_flight)
+                if not worker:
+                    break
+                idx, binding = pending.popleft()
+                request = tasks[idx][1]
+                try:
+                    worker.pool_connection.send(
+                        (binding, detached_requests[id(request)])
+                    )
+                except (PicklingError, TypeError, AttributeError) as exc:
+                    # Pickling happens before anything is written, so the worker is fine
+                    LOGGER.debug("P_ENG(pool): Evaluating in-process", exc=exc)
+                    self._idle.put(worker)
+                    results[idx] = PolicyProcess(binding, request, None).evaluate()
+                    continue
+                except OSError:
+                    self._retire(worker, kill=True)
+                    pending.appendleft((idx, binding))
+                    continue
+                in_flight.append((idx, worker, monotonic() + binding.timeout))
+            if in_flight:
+                idx, worker, deadline = in_flight.popleft()
+                results[idx] = self._collect(worker, bindings[idx], deadline)
+        return results
+
+    def shutdown(self):
+        """Stop all idle workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except Empty:
+                return
+            self._retire(worker)
+
+
+_POOL: Optional[PolicyWorkerPool] = None
+_POOL_LOCK = Lock()
+
+
+def get_pool() -> PolicyWorkerPool:
+    """Get the policy worker pool of the current process, creating it when required"""
+    global _POOL  # pylint: disable=global-statement
+    with _POOL_LOCK:
+        # Workers belong to the process that started them, so a forked process
+        # (e.g. a gunicorn worker) needs a pool of its own
+        if not _POOL or _POOL.pid != getpid():
+            _POOL = PolicyWorkerPool(
+                int(CONFIG.y("policies.pool.size", 4)),
+                int(CONFIG.y("policies.pool.max_evaluations", 1000)),
+            )
+        return _POOL
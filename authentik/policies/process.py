@@ -4,19 +4,21 @@ from multiprocessing.connection import Connection
 from traceback import format_tb
 from typing import Optional
 
-from django.core.cache import cache
 from prometheus_client import Histogram
 from sentry_sdk.hub import Hub
 from sentry_sdk.tracing import Span
 from structlog.stdlib import get_logger
 
 from authentik.events.models import Event, EventAction
+from authentik.lib.utils.cache import get_versions, set_tracked
 from authentik.policies.exceptions import PolicyException
 from authentik.policies.models import PolicyBinding
 from authentik.policies.types import PolicyRequest, PolicyResult
 
 LOGGER = get_logger()
 TRACEBACK_HEADER = "Traceback (most recent call last):\n"
+# Cache version of all policy results, bumped when the policy cache is cleared
+CACHE_VERSION_POLICIES = "policy"
 
 FORK_CTX = get_context("fork")
 PROCESS_CLASS = FORK_CTX.Process
@@ -34,14 +36,34 @@ HIST_POLICIES_EXECUTION_TIME = Histogram(
 )
 
 
+def cache_version_namespace(binding: PolicyBinding) -> str:
+    """Namespace of the cache version of a single binding, bumped when the binding
+    or its policy is changed"""
+    return f"policy_{binding.policy_binding_uuid.hex}"
+
+
 def cache_key(binding: PolicyBinding, request: PolicyRequest) -> str:
     """Generate Cache key for policy"""
-    prefix = f"policy_{binding.policy_binding_uuid.hex}_"
+    return cache_keys([binding], request)[0]
+
+
+def cache_keys(bindings: list[PolicyBinding], request: PolicyRequest) -> list[str]:
+    """Generate Cache keys for multiple policies, looking up all versions at once"""
+    namespaces = [cache_version_namespace(binding) for binding in bindings]
+    versions = get_versions(CACHE_VERSION_POLICIES, *namespaces)
+    suffix = ""
     if request.http_request and hasattr(request.http_request, "session"):
-        prefix += f"_{request.http_request.session.session_key}"
+        suffix += f"_{request.http_request.session.session_key}"
     if request.user:
-        prefix += f"#{request.user.pk}"
-    return prefix
+        suffix += f"#{request.user.pk}"
+    return [
+        (
+            f"policy_{binding.policy_binding_uuid.hex}_"
+            f"{versions[CACHE_VERSION_POLICIES]}.{versions[namespace]}_"
+        )
+        + suffix
+        for binding, namespace in zip(bindings, namespaces)
+    ]
 
 
 class PolicyProcess(PROCESS_CLASS):
@@ -114,12 +136,13 @@ class PolicyProcess(PROCESS_CLASS):
             LOGGER.debug("P_ENG(proc): error", exc=src_exc)
             policy_result = PolicyResult(False, str(src_exc))
         policy_result.source_binding = self.binding
+        policy_result.raw_passing = policy_result.passing
         # Invert result if policy.negate is set
         if self.binding.negate:
             policy_result.passing = not policy_result.passing
         if not self.request.debug:
             key = cache_key(self.binding, self.request)
-            cache.set(key, policy_result)
+            set_tracked(key, policy_result, [CACHE_VERSION_POLICIES])
         LOGGER.debug(
             "P_ENG(proc): finished and cached ",
             policy=self.binding.policy,
@@ -130,8 +153,8 @@ class PolicyProcess(PROCESS_CLASS):
         )
         return policy_result
 
-    def run(self):  # pragma: no cover
-        """Task wrapper to run policy checking"""
+    def profiling_wrapper(self) -> PolicyResult:
+        """Run with profiling enabled"""
         with Hub.current.start_span(
             op="policy.process.execute",
         ) as span, HIST_POLICIES_EXECUTION_TIME.labels(
@@ -145,8 +168,18 @@ class PolicyProcess(PROCESS_CLASS):
             span: Span
             span.set_data("policy", self.binding.policy)
             span.set_data("request", self.request)
-            try:
-                self.connection.send(self.execute())
-            except Exception as exc:  # pylint: disable=broad-except
-                LOGGER.warning(str(exc))
-                self.connection.send(PolicyResult(False, str(exc)))
+            return self.execute()
+
+    def evaluate(self) -> PolicyResult:
+        """Run with profiling, and return a failing result for any unexpected error"""
+        try:
+            return self.profiling_wrapper()
+        except Exception as exc:  # pylint: disable=broad-except
+            LOGGER.warning(str(exc))
+            result = PolicyResult(False, str(exc))
+            result.source_binding = self.binding
+            return result
+
+    def run(self):  # pragma: no cover
+        """Task wrapper to run policy checking"""
+        self.connection.send(self.evaluate())
@@ -1,21 +1,98 @@
 """authentik reputation request policy"""
+from time import time
+
 from django.core.cache import cache
 from django.db import models
 from django.utils.translation import gettext as _
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
 from rest_framework.serializers import BaseSerializer
+from structlog.stdlib import get_logger
 
 from authentik.core.models import User
 from authentik.lib.utils.http import get_client_ip
 from authentik.policies.models import Policy
 from authentik.policies.types import PolicyRequest, PolicyResult
 
-CACHE_KEY_IP_PREFIX = "authentik_reputation_ip_"
-CACHE_KEY_USER_PREFIX = "authentik_reputation_user_"
+LOGGER = get_logger()
+# Hashes of live scores by IP and username. Accessed with the raw redis client, so
+# prefixed the same way as cache keys
+CACHE_KEY_IP = cache.make_key("goauthentik.io/policies/reputation/ip")
+CACHE_KEY_USER = cache.make_key("goauthentik.io/policies/reputation/user")
+
+# Add ARGV[2] to the score of ARGV[1] in the hash KEYS[1]. KEYS[2] is a sorted set of
+# when each score was first updated, scores older than ARGV[4] seconds start over
+UPDATE_SCRIPT = """
+local updated = redis.call("ZSCORE", KEYS[2], ARGV[1])
+if not updated or tonumber(updated) <= tonumber(ARGV[3]) - tonumber(ARGV[4]) then
+    redis.call("ZADD", KEYS[2], ARGV[3], ARGV[1])
+    redis.call("HSET", KEYS[1], ARGV[1], ARGV[2])
+    return tonumber(ARGV[2])
+end
+return redis.call("HINCRBY", KEYS[1], ARGV[1], ARGV[2])
+"""
+# Delete all scores of the hash KEYS[1] which were first updated before ARGV[1]
+PRUNE_SCRIPT = """
+local expired = redis.call("ZRANGEBYSCORE", KEYS[2], "-inf", ARGV[1])
+for idx = 1, #expired, 1000 do
+    redis.call("HDEL", KEYS[1], unpack(expired, idx, math.min(idx + 999, #expired)))
+end
+redis.call("ZREMRANGEBYSCORE", KEYS[2], "-inf", ARGV[1])
+return #expired
+"""
+
+
+def updated_key(key: str) -> str:
+    """Sorted set of when the scores in the hash `key` were first updated"""
+    return f"{key}/updated"
+
+
+def update_scores(remote_ip: str, username: str, amount: int):
+    """Add `amount` to the live scores of `remote_ip` and `username`. Each score is
+    reset once it's older than the cache timeout, like a cached counter would be."""
+    try:
+        client = get_redis_connection()
+        update = client.register_script(UPDATE_SCRIPT)
+        for key, member in [(CACHE_KEY_IP, remote_ip), (CACHE_KEY_USER, username)]:
+            update(
+                keys=[key, updated_key(key)],
+                args=[member, amount, time(), cache.default_timeout],
+            )
+    except (RedisError, NotImplementedError) as exc:
+        LOGGER.warning("Failed to update reputation", exc=exc)
+
+
+def get_score(key: str, member: str) -> int:
+    """Get the live score of `member` from the hash `key`"""
+    try:
+        score, updated = (
+            get_redis_connection()
+            .pipeline()
+            .hget(key, member)
+            .zscore(updated_key(key), member)
+            .execute()
+        )
+    except (RedisError, NotImplementedError) as exc:
+        LOGGER.warning("Failed to get reputation", exc=exc)
+        return 0
+    if updated is None or updated <= time() - cache.default_timeout:
+        return 0
+    return int(score or 0)
+
+
+def prune_scores(key: str) -> int:
+    """Delete all expired scores from the hash `key`, and return how many there were"""
+    client = get_redis_connection()
+    prune = client.register_script(PRUNE_SCRIPT)
+    return prune(keys=[key, updated_key(key)], args=[time() - cache.default_timeout])
 
 
 class ReputationPolicy(Policy):
     """Return true if request IP/target username's score is below a certain threshold"""
 
+    inline_safe = True
+    obj_independent = True
+
     check_ip = models.BooleanField(default=True)
     check_username = models.BooleanField(default=True)
     threshold = models.IntegerField(default=-5)
@@ -34,10 +111,10 @@ class ReputationPolicy(Policy):
         remote_ip = get_client_ip(request.http_request) or "255.255.255.255"
         passing = True
         if self.check_ip:
-            score = cache.get_or_set(CACHE_KEY_IP_PREFIX + remote_ip, 0)
+            score = get_score(CACHE_KEY_IP, remote_ip)
             passing = passing and score <= self.threshold
         if self.check_username:
-            score = cache.get_or_set(CACHE_KEY_USER_PREFIX + request.user.username, 0)
+            score = get_score(CACHE_KEY_USER, request.user.username)
             passing = passing and score <= self.threshold
         return PolicyResult(passing)
 
@@ -1,50 +1,101 @@
 """Reputation tasks"""
-from django.core.cache import cache
+from ipaddress import ip_address
+from itertools import islice
+from typing import Any, Iterator
+
+from django.db import connection
+from django_redis import get_redis_connection
 from structlog.stdlib import get_logger
 
 from authentik.core.models import User
 from authentik.events.monitored_tasks import MonitoredTask, TaskResult, TaskResultStatus
-from authentik.policies.reputation.models import IPReputation, UserReputation
-from authentik.policies.reputation.signals import (
-    CACHE_KEY_IP_PREFIX,
-    CACHE_KEY_USER_PREFIX,
+from authentik.policies.reputation.models import (
+    CACHE_KEY_IP,
+    CACHE_KEY_USER,
+    IPReputation,
+    UserReputation,
+    prune_scores,
 )
 from authentik.root.celery import CELERY_APP
 
 LOGGER = get_logger()
+SAVE_BATCH_SIZE = 1000
+
+
+def iter_scores(key: str) -> Iterator[dict[str, int]]:
+    """Iterate the live scores in the hash `key`, in batches of `SAVE_BATCH_SIZE`.
+    Expired scores are deleted first, so the hash only grows with the scores updated
+    within the cache timeout."""
+    pruned = prune_scores(key)
+    LOGGER.debug("Deleted expired scores", key=key, scores=pruned)
+    scores = get_redis_connection().hscan_iter(key, count=SAVE_BATCH_SIZE)
+    while batch := list(islice(scores, SAVE_BATCH_SIZE)):
+        yield {member.decode(): int(score) for member, score in batch}
+
+
+def upsert_scores(model: type[Any], column: str, scores: dict[Any, int]):
+    """Insert or update the scores of `model` with a single statement, `column` being
+    the unique column `scores` is keyed by"""
+    if not scores:
+        return
+    rows: list[Any] = []
+    for value, score in scores.items():
+        rows.extend([value, score])
+    values = ", ".join(["(%s, %s, now())"] * len(scores))
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({column}, score, updated) VALUES {values} "
+            f"ON CONFLICT ({column}) DO UPDATE "
+            "SET score = EXCLUDED.score, updated = EXCLUDED.updated",  # nosec
+            rows,
+        )
 
 
 @CELERY_APP.task(bind=True, base=MonitoredTask)
 def save_ip_reputation(self: MonitoredTask):
     """Save currently cached reputation to database"""
-    objects_to_update = []
-    for key, score in cache.get_many(cache.keys(CACHE_KEY_IP_PREFIX + "*")).items():
-        remote_ip = key.replace(CACHE_KEY_IP_PREFIX, "")
-        rep, _ = IPReputation.objects.get_or_create(ip=remote_ip)
-        rep.score = score
-        objects_to_update.append(rep)
-    IPReputation.objects.bulk_update(objects_to_update, ["score"])
+    saved = 0
+    for scores in iter_scores(CACHE_KEY_IP):
+        valid_scores = {}
+        for remote_ip, score in scores.items():
+            try:
+                ip_address(remote_ip)
+            except ValueError:
+                LOGGER.info("Invalid IP in cache, ignoring", remote_ip=remote_ip)
+                continue
+            valid_scores[remote_ip] = score
+        upsert_scores(IPReputation, "ip", valid_scores)
+        saved += len(valid_scores)
     self.set_status(
-        TaskResult(TaskResultStatus.SUCCESSFUL, ["Successfully updated IP Reputation"])
+        TaskResult(
+            TaskResultStatus.SUCCESSFUL,
+            [f"Successfully updated IP Reputation of {saved} IPs"],
+        )
     )
 
 
 @CELERY_APP.task(bind=True, base=MonitoredTask)
 def save_user_reputation(self: MonitoredTask):
     """Save currently cached reputation to database"""
-    objects_to_update = []
-    for key, score in cache.get_many(cache.keys(CACHE_KEY_USER_PREFIX + "*")).items():
-        username = key.replace(CACHE_KEY_USER_PREFIX, "")
-        users = User.objects.filter(username=username)
-        if not users.exists():
+    saved = 0
+    for scores in iter_scores(CACHE_KEY_USER):
+        user_pks = dict(
+            User.objects.filter(username__in=scores.keys()).values_list(
+                "username", "pk"
+            )
+        )
+        for username in scores.keys() - user_pks.keys():
             LOGGER.info("User in cache does not exist, ignoring", username=username)
-            continue
-        rep, _ = UserReputation.objects.get_or_create(user=users.first())
-        rep.score = score
-        objects_to_update.append(rep)
-    UserReputation.objects.bulk_update(objects_to_update, ["score"])
+        upsert_scores(
+            UserReputation,
+            "user_id",
+            {user_pks[username]: scores[username] for username in user_pks},
+        )
+        saved += len(user_pks)
     self.set_status(
         TaskResult(
-            TaskResultStatus.SUCCESSFUL, ["Successfully updated User Reputation"]
+            TaskResultStatus.SUCCESSFUL,
+            [f"Successfully updated User Reputation of {saved} users"],
         )
     )
@@ -1,15 +1,22 @@
 """test reputation signals and policy"""
+from time import time
+from unittest.mock import patch
+
 from django.contrib.auth import authenticate
 from django.core.cache import cache
 from django.test import TestCase
+from django_redis import get_redis_connection
 
 from authentik.core.models import User
 from authentik.policies.reputation.models import (
-    CACHE_KEY_IP_PREFIX,
-    CACHE_KEY_USER_PREFIX,
+    CACHE_KEY_IP,
+    CACHE_KEY_USER,
     IPReputation,
     ReputationPolicy,
     UserReputation,
+    get_score,
+    update_scores,
+    updated_key,
 )
 from authentik.policies.reputation.tasks import save_ip_reputation, save_user_reputation
 from authentik.policies.types import PolicyRequest
@@ -21,8 +28,12 @@ class TestReputationPolicy(TestCase):
     def setUp(self):
         self.test_ip = "255.255.255.255"
         self.test_username = "test"
-        cache.delete(CACHE_KEY_IP_PREFIX + self.test_ip)
-        cache.delete(CACHE_KEY_USER_PREFIX + self.test_username)
+        get_redis_connection().delete(
+            CACHE_KEY_IP,
+            CACHE_KEY_USER,
+            updated_key(CACHE_KEY_IP),
+            updated_key(CACHE_KEY_USER),
+        )
         # We need a user for the one-to-one in userreputation
         self.user = User.objects.create(username=self.test_username)
 
@@ -31,7 +42,7 @@ class TestReputationPolicy(TestCase):
         # Trigger negative reputation
         authenticate(None, username=self.test_username, password=self.test_username)
         # Test value in cache
-        self.assertEqual(cache.get(CACHE_KEY_IP_PREFIX + self.test_ip), -1)
+        self.assertEqual(get_score(CACHE_KEY_IP, self.test_ip), -1)
         # Save cache and check db values
         save_ip_reputation.delay().get()
         self.assertEqual(IPReputation.objects.get(ip=self.test_ip).score, -1)
@@ -41,7 +52,7 @@ class TestReputationPolicy(TestCase):
         # Trigger negative reputation
         authenticate(None, username=self.test_username, password=self.test_username)
         # Test value in cache
-        self.assertEqual(cache.get(CACHE_KEY_USER_PREFIX + self.test_username), -1)
+        self.assertEqual(get_score(CACHE_KEY_USER, self.test_username), -1)
         # Save cache and check db values
         save_user_reputation.delay().get()
         self.assertEqual(UserReputation.objects.get(user=self.user).score, -1)
@@ -53,3 +64,32 @@ class TestReputationPolicy(TestCase):
             name="reputation-test", threshold=0
         )
         self.assertTrue(policy.passes(request).passing)
+
+    def test_save_existing(self):
+        """Test saving updates existing reputation and ignores unknown users"""
+        IPReputation.objects.create(ip=self.test_ip, score=5)
+        UserReputation.objects.create(user=self.user, score=5)
+        update_scores(self.test_ip, self.test_username, -2)
+        update_scores("invalid", "unknown", -1)
+        save_ip_reputation.delay().get()
+        save_user_reputation.delay().get()
+        self.assertEqual(IPReputation.objects.get(ip=self.test_ip).score, -2)
+        self.assertEqual(IPReputation.objects.count(), 1)
+        self.assertEqual(UserReputation.objects.get(user=self.user).score, -2)
+        self.assertEqual(UserReputation.objects.count(), 1)
+
+    def test_expiry(self):
+        """Test scores expire individually, and are deleted when saving"""
+        update_scores(self.test_ip, self.test_username, -2)
+        later = time() + cache.default_timeout
+        with patch("authentik.policies.reputation.models.time", return_value=later):
+            update_scores("127.0.0.1", self.test_username, -1)
+            self.assertEqual(get_score(CACHE_KEY_IP, self.test_ip), 0)
+            self.assertEqual(get_score(CACHE_KEY_IP, "127.0.0.1"), -1)
+            # Expired scores start over
+            self.assertEqual(get_score(CACHE_KEY_USER, self.test_username), -1)
+            save_ip_reputation.delay().get()
+        self.assertEqual(
+            get_redis_connection().hkeys(CACHE_KEY_IP), ["127.0.0.1".encode()]
+        )
+        self.assertFalse(IPReputation.objects.filter(ip=self.test_ip).exists())
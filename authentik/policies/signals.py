@@ -1,30 +1,39 @@
 """authentik policy signals"""
-from django.core.cache import cache
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from structlog.stdlib import get_logger
 
-from authentik.core.api.applications import user_app_cache_key
+from authentik.core.api.applications import CACHE_VERSION_USER_APPS
+from authentik.lib.utils.cache import bump_version
 
 LOGGER = get_logger()
 
 
 @receiver(post_save)
+@receiver(post_delete, sender="authentik_policies.Policy")
+@receiver(post_delete, sender="authentik_policies.PolicyBinding")
 # pylint: disable=unused-argument
 def invalidate_policy_cache(sender, instance, **_):
-    """Invalidate Policy cache when policy is updated"""
+    """Invalidate Policy cache when policy or binding is updated"""
+    from authentik.policies.engine import binding_graph_namespace
     from authentik.policies.models import Policy, PolicyBinding
+    from authentik.policies.process import cache_version_namespace
 
     if isinstance(instance, Policy):
-        total = 0
-        for binding in PolicyBinding.objects.filter(policy=instance):
-            prefix = (
-                f"policy_{binding.policy_binding_uuid.hex}_{binding.policy.pk.hex}*"
-            )
-            keys = cache.keys(prefix)
-            total += len(keys)
-            cache.delete_many(keys)
-        LOGGER.debug("Invalidating policy cache", policy=instance, keys=total)
-    # Also delete user application cache
-    keys = cache.keys(user_app_cache_key("*")) or []
-    cache.delete_many(keys)
+        bindings = list(PolicyBinding.objects.filter(policy=instance))
+        bump_version(
+            *[cache_version_namespace(binding) for binding in bindings],
+            *[binding_graph_namespace(binding.target_id) for binding in bindings],
+        )
+        LOGGER.debug(
+            "Invalidating policy cache", policy=instance, bindings=len(bindings)
+        )
+    if isinstance(instance, PolicyBinding):
+        bump_version(
+            cache_version_namespace(instance),
+            binding_graph_namespace(instance.target_id),
+        )
+        LOGGER.debug("Invalidating policy cache", binding=instance)
+    if isinstance(instance, (Policy, PolicyBinding)):
+        # Also invalidate user application cache
+        bump_version(CACHE_VERSION_USER_APPS)
@@ -0,0 +1,94 @@
+"""batch policy engine tests"""
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase
+
+from authentik.core.models import Group, User
+from authentik.policies.batch import BatchPolicyEngine
+from authentik.policies.dummy.models import DummyPolicy
+from authentik.policies.engine import PolicyEngine
+from authentik.policies.expression.models import ExpressionPolicy
+from authentik.policies.models import (
+    PolicyBinding,
+    PolicyBindingModel,
+    PolicyEngineMode,
+)
+from authentik.policies.tests.test_process import clear_policy_cache
+from authentik.policies.types import PolicyResult
+
+
+class TestBatchPolicyEngine(TestCase):
+    """BatchPolicyEngine tests"""
+
+    def setUp(self):
+        clear_policy_cache()
+        self.user = User.objects.create_user(username="policyuser")
+        self.group = Group.objects.create(name="policygroup")
+        self.policy_true = DummyPolicy.objects.create(
+            result=True, wait_min=0, wait_max=1
+        )
+
+    def test_batch(self):
+        """Test results match the policy engine"""
+        pbm_empty = PolicyBindingModel.objects.create()
+        pbm_group = PolicyBindingModel.objects.create()
+        PolicyBinding.objects.create(target=pbm_group, group=self.group, order=0)
+        pbm_all = PolicyBindingModel.objects.create(
+            policy_engine_mode=PolicyEngineMode.MODE_ALL
+        )
+        PolicyBinding.objects.create(target=pbm_all, policy=self.policy_true, order=0)
+        PolicyBinding.objects.create(
+            target=pbm_all, group=self.group, order=1, negate=True
+        )
+        pbm_expr = PolicyBindingModel.objects.create()
+        PolicyBinding.objects.create(
+            target=pbm_expr,
+            policy=ExpressionPolicy.objects.create(
+                name="obj", expression="return request.obj is not None"
+            ),
+            order=0,
+        )
+        pbms = [pbm_empty, pbm_group, pbm_all, pbm_expr]
+        engine = BatchPolicyEngine(pbms, self.user).build()
+        for pbm in pbms:
+            self.assertEqual(
+                engine.passing(pbm),
+                PolicyEngine(pbm, self.user).build().passing,
+            )
+        self.assertEqual(
+            [engine.passing(pbm) for pbm in pbms], [True, False, True, True]
+        )
+
+    def test_batch_shared(self):
+        """Test policies shared between objects are only evaluated once"""
+        pbm = PolicyBindingModel.objects.create()
+        PolicyBinding.objects.create(target=pbm, policy=self.policy_true, order=0)
+        pbm_negated = PolicyBindingModel.objects.create()
+        PolicyBinding.objects.create(
+            target=pbm_negated, policy=self.policy_true, order=0, negate=True
+        )
+        passes = MagicMock(return_value=PolicyResult(True))
+        with patch("authentik.policies.dummy.models.DummyPolicy.passes", passes):
+            engine = BatchPolicyEngine([pbm, pbm_negated], self.user).build()
+            self.assertEqual(passes.call_count, 1)
+            self.assertTrue(engine.passing(pbm))
+            self.assertFalse(engine.passing(pbm_negated))
+            # Both results are cached now
+            engine = BatchPolicyEngine([pbm, pbm_negated], self.user).build()
+            self.assertEqual(passes.call_count, 1)
+            self.assertFalse(engine.passing(pbm_negated))
+
+    def test_batch_shared_error(self):
+        """Test shared policies which fail to evaluate fail all bindings"""
+        pbm = PolicyBindingModel.objects.create()
+        PolicyBinding.objects.create(
+            target=pbm, policy=self.policy_true, order=0, negate=True
+        )
+        pbm_other = PolicyBindingModel.objects.create()
+        PolicyBinding.objects.create(target=pbm_other, policy=self.policy_true, order=0)
+        passes = MagicMock(side_effect=ValueError)
+        with patch("authentik.policies.dummy.models.DummyPolicy.passes", passes):
+            engine = BatchPolicyEngine([pbm, pbm_other], self.user).build()
+        self.assertEqual(passes.call_count, 1)
+        self.assertFalse(engine.passing(pbm))
+        self.assertFalse(engine.passing(pbm_other))
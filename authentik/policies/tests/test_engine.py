@@ -1,8 +1,11 @@
 """policy engine tests"""
+from unittest.mock import patch
+
 from django.core.cache import cache
 from django.test import TestCase
 
-from authentik.core.models import User
+from authentik.core.models import Group, User
+from authentik.lib.config import CONFIG
 from authentik.policies.dummy.models import DummyPolicy
 from authentik.policies.engine import PolicyEngine
 from authentik.policies.expression.models import ExpressionPolicy
@@ -12,6 +15,7 @@ from authentik.policies.models import (
     PolicyBindingModel,
     PolicyEngineMode,
 )
+from authentik.policies.reputation.models import ReputationPolicy
 from authentik.policies.tests.test_process import clear_policy_cache
 
 
@@ -85,6 +89,42 @@ class TestPolicyEngine(TestCase):
             ),
         )
 
+    def test_engine_short_circuit_any(self):
+        """Ensure evaluation stops at the first passing policy with OR mode"""
+        pbm = PolicyBindingModel.objects.create(
+            policy_engine_mode=PolicyEngineMode.MODE_ANY
+        )
+        PolicyBinding.objects.create(target=pbm, policy=self.policy_true, order=0)
+        skipped = PolicyBinding.objects.create(
+            target=pbm, policy=self.policy_raises, order=1
+        )
+        engine = PolicyEngine(pbm, self.user)
+        engine.short_circuit = True
+        result = engine.build().result
+        self.assertEqual(result.passing, True)
+        self.assertEqual(result.messages, ("dummy",))
+        self.assertEqual(len(result.source_results), 2)
+        self.assertFalse(result.source_results[0].skipped)
+        self.assertTrue(result.source_results[1].skipped)
+        self.assertEqual(result.source_results[1].source_binding, skipped)
+
+    def test_engine_short_circuit_all(self):
+        """Ensure evaluation stops at the first failing policy with AND mode"""
+        pbm = PolicyBindingModel.objects.create(
+            policy_engine_mode=PolicyEngineMode.MODE_ALL
+        )
+        PolicyBinding.objects.create(target=pbm, policy=self.policy_true, order=0)
+        PolicyBinding.objects.create(target=pbm, policy=self.policy_false, order=1)
+        PolicyBinding.objects.create(target=pbm, policy=self.policy_true, order=2)
+        with CONFIG.patch("policies.short_circuit", True):
+            engine = PolicyEngine(pbm, self.user)
+        result = engine.build().result
+        self.assertEqual(result.passing, False)
+        self.assertEqual(result.messages, ("dummy", "dummy"))
+        self.assertEqual(
+            [x.skipped for x in result.source_results], [False, False, True]
+        )
+
     def test_engine_negate(self):
         """Test negate flag"""
         pbm = PolicyBindingModel.objects.create()
@@ -113,6 +153,25 @@ class TestPolicyEngine(TestCase):
             engine = PolicyEngine(pbm, self.user)
             engine.build()
 
+    def test_engine_inline(self):
+        """Test inline-safe policies and group bindings are evaluated without a process"""
+        pbm = PolicyBindingModel.objects.create(
+            policy_engine_mode=PolicyEngineMode.MODE_ALL
+        )
+        group = Group.objects.create(name="test-group")
+        group.users.add(self.user)
+        policy = ReputationPolicy.objects.create(
+            name="reputation", check_ip=False, check_username=False
+        )
+        PolicyBinding.objects.create(target=pbm, policy=policy, order=0)
+        PolicyBinding.objects.create(target=pbm, group=group, order=1)
+        with patch("authentik.policies.engine.PolicyProcess.run") as run:
+            engine = PolicyEngine(pbm, self.user)
+            result = engine.build().result
+            run.assert_not_called()
+        self.assertEqual(result.passing, True)
+        self.assertEqual(result.messages, ())
+
     def test_engine_cache(self):
         """Ensure empty policy list passes"""
         pbm = PolicyBindingModel.objects.create()
@@ -131,3 +190,16 @@ class TestPolicyEngine(TestCase):
         self.assertEqual(
             len(cache.keys(f"policy_{binding.policy_binding_uuid.hex}*")), 1
         )
+
+    def test_engine_binding_graph(self):
+        """Ensure bindings are cached per process, and reloaded when they change"""
+        pbm = PolicyBindingModel.objects.create()
+        PolicyBinding.objects.create(target=pbm, policy=self.policy_false, order=0)
+        self.assertEqual(PolicyEngine(pbm, self.user).build().passing, False)
+        with self.assertNumQueries(0):
+            self.assertEqual(PolicyEngine(pbm, self.user).build().passing, False)
+        PolicyBinding.objects.create(target=pbm, policy=self.policy_true, order=1)
+        self.assertEqual(PolicyEngine(pbm, self.user).build().passing, True)
+        # Deleting a policy deletes its bindings
+        self.policy_true.delete()
+        self.assertEqual(PolicyEngine(pbm, self.user).build().passing, False)
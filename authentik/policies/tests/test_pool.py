@@ -0,0 +1,112 @@
+"""policy worker pool tests"""
+from unittest.mock import MagicMock, patch
+
+from django.test import RequestFactory, TestCase
+
+from authentik.core.models import User
+from authentik.lib.config import CONFIG
+from authentik.policies.dummy.models import DummyPolicy
+from authentik.policies.engine import PolicyEngine
+from authentik.policies.expression.models import ExpressionPolicy
+from authentik.policies.models import PolicyBinding, PolicyBindingModel
+from authentik.policies.pool import PolicyWorkerPool, detach_request, get_pool
+from authentik.policies.tests.test_process import clear_policy_cache
+from authentik.policies.types import PolicyRequest
+
+
+class TestPolicyWorkerPool(TestCase):
+    """Policy worker pool tests"""
+
+    def setUp(self):
+        clear_policy_cache()
+        self.user = User.objects.create_user(username="policyuser")
+        self.pbm = PolicyBindingModel.objects.create()
+        self.request = PolicyRequest(self.user)
+        self.request.obj = self.pbm
+        self.pool = PolicyWorkerPool(2, 2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def _binding(self, order: int, result: bool, **kwargs) -> PolicyBinding:
+        policy = DummyPolicy.objects.create(
+            name=f"dummy-{order}",
+            result=result,
+            wait_min=kwargs.pop("wait_min", 0),
+            wait_max=kwargs.pop("wait_max", 1),
+        )
+        return PolicyBinding.objects.create(
+            target=self.pbm, policy=policy, order=order, **kwargs
+        )
+
+    def test_evaluate(self):
+        """Test results are returned in order, even with more bindings than workers"""
+        bindings = [self._binding(idx, idx % 2 == 0) for idx in range(5)]
+        results = self.pool.evaluate(bindings, self.request)
+        self.assertEqual([x.passing for x in results], [True, False, True, False, True])
+        self.assertEqual(
+            [x.source_binding.pk for x in results], [x.pk for x in bindings]
+        )
+
+    def test_negate(self):
+        """Test negate is applied by the worker"""
+        binding = self._binding(0, True, negate=True)
+        result = self.pool.evaluate([binding], self.request)[0]
+        self.assertFalse(result.passing)
+        self.assertEqual(result.messages, ("dummy",))
+
+    def test_timeout(self):
+        """Test hanging workers are killed and replaced"""
+        binding = self._binding(0, True, wait_min=3, wait_max=4, timeout=1)
+        result = self.pool.evaluate([binding], self.request)[0]
+        self.assertFalse(result.passing)
+        self.assertEqual(result.messages, ("Policy execution timed out",))
+        self.assertEqual(self.pool._workers, 0)
+        result = self.pool.evaluate([self._binding(1, True)], self.request)[0]
+        self.assertTrue(result.passing)
+
+    def test_daemon(self):
+        """Test bindings are evaluated in-process when we can't start workers"""
+        binding = self._binding(0, True)
+        process = MagicMock(_config={"daemon": True})
+        with patch("authentik.policies.pool.current_process", lambda: process):
+            result = self.pool.evaluate([binding], self.request)[0]
+        self.assertTrue(result.passing)
+        self.assertEqual(result.source_binding, binding)
+        self.assertEqual(self.pool._workers, 0)
+
+    def test_recycle(self):
+        """Test workers are replaced after max_evaluations"""
+        binding = self._binding(0, True)
+        self.pool.evaluate([binding], self.request)
+        worker = self.pool._idle.queue[0]
+        self.pool.evaluate([binding], self.request)
+        self.assertEqual(self.pool._workers, 0)
+        self.pool.evaluate([binding], self.request)
+        self.assertNotEqual(self.pool._idle.queue[0].pid, worker.pid)
+
+    def test_detach_request(self):
+        """Test http request is copied without the session's cache connection"""
+        http_request = RequestFactory().get("/", {"foo": "bar"})
+        http_request.user = self.user
+        self.request.set_http_request(http_request)
+        detached = detach_request(self.request)
+        self.assertEqual(detached.http_request.GET["foo"], "bar")
+        self.assertEqual(detached.http_request.user, self.user)
+        self.assertEqual(detached.obj, self.pbm)
+
+    def test_engine(self):
+        """Test engine with pool enabled"""
+        for idx, expression in enumerate(["return False", "return True"]):
+            PolicyBinding.objects.create(
+                target=self.pbm,
+                policy=ExpressionPolicy.objects.create(
+                    name=f"expr-{idx}", expression=expression
+                ),
+                order=idx,
+            )
+        with CONFIG.patch("policies.pool.enabled", True):
+            engine = PolicyEngine(self.pbm, self.user)
+        self.assertTrue(engine.use_pool)
+        self.assertTrue(engine.build().passing)
+        get_pool().shutdown()
@@ -1,22 +1,21 @@
 """policy process tests"""
 from django.contrib.auth.models import AnonymousUser
-from django.core.cache import cache
 from django.test import RequestFactory, TestCase
 from guardian.shortcuts import get_anonymous_user
 
 from authentik.core.models import Application, Group, User
 from authentik.events.models import Event, EventAction
+from authentik.lib.utils.cache import bump_version
 from authentik.policies.dummy.models import DummyPolicy
 from authentik.policies.expression.models import ExpressionPolicy
 from authentik.policies.models import Policy, PolicyBinding
-from authentik.policies.process import PolicyProcess
+from authentik.policies.process import CACHE_VERSION_POLICIES, PolicyProcess
 from authentik.policies.types import PolicyRequest
 
 
 def clear_policy_cache():
     """Ensure no policy-related keys are stil cached"""
-    keys = cache.keys("policy_*")
-    cache.delete(keys)
+    bump_version(CACHE_VERSION_POLICIES)
 
 
 class TestPolicyProcess(TestCase):
@@ -69,17 +69,27 @@ class PolicyResult:
     source_binding: Optional["PolicyBinding"]
     source_results: Optional[list["PolicyResult"]]
 
+    # Set when the policy wasn't evaluated, since the outcome was already decided
+    skipped: bool = False
+    # Result of the policy before the binding's negation was applied. None when the
+    # policy couldn't be evaluated, e.g. because it timed out.
+    raw_passing: Optional[bool] = None
+
     def __init__(self, passing: bool, *messages: str):
         super().__init__()
         self.passing = passing
         self.messages = messages
         self.source_binding = None
         self.source_results = []
+        self.skipped = False
+        self.raw_passing = None
 
     def __repr__(self):
         return self.__str__()
 
     def __str__(self):
+        if self.skipped:
+            return "<PolicyResult skipped>"
         if self.messages:
             return f"<PolicyResult passing={self.passing} messages={self.messages}>"
         return f"<PolicyResult passing={self.passing}>"
@@ -41,6 +41,7 @@ class OAuth2ProviderSerializer(ProviderSerializer):
             "access_code_validity",
             "token_validity",
             "include_claims_in_id_token",
+            "stateless_tokens",
             "jwt_alg",
             "rsa_key",
             "redirect_uris",
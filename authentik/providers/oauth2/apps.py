@@ -17,3 +17,4 @@ class AuthentikProviderOAuth2Config(AppConfig):
 
     def ready(self) -> None:
         import_module("authentik.providers.oauth2.managed")
+        import_module("authentik.providers.oauth2.signals")
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.3 on 2021-06-02 10:12
+from hashlib import sha256
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+
+def set_access_token_digest(apps: Apps, schema_editor: BaseDatabaseSchemaEditor):
+    db_alias = schema_editor.connection.alias
+    RefreshToken = apps.get_model("authentik_providers_oauth2", "RefreshToken")
+
+    batch = []
+    for token in (
+        RefreshToken.objects.using(db_alias)
+        .exclude(access_token="")
+        .only("pk", "access_token")
+        .iterator()
+    ):
+        token.access_token_digest = sha256(
+            token.access_token.encode("utf-8")
+        ).hexdigest()
+        batch.append(token)
+        if len(batch) >= 1000:
+            RefreshToken.objects.using(db_alias).bulk_update(
+                batch, ["access_token_digest"]
+            )
+            batch = []
+    RefreshToken.objects.using(db_alias).bulk_update(batch, ["access_token_digest"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_providers_oauth2", "0012_oauth2provider_access_code_validity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="refreshtoken",
+            name="access_token_digest",
+            field=models.CharField(
+                default=None, editable=False, max_length=64, null=True, unique=True
+            ),
+        ),
+        migrations.RunPython(set_access_token_digest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.2.3 on 2026-10-18 05:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_providers_oauth2", "0013_refreshtoken_access_token_digest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="oauth2provider",
+            name="stateless_tokens",
+            field=models.BooleanField(
+                default=False,
+                help_text="Verify access tokens by their signature instead of looking them up, and cache userinfo claims until the token expires. Deleted tokens are still rejected.",
+                verbose_name="Stateless tokens",
+            ),
+        ),
+    ]
@@ -21,7 +21,6 @@ from rest_framework.serializers import Serializer
 from authentik.core.models import ExpiringModel, PropertyMapping, Provider, User
 from authentik.crypto.models import CertificateKeyPair
 from authentik.events.models import Event, EventAction
-from authentik.events.utils import get_user
 from authentik.lib.utils.time import timedelta_from_string, timedelta_string_validator
 from authentik.providers.oauth2.apps import AuthentikProviderOAuth2Config
 from authentik.providers.oauth2.constants import ACR_AUTHENTIK_DEFAULT
@@ -162,6 +161,18 @@ class OAuth2Provider(Provider):
         help_text=_("Enter each URI on a new line."),
     )
 
+    stateless_tokens = models.BooleanField(
+        default=False,
+        verbose_name=_("Stateless tokens"),
+        help_text=_(
+            (
+                "Verify access tokens by their signature instead of looking them up, "
+                "and cache userinfo claims until the token expires. Deleted tokens "
+                "are still rejected."
+            )
+        ),
+    )
+
     include_claims_in_id_token = models.BooleanField(
         default=True,
         verbose_name=_("Include claims in id_token"),
@@ -313,6 +324,11 @@ class OAuth2Provider(Provider):
         verbose_name_plural = _("OAuth2/OpenID Providers")
 
 
+def hash_access_token(access_token: str) -> str:
+    """Digest of an access token, which is used to look up tokens"""
+    return sha256(access_token.encode("utf-8")).hexdigest()
+
+
 class BaseGrantModel(models.Model):
     """Base Model for all grants"""
 
@@ -408,6 +424,10 @@ class RefreshToken(ExpiringModel, BaseGrantModel):
     """OAuth2 Refresh Token"""
 
     access_token = models.TextField(verbose_name=_("Access Token"))
+    # Fixed-length digest of access_token, to look up tokens with an index
+    access_token_digest = models.CharField(
+        max_length=64, unique=True, null=True, default=None, editable=False
+    )
     refresh_token = models.CharField(
         max_length=255, unique=True, verbose_name=_("Refresh Token")
     )
@@ -432,6 +452,12 @@ class RefreshToken(ExpiringModel, BaseGrantModel):
     def __str__(self):
         return f"Refresh Token for {self.provider} for user {self.user}"
 
+    def save(self, *args, **kwargs):
+        self.access_token_digest = (
+            hash_access_token(self.access_token) if self.access_token else None
+        )
+        super().save(*args, **kwargs)
+
     @property
     def at_hash(self):
         """Get hashed access_token"""
@@ -481,7 +507,7 @@ class RefreshToken(ExpiringModel, BaseGrantModel):
         )
         # We use the timestamp of the user's last successful login (EventAction.LOGIN) for auth_time
         auth_events = Event.objects.filter(
-            action=EventAction.LOGIN, user=get_user(user)
+            action=EventAction.LOGIN, user__pk=user.pk
         ).order_by("-created")
         # Fallback in case we can't find any login events
         auth_time = datetime.now()
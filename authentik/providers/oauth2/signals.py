@@ -0,0 +1,71 @@
+"""authentik oauth2 provider signals"""
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from authentik.crypto.models import CertificateKeyPair
+from authentik.providers.oauth2.models import OAuth2Provider, RefreshToken
+from authentik.providers.oauth2.stateless import (
+    get_token_uid,
+    provider_cache_key,
+    revoked_cache_key,
+    token_cache_key,
+)
+
+
+@receiver(pre_save, sender=OAuth2Provider)
+# pylint: disable=unused-argument
+def pre_save_provider(sender, instance: OAuth2Provider, **_):
+    """Remember the previous client_id, so its cached verification key can be cleared"""
+    instance.previous_client_id = (
+        OAuth2Provider.objects.filter(pk=instance.pk)
+        .values_list("client_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=OAuth2Provider)
+@receiver(post_delete, sender=OAuth2Provider)
+# pylint: disable=unused-argument
+def invalidate_provider_key(sender, instance: OAuth2Provider, **_):
+    """Clear the cached verification key when a provider is changed"""
+    client_ids = {instance.client_id, getattr(instance, "previous_client_id", None)}
+    cache.delete_many(
+        [provider_cache_key(client_id) for client_id in client_ids if client_id]
+    )
+
+
+@receiver(post_save, sender=CertificateKeyPair)
+# pylint: disable=unused-argument
+def invalidate_provider_keys(sender, instance: CertificateKeyPair, **_):
+    """Clear the cached verification keys of providers signing with a changed key
+    pair. Deleting a key pair deletes its providers, which clears their keys."""
+    client_ids = OAuth2Provider.objects.filter(rsa_key=instance).values_list(
+        "client_id", flat=True
+    )
+    cache.delete_many([provider_cache_key(client_id) for client_id in client_ids])
+
+
+@receiver(post_save, sender=RefreshToken)
+# pylint: disable=unused-argument
+def invalidate_token(sender, instance: RefreshToken, created: bool, **_):
+    """Clear the cached token when it's changed"""
+    if created:
+        return
+    uid = get_token_uid(instance.access_token)
+    if uid:
+        cache.delete(token_cache_key(uid))
+
+
+@receiver(post_delete, sender=RefreshToken)
+# pylint: disable=unused-argument
+def revoke_token(sender, instance: RefreshToken, **_):
+    """Reject stateless access tokens of deleted tokens until they expire"""
+    uid = get_token_uid(instance.access_token)
+    if not uid:
+        return
+    cache.delete(token_cache_key(uid))
+    timeout = (instance.expires - now()).total_seconds()
+    if timeout > 0:
+        cache.set(revoked_cache_key(uid), True, timeout=timeout)
@@ -0,0 +1,132 @@
+"""Stateless access token validation"""
+from dataclasses import dataclass
+from time import time
+from typing import Any, Callable, Optional
+
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.core.cache import cache
+from django.utils.timezone import now
+from jwt import PyJWTError, decode
+from structlog.stdlib import get_logger
+
+from authentik.providers.oauth2.models import (
+    JWTAlgorithms,
+    OAuth2Provider,
+    RefreshToken,
+    hash_access_token,
+)
+
+LOGGER = get_logger()
+CACHE_PREFIX = "goauthentik.io/providers/oauth2"
+
+
+@dataclass
+class VerificationKey:
+    """Key to verify access tokens of a provider, cached by client_id"""
+
+    stateless_tokens: bool
+    jwt_alg: str
+    key: str
+
+
+def provider_cache_key(client_id: str) -> str:
+    """Cache key for the verification key of a provider"""
+    return f"{CACHE_PREFIX}/provider/{client_id}"
+
+
+def token_cache_key(uid: str) -> str:
+    """Cache key for a token, by the uid claim of its access token"""
+    return f"{CACHE_PREFIX}/token/{uid}"
+
+
+def revoked_cache_key(uid: str) -> str:
+    """Cache key which is set when a token is deleted before it expires"""
+    return f"{CACHE_PREFIX}/revoked/{uid}"
+
+
+def get_token_uid(access_token: str) -> Optional[str]:
+    """Get the uid claim of an access token without verifying it"""
+    try:
+        return decode(access_token, options={"verify_signature": False}).get("uid")
+    except PyJWTError:
+        return None
+
+
+def get_verification_key(client_id: str) -> Optional[VerificationKey]:
+    """Get the key to verify access tokens of the provider with `client_id`"""
+    key: Optional[VerificationKey] = cache.get(provider_cache_key(client_id))
+    if key:
+        return key
+    provider = OAuth2Provider.objects.filter(client_id=client_id).first()
+    if not provider:
+        return None
+    key = VerificationKey(provider.stateless_tokens, provider.jwt_alg, "")
+    if provider.jwt_alg == JWTAlgorithms.RS256 and provider.rsa_key:
+        key.key = (
+            provider.rsa_key.private_key.public_key()
+            .public_bytes(Encoding.PEM, PublicFormat.SubjectPublicKeyInfo)
+            .decode()
+        )
+    elif provider.jwt_alg == JWTAlgorithms.HS256:
+        key.key = provider.client_secret
+    else:
+        # Not verifiable without the database, see OAuth2Provider.get_jwt_key
+        key.stateless_tokens = False
+    cache.set(provider_cache_key(client_id), key, timeout=None)
+    return key
+
+
+def get_access_token(access_token: str) -> Optional[RefreshToken]:
+    """Get the token `access_token` belongs to. When the token's provider uses stateless
+    tokens, the token is verified by its signature and loaded from the cache."""
+    digest = hash_access_token(access_token)
+    try:
+        claims = decode(access_token, options={"verify_signature": False})
+    except PyJWTError:
+        claims = {}
+    key = get_verification_key(claims["cid"]) if "cid" in claims else None
+    if not key or not key.stateless_tokens or "uid" not in claims:
+        return (
+            RefreshToken.objects.filter(access_token_digest=digest)
+            .select_related("provider")
+            .first()
+        )
+    try:
+        claims = decode(
+            access_token, key.key, algorithms=[key.jwt_alg], audience=claims["cid"]
+        )
+    except PyJWTError as exc:
+        LOGGER.debug("Failed to verify access token", exc=exc)
+        return None
+    uid = claims["uid"]
+    if cache.get(revoked_cache_key(uid)):
+        LOGGER.debug("Access token was revoked")
+        return None
+    token: Optional[RefreshToken] = cache.get(token_cache_key(uid))
+    if token:
+        return token
+    token = (
+        RefreshToken.objects.filter(access_token_digest=digest)
+        .select_related("provider", "user")
+        .first()
+    )
+    if token:
+        cache.set(token_cache_key(uid), token, timeout=max(claims["exp"] - time(), 1))
+    return token
+
+
+def get_cached_claims(
+    token: RefreshToken, get_claims: Callable[[RefreshToken], dict[str, Any]]
+) -> dict[str, Any]:
+    """Get claims of a token with a stateless provider from the cache,
+    or compute them with `get_claims` and cache them until the token expires"""
+    if not token.provider.stateless_tokens:
+        return get_claims(token)
+    key = f"{CACHE_PREFIX}/claims/{token.pk}/{token._scope}"
+    claims = cache.get(key)
+    if claims is None:
+        claims = get_claims(token)
+        timeout = (token.expires - now()).total_seconds()
+        if timeout > 0:
+            cache.set(key, claims, timeout=timeout)
+    return claims
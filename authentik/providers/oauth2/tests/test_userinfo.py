@@ -0,0 +1,127 @@
+"""Test userinfo and introspection views"""
+import json
+from base64 import b64encode
+
+from django.test import RequestFactory
+from django.urls import reverse
+
+from authentik.core.models import Application, User
+from authentik.crypto.builder import CertificateBuilder
+from authentik.flows.models import Flow
+from authentik.providers.oauth2.generators import (
+    generate_client_id,
+    generate_client_secret,
+)
+from authentik.providers.oauth2.models import (
+    JWTAlgorithms,
+    OAuth2Provider,
+    hash_access_token,
+)
+from authentik.providers.oauth2.stateless import get_verification_key
+from authentik.providers.oauth2.tests.utils import OAuthTestCase
+
+
+class TestUserinfo(OAuthTestCase):
+    """Test userinfo and introspection views"""
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.provider = OAuth2Provider.objects.create(
+            name="test",
+            client_id=generate_client_id(),
+            client_secret=generate_client_secret(),
+            authorization_flow=Flow.objects.first(),
+            redirect_uris="http://local.invalid",
+        )
+        self.app = Application.objects.create(
+            name="test", slug="test", provider=self.provider
+        )
+        self.user = User.objects.get(username="akadmin")
+        request = RequestFactory().get("/")
+        self.token = self.provider.create_refresh_token(self.user, ["openid"], request)
+        self.token.id_token = self.token.create_id_token(self.user, request)
+        self.token.save()
+
+    def test_digest(self):
+        """Test access token digest is set on save"""
+        self.assertEqual(
+            self.token.access_token_digest, hash_access_token(self.token.access_token)
+        )
+
+    def test_userinfo(self):
+        """Test userinfo with bearer token"""
+        response = self.client.get(
+            reverse("authentik_providers_oauth2:userinfo"),
+            HTTP_AUTHORIZATION=f"Bearer {self.token.access_token}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content.decode())["sub"], self.token.id_token.sub
+        )
+
+    def test_userinfo_invalid(self):
+        """Test userinfo with invalid token"""
+        response = self.client.get(
+            reverse("authentik_providers_oauth2:userinfo"),
+            HTTP_AUTHORIZATION="Bearer foo",
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_introspection(self):
+        """Test introspection of access token"""
+        header = b64encode(
+            f"{self.provider.client_id}:{self.provider.client_secret}".encode()
+        ).decode()
+        response = self.client.post(
+            reverse("authentik_providers_oauth2:token-introspection"),
+            data={"token": self.token.access_token},
+            HTTP_AUTHORIZATION=f"Basic {header}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content.decode())["active"])
+
+    def test_userinfo_stateless(self):
+        """Test userinfo with stateless tokens is served from the cache"""
+        self.provider.stateless_tokens = True
+        self.provider.save()
+        url = reverse("authentik_providers_oauth2:userinfo")
+        auth = f"Bearer {self.token.access_token}"
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=auth).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_AUTHORIZATION=auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content.decode())["sub"], self.token.id_token.sub
+        )
+
+    def test_userinfo_stateless_revoked(self):
+        """Test deleted tokens are rejected with stateless tokens"""
+        self.provider.stateless_tokens = True
+        self.provider.save()
+        url = reverse("authentik_providers_oauth2:userinfo")
+        auth = f"Bearer {self.token.access_token}"
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=auth).status_code, 200)
+        self.token.delete()
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=auth).status_code, 401)
+
+    def test_verification_key_invalidated(self):
+        """Test cached verification keys are cleared when the key pair or client_id
+        of a provider change"""
+        builder = CertificateBuilder()
+        builder.build()
+        keypair = builder.save()
+        self.provider.jwt_alg = JWTAlgorithms.RS256
+        self.provider.rsa_key = keypair
+        self.provider.save()
+        key = get_verification_key(self.provider.client_id).key
+        builder = CertificateBuilder()
+        builder.build()
+        keypair.certificate_data = builder.certificate
+        keypair.key_data = builder.private_key
+        keypair.save()
+        self.assertNotEqual(get_verification_key(self.provider.client_id).key, key)
+
+        client_id = self.provider.client_id
+        self.provider.client_id = generate_client_id()
+        self.provider.save()
+        self.assertIsNone(get_verification_key(client_id))
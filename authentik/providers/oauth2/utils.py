@@ -11,7 +11,7 @@ from django.utils.cache import patch_vary_headers
 from structlog.stdlib import get_logger
 
 from authentik.providers.oauth2.errors import BearerTokenError
-from authentik.providers.oauth2.models import RefreshToken
+from authentik.providers.oauth2.stateless import get_access_token
 
 LOGGER = get_logger()
 
@@ -131,11 +131,8 @@ def protected_resource_view(scopes: list[str]):
                     LOGGER.debug("No token passed")
                     raise BearerTokenError("invalid_token")
 
-                try:
-                    kwargs["token"] = RefreshToken.objects.get(
-                        access_token=access_token
-                    )
-                except RefreshToken.DoesNotExist:
+                kwargs["token"] = get_access_token(access_token)
+                if not kwargs["token"]:
                     LOGGER.debug("Token does not exist", access_token=access_token)
                     raise BearerTokenError("invalid_token")
 
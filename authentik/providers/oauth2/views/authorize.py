@@ -14,7 +14,6 @@ from structlog.stdlib import get_logger
 
 from authentik.core.models import Application
 from authentik.events.models import Event, EventAction
-from authentik.events.utils import get_user
 from authentik.flows.models import in_memory_stage
 from authentik.flows.planner import (
     PLAN_CONTEXT_APPLICATION,
@@ -427,7 +426,7 @@ class AuthorizationFlowInitView(PolicyAccessView):
             current_age: timedelta = (
                 timezone.now()
                 - Event.objects.filter(
-                    action=EventAction.LOGIN, user=get_user(self.request.user)
+                    action=EventAction.LOGIN, user__pk=self.request.user.pk
                 )
                 .latest("created")
                 .created
@@ -7,6 +7,7 @@ from structlog.stdlib import get_logger
 
 from authentik.providers.oauth2.errors import TokenIntrospectionError
 from authentik.providers.oauth2.models import IDToken, OAuth2Provider, RefreshToken
+from authentik.providers.oauth2.stateless import get_access_token
 from authentik.providers.oauth2.utils import (
     TokenResponse,
     extract_access_token,
@@ -58,13 +59,11 @@ class TokenIntrospectionParams:
         body_token = extract_access_token(request)
         if not body_token:
             return False
-        tokens = RefreshToken.objects.filter(access_token=body_token).select_related(
-            "provider"
-        )
-        if not tokens.exists():
+        token = get_access_token(body_token)
+        if not token:
             LOGGER.debug("(bearer) Token does not exist")
             raise TokenIntrospectionError()
-        if tokens.first().provider != self.provider:
+        if token.provider != self.provider:
             LOGGER.debug("(bearer) Token providers don't match")
             raise TokenIntrospectionError()
         return True
@@ -74,17 +73,18 @@ class TokenIntrospectionParams:
         """Extract required Parameters from HTTP Request"""
         raw_token = request.POST.get("token")
         token_type_hint = request.POST.get("token_type_hint", "access_token")
-        token_filter = {token_type_hint: raw_token}
-
         if token_type_hint not in ["access_token", "refresh_token"]:
             LOGGER.debug("token_type_hint has invalid value", value=token_type_hint)
             raise TokenIntrospectionError()
-
-        try:
-            token: RefreshToken = RefreshToken.objects.select_related("provider").get(
-                **token_filter
+        if token_type_hint == "access_token":
+            token = get_access_token(raw_token or "")
+        else:
+            token = (
+                RefreshToken.objects.select_related("provider")
+                .filter(refresh_token=raw_token)
+                .first()
             )
-        except RefreshToken.DoesNotExist:
+        if not token:
             LOGGER.debug("Token does not exist", token=raw_token)
             raise TokenIntrospectionError()
 
@@ -14,6 +14,7 @@ from authentik.providers.oauth2.constants import (
     SCOPE_GITHUB_USER_READ,
 )
 from authentik.providers.oauth2.models import RefreshToken, ScopeMapping
+from authentik.providers.oauth2.stateless import get_cached_claims
 from authentik.providers.oauth2.utils import TokenResponse, cors_allow
 
 LOGGER = get_logger()
@@ -98,7 +99,7 @@ class UserInfoView(View):
         """Handle GET Requests for UserInfo"""
         if not self.token:
             return HttpResponseBadRequest()
-        claims = self.get_claims(self.token)
+        claims = dict(get_cached_claims(self.token, self.get_claims))
         claims["sub"] = self.token.id_token.sub
         response = TokenResponse(claims)
         return response
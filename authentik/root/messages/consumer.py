@@ -2,6 +2,13 @@
 from channels.generic.websocket import JsonWebsocketConsumer
 from django.core.cache import cache
 
+from authentik.lib.utils.cache import set_tracked, untrack
+
+
+def messages_cache_index(session_key: str) -> str:
+    """Index of all channels which receive messages for a session"""
+    return f"user_{session_key}_messages"
+
 
 class MessageConsumer(JsonWebsocketConsumer):
     """Consumer which sends django.contrib.messages Messages over WS.
@@ -12,11 +19,18 @@ class MessageConsumer(JsonWebsocketConsumer):
     def connect(self):
         self.accept()
         self.session_key = self.scope["session"].session_key
-        cache.set(f"user_{self.session_key}_messages_{self.channel_name}", True, None)
+        set_tracked(
+            f"user_{self.session_key}_messages_{self.channel_name}",
+            True,
+            [messages_cache_index(self.session_key)],
+            timeout=None,
+        )
 
     # pylint: disable=unused-argument
     def disconnect(self, close_code):
-        cache.delete(f"user_{self.session_key}_messages_{self.channel_name}")
+        key = f"user_{self.session_key}_messages_{self.channel_name}"
+        cache.delete(key)
+        untrack(messages_cache_index(self.session_key), key)
 
     def event_update(self, event: dict):
         """Event handler which is called by Messages Storage backend"""
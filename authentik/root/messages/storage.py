@@ -2,9 +2,11 @@
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
 from django.contrib.messages.storage.base import BaseStorage, Message
-from django.core.cache import cache
 from django.http.request import HttpRequest
 
+from authentik.lib.utils.cache import get_tracked
+from authentik.root.messages.consumer import messages_cache_index
+
 
 class ChannelsStorage(BaseStorage):
     """Send contrib.messages over websocket"""
@@ -19,7 +21,7 @@ class ChannelsStorage(BaseStorage):
 
     def _store(self, messages: list[Message], response, *args, **kwargs):
         prefix = f"user_{self.request.session.session_key}_messages_"
-        keys = cache.keys(f"{prefix}*")
+        keys = get_tracked(messages_cache_index(self.request.session.session_key))
         for key in keys:
             uid = key.replace(prefix, "")
             for message in messages:
@@ -3,6 +3,7 @@ from base64 import b64encode
 from typing import Callable
 
 from django.conf import settings
+from django.core.cache import cache
 from django.db import connections
 from django.db.utils import OperationalError
 from django.http import HttpRequest, HttpResponse
@@ -13,9 +14,19 @@ from prometheus_client import Gauge
 from redis.exceptions import RedisError
 
 from authentik.admin.api.workers import GAUGE_WORKERS
+from authentik.core.tasks import (
+    CACHE_KEY_MODEL_COUNTS,
+    set_model_gauges,
+    update_model_counts,
+)
 from authentik.events.monitored_tasks import TaskInfo
 from authentik.root.celery import CELERY_APP
 
+# Set while a refresh of the model counts is queued, so scrapes don't queue more
+CACHE_KEY_MODEL_COUNTS_QUEUED = "goauthentik.io/root/monitoring/model_counts_queued"
+# Same as the interval model counts are updated in
+MODEL_COUNTS_QUEUED_TIMEOUT = 300
+
 
 class UpdatingGauge(Gauge):
     """Gauge which fetches its own value from an update function.
@@ -55,6 +66,15 @@ class MetricsView(View):
         for task in TaskInfo.all().values():
             task.set_prom_metrics()
 
+        model_counts = cache.get(CACHE_KEY_MODEL_COUNTS)
+        if model_counts is None:
+            if cache.add(
+                CACHE_KEY_MODEL_COUNTS_QUEUED, True, timeout=MODEL_COUNTS_QUEUED_TIMEOUT
+            ):
+                update_model_counts.delay()
+        else:
+            set_model_gauges(model_counts)
+
         return ExportToDjangoView(request)
 
 
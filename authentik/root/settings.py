@@ -207,6 +207,7 @@ MIDDLEWARE = [
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "authentik.core.middleware.RequestIDMiddleware",
+    "authentik.core.middleware.AuthorizationScopeMiddleware",
     "authentik.events.middleware.AuditMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -318,6 +319,16 @@ CELERY_BEAT_SCHEDULE = {
         "schedule": crontab(minute=0, hour=0),
         "options": {"queue": "authentik_scheduled"},
     },
+    "update_model_counts": {
+        "task": "authentik.core.tasks.update_model_counts",
+        "schedule": crontab(minute="*/5"),
+        "options": {"queue": "authentik_scheduled"},
+    },
+    "reconcile_attribute_indexes": {
+        "task": "authentik.core.tasks.reconcile_attribute_indexes",
+        "schedule": crontab(minute=0),
+        "options": {"queue": "authentik_scheduled"},
+    },
 }
 CELERY_TASK_CREATE_MISSING_QUEUES = True
 CELERY_TASK_DEFAULT_QUEUE = "authentik"
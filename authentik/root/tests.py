@@ -1,10 +1,15 @@
 """root tests"""
 from base64 import b64encode
+from unittest.mock import patch
 
 from django.conf import settings
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from authentik.core.tasks import CACHE_KEY_MODEL_COUNTS
+from authentik.root.monitoring import CACHE_KEY_MODEL_COUNTS_QUEUED
+
 
 class TestRoot(TestCase):
     """Test root application"""
@@ -26,3 +31,15 @@ class TestRoot(TestCase):
         auth_headers = {"HTTP_AUTHORIZATION": creds}
         response = self.client.get(reverse("metrics"), **auth_headers)
         self.assertEqual(response.status_code, 200)
+
+    def test_monitoring_model_counts(self):
+        """Test a single refresh of the model counts is queued while none are cached"""
+        cache.delete_many([CACHE_KEY_MODEL_COUNTS, CACHE_KEY_MODEL_COUNTS_QUEUED])
+        self.addCleanup(cache.delete, CACHE_KEY_MODEL_COUNTS_QUEUED)
+        creds = "Basic " + b64encode(f"monitor:{settings.SECRET_KEY}".encode()).decode(
+            "utf-8"
+        )
+        with patch("authentik.root.monitoring.update_model_counts") as update:
+            for _ in range(2):
+                self.client.get(reverse("metrics"), HTTP_AUTHORIZATION=creds)
+        update.delay.assert_called_once()
@@ -35,6 +35,9 @@ class LDAPSourceSerializer(SourceSerializer):
             "sync_users_password",
             "sync_groups",
             "sync_parent_group",
+            "sync_incremental",
+            "change_tracking_field",
+            "sync_full_interval",
             "property_mappings",
             "property_mappings_group",
         ]
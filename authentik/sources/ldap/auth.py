@@ -8,6 +8,7 @@ from structlog.stdlib import get_logger
 
 from authentik.core.models import User
 from authentik.sources.ldap.models import LDAPSource
+from authentik.sources.ldap.pool import get_pools
 
 LOGGER = get_logger()
 LDAP_DISTINGUISHED_NAME = "distinguishedName"
@@ -57,19 +58,24 @@ class LDAPBackend(ModelBackend):
     def auth_user_by_bind(
         self, source: LDAPSource, user: User, password: str
     ) -> Optional[User]:
-        """Attempt authentication by binding to the LDAP server as `user`. This
-        method should be avoided as its slow to do the bind."""
+        """Attempt authentication by binding to the LDAP server as `user`. Connections
+        are borrowed from a pool, so only the bind itself is done for each attempt."""
+        user_dn = user.attributes.get(LDAP_DISTINGUISHED_NAME)
+        if not user_dn:
+            # ldap3 would keep the DN the connection was last bound as
+            LOGGER.debug("User has no LDAP DN, can't bind", user=user)
+            return None
         # Try to bind as new user
         LOGGER.debug("Attempting Binding as user", user=user)
         try:
-            temp_connection = ldap3.Connection(
-                source.connection.server,
-                user=user.attributes.get(LDAP_DISTINGUISHED_NAME),
-                password=password,
-                raise_exceptions=True,
-            )
-            temp_connection.bind()
-            return user
+            with get_pools(source).bind.connection() as connection:
+                bound = connection.rebind(
+                    user=user_dn,
+                    password=password,
+                    read_server_info=False,
+                )
+            if bound:
+                return user
         except ldap3.core.exceptions.LDAPInvalidCredentialsResult as exception:
             LOGGER.debug("LDAPInvalidCredentialsResult", user=user, error=exception)
         except ldap3.core.exceptions.LDAPException as exception:
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+import authentik.lib.utils.time
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentik_sources_ldap", "0011_ldapsource_property_mappings_group"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ldapsource",
+            name="change_tracking_field",
+            field=models.TextField(
+                default="modifyTimestamp",
+                help_text="Field which increases when an object changes, used by incremental syncs. For Active Directory, use uSNChanged.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="ldapsource",
+            name="last_full_sync",
+            field=models.DateTimeField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name="ldapsource",
+            name="sync_full_interval",
+            field=models.TextField(
+                default="days=1",
+                help_text="Interval after which all objects are synced again with incremental syncs (Format: hours=1;minutes=2;seconds=3).",
+                validators=[authentik.lib.utils.time.timedelta_string_validator],
+            ),
+        ),
+        migrations.AddField(
+            model_name="ldapsource",
+            name="sync_high_water_marks",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="ldapsource",
+            name="sync_incremental",
+            field=models.BooleanField(
+                default=False,
+                help_text="Only fetch users and groups which changed since the last successful sync. All objects are synced again after the full sync interval.",
+            ),
+        ),
+    ]
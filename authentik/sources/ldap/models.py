@@ -1,13 +1,17 @@
 """authentik LDAP Models"""
-from typing import Optional, Type
+from contextlib import contextmanager
+from typing import Iterator, Optional, Type
 
 from django.db import models
+from django.utils.timezone import now
 from django.utils.translation import gettext_lazy as _
 from ldap3 import ALL, Connection, Server
 from rest_framework.serializers import Serializer
 
 from authentik.core.models import Group, PropertyMapping, Source
 from authentik.lib.models import DomainlessURLValidator
+from authentik.lib.utils.time import timedelta_from_string, timedelta_string_validator
+from authentik.sources.ldap.pool import get_pools
 
 
 class LDAPSource(Source):
@@ -71,6 +75,49 @@ class LDAPSource(Source):
         Group, blank=True, null=True, default=None, on_delete=models.SET_DEFAULT
     )
 
+    sync_incremental = models.BooleanField(
+        default=False,
+        help_text=_(
+            (
+                "Only fetch users and groups which changed since the last successful "
+                "sync. All objects are synced again after the full sync interval."
+            )
+        ),
+    )
+    change_tracking_field = models.TextField(
+        default="modifyTimestamp",
+        help_text=_(
+            (
+                "Field which increases when an object changes, used by incremental "
+                "syncs. For Active Directory, use uSNChanged."
+            )
+        ),
+    )
+    sync_full_interval = models.TextField(
+        default="days=1",
+        validators=[timedelta_string_validator],
+        help_text=_(
+            (
+                "Interval after which all objects are synced again with incremental "
+                "syncs (Format: hours=1;minutes=2;seconds=3)."
+            )
+        ),
+    )
+    # Highest value of `change_tracking_field` seen by the last successful sync,
+    # by object type
+    sync_high_water_marks = models.JSONField(default=dict, blank=True)
+    last_full_sync = models.DateTimeField(null=True, default=None, blank=True)
+
+    @property
+    def sync_full(self) -> bool:
+        """Check if the next sync has to fetch all objects"""
+        if not self.sync_incremental or not self.last_full_sync:
+            return True
+        return (
+            self.last_full_sync + timedelta_from_string(self.sync_full_interval)
+            <= now()
+        )
+
     @property
     def component(self) -> str:
         return "ak-source-ldap-form"
@@ -81,24 +128,27 @@ class LDAPSource(Source):
 
         return LDAPSourceSerializer
 
-    _connection: Optional[Connection] = None
-
-    @property
-    def connection(self) -> Connection:
-        """Get a fully connected and bound LDAP Connection"""
-        if not self._connection:
-            server = Server(self.server_uri, get_info=ALL)
-            self._connection = Connection(
-                server,
-                raise_exceptions=True,
-                user=self.bind_cn,
-                password=self.bind_password,
-            )
-
-            self._connection.bind()
-            if self.start_tls:
-                self._connection.start_tls()
-        return self._connection
+    def connect(self, server: Optional[Server] = None, bind: bool = True) -> Connection:
+        """Open a new connection, using StartTLS when enabled, and bind as the service
+        account unless `bind` is False"""
+        connection = Connection(
+            server or Server(self.server_uri, get_info=ALL),
+            raise_exceptions=True,
+            user=self.bind_cn,
+            password=self.bind_password,
+        )
+        connection.open()
+        if self.start_tls:
+            connection.start_tls(read_server_info=False)
+        if bind:
+            connection.bind()
+        return connection
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Borrow a connection bound as the service account from this process's pool"""
+        with get_pools(self).service.connection() as connection:
+            yield connection
 
     class Meta:
 
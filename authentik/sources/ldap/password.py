@@ -50,7 +50,8 @@ class LDAPPasswordChanger:
 
     def get_domain_root_dn(self) -> str:
         """Attempt to get root DN via MS specific fields or generic LDAP fields"""
-        info = self._source.connection.server.info
+        with self._source.connection() as connection:
+            info = connection.server.info
         if "rootDomainNamingContext" in info.other:
             return info.other["rootDomainNamingContext"][0]
         naming_contexts = info.naming_contexts
@@ -60,13 +61,14 @@ class LDAPPasswordChanger:
     def check_ad_password_complexity_enabled(self) -> bool:
         """Check if DOMAIN_PASSWORD_COMPLEX is enabled"""
         root_dn = self.get_domain_root_dn()
-        root_attrs = self._source.connection.extend.standard.paged_search(
-            search_base=root_dn,
-            search_filter="(objectClass=*)",
-            search_scope=ldap3.BASE,
-            attributes=["pwdProperties"],
-        )
-        root_attrs = list(root_attrs)[0]
+        with self._source.connection() as connection:
+            root_attrs = connection.extend.standard.paged_search(
+                search_base=root_dn,
+                search_filter="(objectClass=*)",
+                search_scope=ldap3.BASE,
+                attributes=["pwdProperties"],
+            )
+            root_attrs = list(root_attrs)[0]
         pwd_properties = PwdProperties(root_attrs["attributes"]["pwdProperties"])
         if PwdProperties.DOMAIN_PASSWORD_COMPLEX in pwd_properties:
             return True
@@ -79,18 +81,20 @@ class LDAPPasswordChanger:
         if not user_dn:
             LOGGER.info(f"User has no {LDAP_DISTINGUISHED_NAME} set.")
             return
-        self._source.connection.extend.microsoft.modify_password(user_dn, password)
+        with self._source.connection() as connection:
+            connection.extend.microsoft.modify_password(user_dn, password)
 
     def _ad_check_password_existing(self, password: str, user_dn: str) -> bool:
         """Check if a password contains sAMAccount or displayName"""
-        users = list(
-            self._source.connection.extend.standard.paged_search(
-                search_base=user_dn,
-                search_filter=self._source.user_object_filter,
-                search_scope=ldap3.BASE,
-                attributes=["displayName", "sAMAccountName"],
+        with self._source.connection() as connection:
+            users = list(
+                connection.extend.standard.paged_search(
+                    search_base=user_dn,
+                    search_filter=self._source.user_object_filter,
+                    search_scope=ldap3.BASE,
+                    attributes=["displayName", "sAMAccountName"],
+                )
             )
-        )
         if len(users) != 1:
             raise AssertionError()
         user_attributes = users[0]["attributes"]
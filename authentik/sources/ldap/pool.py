@@ -0,0 +1,201 @@
+"""Per-process pools of LDAP connections"""
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from hashlib import sha256
+from os import getpid
+from threading import Lock
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Iterator, Optional
+
+from ldap3 import ALL, ANONYMOUS, BASE, NO_ATTRIBUTES, Connection, Server
+from ldap3.core.exceptions import LDAPException, LDAPOperationResult
+from structlog.stdlib import get_logger
+
+from authentik.lib.config import CONFIG
+
+if TYPE_CHECKING:
+    from authentik.sources.ldap.models import LDAPSource
+
+LOGGER = get_logger()
+# Connections which have been idle for longer than this are checked with a
+# cheap search of the root DSE before they are handed out again
+HEALTH_CHECK_AFTER = 30
+
+
+@dataclass
+class PooledConnection:
+    """Connection held by a pool and when it was last returned"""
+
+    connection: Connection
+    released: float = field(default_factory=monotonic)
+
+
+class LDAPConnectionPool:
+    """Pool of connections created by `factory`. At most `max_size` idle connections
+    are kept, connections idle for longer than `idle_timeout` seconds are closed.
+    When all pooled connections are in use, additional ones are created.
+    Borrowed connections are passed to `reset` before they're returned, which returns
+    False when the connection can't be reused."""
+
+    def __init__(
+        self,
+        factory: Callable[[], Connection],
+        max_size: int,
+        idle_timeout: int,
+        reset: Optional[Callable[[Connection], bool]] = None,
+    ):
+        self.factory = factory
+        self.reset = reset
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._idle: list[PooledConnection] = []
+        self._lock = Lock()
+
+    def _healthy(self, pooled: PooledConnection) -> bool:
+        """Check if an idle connection can still be used"""
+        if pooled.connection.closed:
+            return False
+        idle = monotonic() - pooled.released
+        if idle > self.idle_timeout:
+            return False
+        if idle > HEALTH_CHECK_AFTER:
+            try:
+                pooled.connection.search(
+                    "", "(objectClass=*)", search_scope=BASE, attributes=NO_ATTRIBUTES
+                )
+            except LDAPException as exc:
+                LOGGER.debug("Pooled LDAP connection failed health check", exc=exc)
+                return False
+        return True
+
+    def acquire(self) -> Connection:
+        """Get a healthy idle connection, or create a new one"""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                # Most recently used first, so that surplus connections time out
+                pooled = self._idle.pop()
+            if self._healthy(pooled):
+                return pooled.connection
+            self._close(pooled.connection)
+        return self.factory()
+
+    def release(self, connection: Connection, healthy: bool = True):
+        """Return `connection` to the pool, or close it when it's not healthy or the
+        pool is full"""
+        if healthy and not connection.closed:
+            with self._lock:
+                if len(self._idle) < self.max_size:
+                    self._idle.append(PooledConnection(connection))
+                    return
+        self._close(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        """Borrow a connection for the duration of the context. Connections are only
+        returned to the pool when no error, other than an unsuccessful LDAP result,
+        occurred while using them."""
+        connection = self.acquire()
+        healthy = False
+        try:
+            yield connection
+            healthy = True
+        except LDAPOperationResult:
+            healthy = True
+            raise
+        finally:
+            if healthy and self.reset:
+                healthy = self.reset(connection)
+            self.release(connection, healthy)
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close(pooled.connection)
+
+    @staticmethod
+    def _close(connection: Connection):
+        try:
+            connection.unbind()
+        except LDAPException:
+            pass
+
+
+def reset_bind(connection: Connection) -> bool:
+    """Bind `connection` anonymously again after it was bound as a user, so neither
+    the user's identity nor their password are kept in the pool"""
+    connection.user = ""
+    connection.password = None
+    try:
+        return connection.rebind(authentication=ANONYMOUS, read_server_info=False)
+    except LDAPException as exc:
+        LOGGER.debug("Failed to reset LDAP connection", exc=exc)
+        return False
+
+
+class LDAPSourcePools:
+    """Pools of a single source, one for connections bound as the service account,
+    and one for binding as users. Both share the same server, so its info is only
+    read once."""
+
+    def __init__(self, source: "LDAPSource"):
+        self.fingerprint = source_fingerprint(source)
+        self.server = Server(source.server_uri, get_info=ALL)
+        max_size = int(CONFIG.y("ldap.pool.max_size", 10))
+        idle_timeout = int(CONFIG.y("ldap.pool.idle_timeout", 300))
+        self.service = LDAPConnectionPool(
+            lambda: source.connect(self.server), max_size, idle_timeout
+        )
+        self.bind = LDAPConnectionPool(
+            lambda: source.connect(self.server, bind=False),
+            max_size,
+            idle_timeout,
+            reset=reset_bind,
+        )
+
+    def close(self):
+        """Close all idle connections of both pools"""
+        self.service.close()
+        self.bind.close()
+
+
+def source_fingerprint(source: "LDAPSource") -> str:
+    """Hash of all settings connections of `source` depend on"""
+    settings = "\0".join(
+        [source.server_uri, source.bind_cn, source.bind_password, str(source.start_tls)]
+    )
+    return sha256(settings.encode()).hexdigest()
+
+
+_POOLS: dict = {}
+_POOLS_PID = getpid()
+_POOLS_LOCK = Lock()
+
+
+def get_pools(source: "LDAPSource") -> LDAPSourcePools:
+    """Get the pools of `source` in this process. Pools are replaced when the source's
+    connection settings changed, and aren't shared with forked processes."""
+    global _POOLS_PID  # pylint: disable=global-statement
+    with _POOLS_LOCK:
+        if _POOLS_PID != getpid():
+            # Connections inherited from the parent process can't be used
+            _POOLS.clear()
+            _POOLS_PID = getpid()
+        pools = _POOLS.get(source.pk)
+        if pools and pools.fingerprint == source_fingerprint(source):
+            return pools
+        _POOLS[source.pk] = new_pools = LDAPSourcePools(source)
+    if pools:
+        pools.close()
+    return new_pools
+
+
+def close_pools(source: "LDAPSource"):
+    """Close the pools of `source` in this process"""
+    with _POOLS_LOCK:
+        pools = _POOLS.pop(source.pk, None)
+    if pools:
+        pools.close()
@@ -1,7 +1,7 @@
 """authentik ldap source signals"""
 from typing import Any
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 from ldap3.core.exceptions import LDAPOperationResult
@@ -13,6 +13,7 @@ from authentik.events.models import Event, EventAction
 from authentik.flows.planner import PLAN_CONTEXT_PENDING_USER
 from authentik.sources.ldap.models import LDAPSource
 from authentik.sources.ldap.password import LDAPPasswordChanger
+from authentik.sources.ldap.pool import close_pools
 from authentik.sources.ldap.tasks import ldap_sync
 from authentik.stages.prompt.signals import password_validate
 
@@ -20,9 +21,17 @@ from authentik.stages.prompt.signals import password_validate
 @receiver(post_save, sender=LDAPSource)
 # pylint: disable=unused-argument
 def sync_ldap_source_on_save(sender, instance: LDAPSource, **_):
-    """Ensure that source is synced on save (if enabled)"""
+    """Ensure that source is synced on save (if enabled). All objects are synced, as
+    the source's settings might have changed."""
     if instance.enabled:
-        ldap_sync.delay(instance.pk)
+        ldap_sync.delay(instance.pk, full=True)
+
+
+@receiver(post_delete, sender=LDAPSource)
+# pylint: disable=unused-argument
+def close_ldap_source_pools(sender, instance: LDAPSource, **_):
+    """Close pooled connections of a deleted source"""
+    close_pools(instance)
 
 
 @receiver(password_validate)
@@ -1,14 +1,103 @@
 """Sync LDAP Users and groups into authentik"""
-from typing import Any
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Optional
 
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Model
 from django.db.models.query import QuerySet
+from django.db.utils import IntegrityError
+from django.utils.functional import cached_property
+from ldap3.utils.conv import escape_filter_chars
+from pytz import UTC
 from structlog.stdlib import BoundLogger, get_logger
 
+from authentik.core.api.applications import CACHE_VERSION_USER_APPS, user_app_cache_key
+from authentik.core.authorization import clear_authorization_scope
 from authentik.core.exceptions import PropertyMappingExpressionException
+from authentik.core.models import Group, User
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.cache import bump_version
 from authentik.sources.ldap.auth import LDAP_DISTINGUISHED_NAME
 from authentik.sources.ldap.models import LDAPPropertyMapping, LDAPSource
 
 LDAP_UNIQUENESS = "ldap_uniq"
+# Objects are sharded by the first character of this attribute
+SHARD_CHARACTERS = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def get_shard_config() -> tuple[int, str]:
+    """Configured amount of shards and the attribute objects are sharded by"""
+    return (
+        int(CONFIG.y("ldap.sync.shards", 1)),
+        CONFIG.y("ldap.sync.shard_attribute", "cn"),
+    )
+
+
+def shard_characters(shards: int) -> list[str]:
+    """Characters of all shards except the last one"""
+    size = -(-len(SHARD_CHARACTERS) // (shards - 1))
+    return [
+        SHARD_CHARACTERS[idx : idx + size]
+        for idx in range(0, len(SHARD_CHARACTERS), size)
+    ]
+
+
+def _prefix_filters(attribute: str, chars: str) -> list[str]:
+    """Filters for values of `attribute` starting with any of `chars`, in any case"""
+    return [
+        f"({attribute}={variant}*)"
+        for char in chars
+        for variant in sorted({char, char.upper()})
+    ]
+
+
+def shard_filters(shards: int, attribute: str) -> list[str]:
+    """Split objects into up to `shards` LDAP filters by the first character of
+    `attribute`. The last shard contains all objects without the attribute, or with
+    no value starting with a letter or digit. Objects with multiple values can match
+    multiple shards, see `shard_index`."""
+    if shards <= 1:
+        return [""]
+    filters = [
+        f"(|{''.join(_prefix_filters(attribute, chars))})"
+        for chars in shard_characters(shards)
+    ]
+    filters.append(
+        f"(|(!({attribute}=*))(&"
+        + "".join(
+            f"(!{prefix})" for prefix in _prefix_filters(attribute, SHARD_CHARACTERS)
+        )
+        + "))"
+    )
+    return filters
+
+
+def shard_index(shards: int, values: Any) -> int:
+    """Index of the shard which syncs an object with `values` of the shard attribute.
+    An object is returned by the shards of all of its values, but only synced by the
+    first of them, so it's never synced concurrently."""
+    groups = shard_characters(shards)
+    if not isinstance(values, list):
+        values = [values]
+    indexes = [len(groups)]
+    for value in values:
+        char = str(value)[:1].lower() if value is not None else ""
+        indexes.extend(
+            idx for idx, chars in enumerate(groups) if char and char in chars
+        )
+    return min(indexes)
+
+
+def max_high_water_mark(*marks: Optional[str]) -> Optional[str]:
+    """Get the highest of high-water marks, comparing numbers by value"""
+    marks = [mark for mark in marks if mark is not None]
+    if not marks:
+        return None
+    if all(mark.isdigit() for mark in marks):
+        return max(marks, key=int)
+    return max(marks)
 
 
 class BaseLDAPSynchronizer:
@@ -17,9 +106,36 @@ class BaseLDAPSynchronizer:
     _source: LDAPSource
     _logger: BoundLogger
 
-    def __init__(self, source: LDAPSource):
+    # Model of synced objects and the field property mappings have to set,
+    # used by bulk syncs
+    model: Optional[type[Model]] = None
+    required_field = ""
+
+    # Key of the source's high-water mark for the objects synced by this synchronizer
+    mark_key = ""
+
+    # Only fetch objects which changed since the last sync
+    incremental: bool
+    # Only sync objects of the shard with this index, see `shard_filters`
+    shard: Optional[int]
+    # Highest value of the source's change tracking field seen in this sync
+    high_water_mark: Optional[Any]
+
+    # Amount of created, updated and unchanged objects
+    stats: dict[str, int]
+
+    def __init__(
+        self,
+        source: LDAPSource,
+        incremental: bool = False,
+        shard: Optional[int] = None,
+    ):
         self._source = source
         self._logger = get_logger().bind(source=source, syncer=self.__class__.__name__)
+        self.incremental = incremental
+        self.shard = shard
+        self.high_water_mark = None
+        self.stats = {"created": 0, "updated": 0, "unchanged": 0}
 
     @property
     def base_dn_users(self) -> str:
@@ -39,6 +155,197 @@ class BaseLDAPSynchronizer:
         """Sync function, implemented in subclass"""
         raise NotImplementedError()
 
+    def search_filter(self, object_filter: str) -> str:
+        """Restrict `object_filter` to the shard of this sync, and to objects which
+        changed since the last sync when this sync is incremental"""
+        filters = [object_filter]
+        if self.shard is not None:
+            filters.append(shard_filters(*get_shard_config())[self.shard])
+        mark = self._source.sync_high_water_marks.get(self.mark_key)
+        if self.incremental and mark is not None:
+            field = self._source.change_tracking_field
+            filters.append(f"({field}>={escape_filter_chars(mark)})")
+        if len(filters) == 1:
+            return object_filter
+        return f"(&{''.join(filters)})"
+
+    def track_change(self, attributes: dict[str, Any]):
+        """Remember the highest value of the change tracking field of all entries"""
+        value = self._flatten(attributes.get(self._source.change_tracking_field))
+        if value is None:
+            return
+        if self.high_water_mark is not None:
+            if self._mark_order(value) <= self._mark_order(self.high_water_mark):
+                return
+        self.high_water_mark = value
+
+    def _mark_order(self, value: Any) -> Any:
+        """Compare numbers by value, also when they're returned as strings (e.g. when
+        the server's schema isn't known)"""
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+        return value
+
+    @property
+    def new_high_water_mark(self) -> Optional[str]:
+        """High-water mark to store on the source after a successful sync"""
+        if isinstance(self.high_water_mark, datetime):
+            return self.high_water_mark.astimezone(UTC).strftime("%Y%m%d%H%M%SZ")
+        if self.high_water_mark is None:
+            return None
+        return str(self.high_water_mark)
+
+    def sync_entry(self, entry: dict[str, Any]) -> bool:
+        """Create or update a single object from `entry`, implemented in subclass.
+        Returns True when the object was synced."""
+        raise NotImplementedError()
+
+    def get_existing(self, uniqs: Iterable[str]) -> QuerySet:
+        """Objects which were already synced with one of `uniqs`, used by bulk syncs"""
+        return self.model.objects.filter(
+            **{f"attributes__{LDAP_UNIQUENESS}__in": list(uniqs)}
+        )
+
+    def new_object(self, entry: dict[str, Any], properties: dict[str, Any]) -> Model:
+        """Create an unsaved object from `entry`, used by bulk syncs"""
+        raise NotImplementedError()
+
+    def update_object(
+        self, instance: Model, entry: dict[str, Any], properties: dict[str, Any]
+    ) -> set[str]:
+        """Update `instance` with `properties` and return the fields which changed"""
+        changed = set()
+        for field, value in properties.items():
+            if getattr(instance, field) != value:
+                setattr(instance, field, value)
+                changed.add(field)
+        return changed
+
+    def after_bulk(self, created: list[Model], updated: list[Model]):
+        """Called after a chunk of objects was saved. Bulk queries don't send
+        post_save, so caches depending on users and groups are invalidated here."""
+        if not created and not updated:
+            return
+        if self.model is User:
+            cache.delete_many([user_app_cache_key(user.pk) for user in updated])
+        if self.model is Group:
+            bump_version(CACHE_VERSION_USER_APPS)
+        clear_authorization_scope()
+
+    def sync_entries(self, entries: Iterator[dict[str, Any]]) -> int:
+        """Sync all entries one by one, or in chunks with bulk queries when
+        `ldap.sync.bulk` is enabled"""
+        entries = self._track_changes(entries)
+        if not CONFIG.y_bool("ldap.sync.bulk"):
+            return sum(1 for entry in entries if self.sync_entry(entry))
+        chunk_size = int(CONFIG.y("ldap.sync.chunk_size", 1000))
+        count = 0
+        chunk = []
+        for entry in entries:
+            chunk.append(entry)
+            if len(chunk) >= chunk_size:
+                count += self._sync_chunk(chunk)
+                chunk = []
+        if chunk:
+            count += self._sync_chunk(chunk)
+        return count
+
+    def owns_entry(self, attributes: dict[str, Any]) -> bool:
+        """Check if an object belongs to the shard of this sync. Objects with multiple
+        values of the shard attribute are fetched by multiple shards, but only synced
+        by one of them"""
+        if self.shard is None:
+            return True
+        shards, attribute = get_shard_config()
+        return shard_index(shards, attributes.get(attribute)) == self.shard
+
+    def _track_changes(
+        self, entries: Iterator[dict[str, Any]]
+    ) -> Iterator[dict[str, Any]]:
+        for entry in entries:
+            attributes = entry.get("attributes", {})
+            self.track_change(attributes)
+            if self.owns_entry(attributes):
+                yield entry
+
+    def _sync_chunk(self, chunk: list[dict[str, Any]]) -> int:
+        """Load the existing objects of `chunk` with a single query, and create and
+        update objects with one query each"""
+        pending: dict[str, tuple[dict[str, Any], dict[str, Any]]] = {}
+        single = []
+        for entry in chunk:
+            parsed = self.parse_entry(entry)
+            if not parsed:
+                continue
+            dn, uniq, attributes = parsed
+            properties = self.build_properties(dn, **attributes)
+            if not self._valid_properties(properties):
+                # Synced one by one to report the error
+                single.append(entry)
+                continue
+            pending[uniq] = (entry, properties)
+        queryset = self.get_existing(pending.keys())
+        existing = {
+            instance.attributes.get(LDAP_UNIQUENESS): instance for instance in queryset
+        }
+        created, updated, fields = [], [], set()
+        for uniq, (entry, properties) in pending.items():
+            instance = existing.get(uniq)
+            if not instance:
+                created.append(self.new_object(entry, properties))
+                continue
+            changed = self.update_object(instance, entry, properties)
+            if changed:
+                updated.append(instance)
+                fields.update(changed)
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(created)
+                if updated:
+                    self.model.objects.bulk_update(updated, fields)
+        except IntegrityError as exc:
+            self._logger.warning(
+                "Failed to sync chunk, syncing objects one by one", exc=exc
+            )
+            return sum(1 for entry in chunk if self.sync_entry(entry))
+        self.after_bulk(created, updated)
+        self.stats["created"] += len(created)
+        self.stats["updated"] += len(updated)
+        self.stats["unchanged"] += len(pending) - len(created) - len(updated)
+        self._logger.debug(
+            "Synced chunk", created=len(created), updated=len(updated), total=len(chunk)
+        )
+        return len(pending) + sum(1 for entry in single if self.sync_entry(entry))
+
+    def _valid_properties(self, properties: dict[str, Any]) -> bool:
+        """Check that the required field is set and all fields exist"""
+        if self.required_field not in properties:
+            return False
+        try:
+            for field in properties:
+                self.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def build_properties(self, object_dn: str, **kwargs) -> dict[str, Any]:
+        """Build the properties of an object, implemented in subclass"""
+        raise NotImplementedError()
+
+    def parse_entry(self, entry: dict[str, Any]) -> Optional[tuple[str, str, dict]]:
+        """Get the DN, unique identifier and attributes of an entry"""
+        attributes = entry.get("attributes", {})
+        dn = self._flatten(entry.get("entryDN", entry.get("dn")))
+        if self._source.object_uniqueness_field not in attributes:
+            self._logger.warning(
+                "Cannot find uniqueness Field in attributes",
+                attributes=attributes.keys(),
+                dn=dn,
+            )
+            return None
+        uniq = self._flatten(attributes[self._source.object_uniqueness_field])
+        return dn, uniq, attributes
+
     def _flatten(self, value: Any) -> Any:
         """Flatten `value` if its a list"""
         if isinstance(value, list):
@@ -49,24 +356,35 @@ class BaseLDAPSynchronizer:
 
     def build_user_properties(self, user_dn: str, **kwargs) -> dict[str, Any]:
         """Build attributes for User object based on property mappings."""
-        return self._build_object_properties(
-            user_dn, self._source.property_mappings, **kwargs
-        )
+        return self._build_object_properties(user_dn, self._user_mappings, **kwargs)
 
     def build_group_properties(self, group_dn: str, **kwargs) -> dict[str, Any]:
         """Build attributes for Group object based on property mappings."""
-        return self._build_object_properties(
-            group_dn, self._source.property_mappings_group, **kwargs
-        )
+        return self._build_object_properties(group_dn, self._group_mappings, **kwargs)
+
+    @cached_property
+    def _user_mappings(self) -> list[LDAPPropertyMapping]:
+        """Property mappings for users, loaded once per sync"""
+        return self._get_mappings(self._source.property_mappings)
+
+    @cached_property
+    def _group_mappings(self) -> list[LDAPPropertyMapping]:
+        """Property mappings for groups, loaded once per sync"""
+        return self._get_mappings(self._source.property_mappings_group)
+
+    def _get_mappings(self, mappings: QuerySet) -> list[LDAPPropertyMapping]:
+        """Load LDAP property mappings with their subclass"""
+        return [
+            mapping
+            for mapping in mappings.all().select_subclasses()
+            if isinstance(mapping, LDAPPropertyMapping)
+        ]
 
     def _build_object_properties(
-        self, object_dn: str, mappings: QuerySet, **kwargs
+        self, object_dn: str, mappings: list[LDAPPropertyMapping], **kwargs
     ) -> dict[str, dict[Any, Any]]:
         properties = {"attributes": {}}
-        for mapping in mappings.all().select_subclasses():
-            if not isinstance(mapping, LDAPPropertyMapping):
-                continue
-            mapping: LDAPPropertyMapping
+        for mapping in mappings:
             try:
                 value = mapping.evaluate(
                     user=None, request=None, ldap=kwargs, dn=object_dn
@@ -1,9 +1,13 @@
 """Sync LDAP Users and groups into authentik"""
+from typing import Any, Iterable
+
 import ldap3
 import ldap3.core.exceptions
 from django.core.exceptions import FieldError
+from django.db.models.query import QuerySet
 from django.db.utils import IntegrityError
 
+from authentik.core.hierarchy import defer_group_hierarchy, rebuild_group_hierarchy
 from authentik.core.models import Group
 from authentik.events.models import Event, EventAction
 from authentik.sources.ldap.sync.base import LDAP_UNIQUENESS, BaseLDAPSynchronizer
@@ -12,55 +16,69 @@ from authentik.sources.ldap.sync.base import LDAP_UNIQUENESS, BaseLDAPSynchroniz
 class GroupLDAPSynchronizer(BaseLDAPSynchronizer):
     """Sync LDAP Users and groups into authentik"""
 
+    model = Group
+    mark_key = "groups"
+    required_field = "name"
+
     def sync(self) -> int:
         """Iterate over all LDAP Groups and create authentik_core.Group instances"""
         if not self._source.sync_groups:
             self._logger.warning("Group syncing is disabled for this Source")
             return -1
-        groups = self._source.connection.extend.standard.paged_search(
-            search_base=self.base_dn_groups,
-            search_filter=self._source.group_object_filter,
-            search_scope=ldap3.SUBTREE,
-            attributes=[ldap3.ALL_ATTRIBUTES, ldap3.ALL_OPERATIONAL_ATTRIBUTES],
-        )
-        group_count = 0
-        for group in groups:
-            attributes = group.get("attributes", {})
-            group_dn = self._flatten(
-                self._flatten(group.get("entryDN", group.get("dn")))
+        with self._source.connection() as connection:
+            groups = connection.extend.standard.paged_search(
+                search_base=self.base_dn_groups,
+                search_filter=self.search_filter(self._source.group_object_filter),
+                search_scope=ldap3.SUBTREE,
+                attributes=[ldap3.ALL_ATTRIBUTES, ldap3.ALL_OPERATIONAL_ATTRIBUTES],
+            )
+            # Update the group hierarchy once all groups are synced
+            with defer_group_hierarchy():
+                return self.sync_entries(groups)
+
+    def build_properties(self, object_dn: str, **kwargs) -> dict[str, Any]:
+        return self.build_group_properties(object_dn, **kwargs)
+
+    def get_existing(self, uniqs: Iterable[str]) -> QuerySet:
+        return super().get_existing(uniqs).filter(parent=self._source.sync_parent_group)
+
+    def new_object(self, entry: dict[str, Any], properties: dict[str, Any]) -> Group:
+        return Group(parent=self._source.sync_parent_group, **properties)
+
+    def after_bulk(self, created: list[Group], updated: list[Group]):
+        super().after_bulk(created, updated)
+        # Created in bulk without signals, so their hierarchy is built here
+        rebuild_group_hierarchy([group.pk for group in created])
+
+    def sync_entry(self, entry: dict[str, Any]) -> bool:
+        parsed = self.parse_entry(entry)
+        if not parsed:
+            return False
+        group_dn, uniq, attributes = parsed
+        try:
+            defaults = self.build_group_properties(group_dn, **attributes)
+            self._logger.debug("Creating group with attributes", **defaults)
+            if "name" not in defaults:
+                raise IntegrityError("Name was not set by propertymappings")
+            ak_group, created = Group.objects.update_or_create(
+                **{
+                    f"attributes__{LDAP_UNIQUENESS}": uniq,
+                    "parent": self._source.sync_parent_group,
+                    "defaults": defaults,
+                }
             )
-            if self._source.object_uniqueness_field not in attributes:
-                self._logger.warning(
-                    "Cannot find uniqueness Field in attributes",
-                    attributes=attributes.keys(),
-                    dn=group_dn,
-                )
-                continue
-            uniq = self._flatten(attributes[self._source.object_uniqueness_field])
-            try:
-                defaults = self.build_group_properties(group_dn, **attributes)
-                self._logger.debug("Creating group with attributes", **defaults)
-                if "name" not in defaults:
-                    raise IntegrityError("Name was not set by propertymappings")
-                ak_group, created = Group.objects.update_or_create(
-                    **{
-                        f"attributes__{LDAP_UNIQUENESS}": uniq,
-                        "parent": self._source.sync_parent_group,
-                        "defaults": defaults,
-                    }
-                )
-            except (IntegrityError, FieldError) as exc:
-                Event.new(
-                    EventAction.CONFIGURATION_ERROR,
-                    message=(
-                        f"Failed to create group: {str(exc)} "
-                        "To merge new group with existing group, set the groups's "
-                        f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
-                    ),
-                    source=self._source,
-                    dn=group_dn,
-                ).save()
-            else:
-                self._logger.debug("Synced group", group=ak_group.name, created=created)
-                group_count += 1
-        return group_count
+        except (IntegrityError, FieldError) as exc:
+            Event.new(
+                EventAction.CONFIGURATION_ERROR,
+                message=(
+                    f"Failed to create group: {str(exc)} "
+                    "To merge new group with existing group, set the groups's "
+                    f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
+                ),
+                source=self._source,
+                dn=group_dn,
+            ).save()
+            return False
+        self._logger.debug("Synced group", group=ak_group.name, created=created)
+        self.stats["created" if created else "updated"] += 1
+        return True
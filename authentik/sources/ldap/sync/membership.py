@@ -3,60 +3,102 @@ from typing import Any, Optional
 
 import ldap3
 import ldap3.core.exceptions
+from django.db import connection, transaction
 from django.db.models import Q
+from django.db.models.expressions import RawSQL
 
 from authentik.core.models import Group, User
 from authentik.sources.ldap.auth import LDAP_DISTINGUISHED_NAME
 from authentik.sources.ldap.models import LDAPSource
 from authentik.sources.ldap.sync.base import LDAP_UNIQUENESS, BaseLDAPSynchronizer
 
+# Temporary table holding the members of the group which is synced
+MEMBERS_TABLE = "ak_ldap_sync_members"
+
 
 class MembershipLDAPSynchronizer(BaseLDAPSynchronizer):
     """Sync LDAP Users and groups into authentik"""
 
+    mark_key = "groups"
+
     group_cache: dict[str, Group]
 
-    def __init__(self, source: LDAPSource):
-        super().__init__(source)
+    def __init__(
+        self,
+        source: LDAPSource,
+        incremental: bool = False,
+        shard: Optional[int] = None,
+    ):
+        super().__init__(source, incremental, shard)
         self.group_cache: dict[str, Group] = {}
 
     def sync(self) -> int:
         """Iterate over all Users and assign Groups using memberOf Field"""
-        groups = self._source.connection.extend.standard.paged_search(
-            search_base=self.base_dn_groups,
-            search_filter=self._source.group_object_filter,
-            search_scope=ldap3.SUBTREE,
-            attributes=[
-                self._source.group_membership_field,
-                self._source.object_uniqueness_field,
-                LDAP_DISTINGUISHED_NAME,
-            ],
-        )
-        membership_count = 0
-        for group in groups:
-            members = group.get("attributes", {}).get(
-                self._source.group_membership_field, []
+        with self._source.connection() as connection:
+            groups = connection.extend.standard.paged_search(
+                search_base=self.base_dn_groups,
+                search_filter=self.search_filter(self._source.group_object_filter),
+                search_scope=ldap3.SUBTREE,
+                attributes=[
+                    self._source.group_membership_field,
+                    self._source.object_uniqueness_field,
+                    LDAP_DISTINGUISHED_NAME,
+                    self._source.change_tracking_field,
+                ],
             )
-            ak_group = self.get_group(group)
-            if not ak_group:
-                continue
-
-            users = User.objects.filter(
-                Q(**{f"attributes__{LDAP_DISTINGUISHED_NAME}__in": members})
-                | Q(
-                    **{
-                        f"attributes__{LDAP_DISTINGUISHED_NAME}__isnull": True,
-                        "ak_groups__in": [ak_group],
-                    }
+            membership_count = 0
+            for group in groups:
+                self.track_change(group.get("attributes", {}))
+                members = group.get("attributes", {}).get(
+                    self._source.group_membership_field, []
                 )
-            )
-            membership_count += 1
-            membership_count += users.count()
-            ak_group.users.set(users)
-            ak_group.save()
+                ak_group = self.get_group(group)
+                if not ak_group:
+                    continue
+
+                if isinstance(members, str):
+                    members = [members]
+                with transaction.atomic():
+                    users = User.objects.filter(
+                        Q(pk__in=self._members_query(members))
+                        | Q(
+                            **{
+                                f"attributes__{LDAP_DISTINGUISHED_NAME}__isnull": True,
+                                "ak_groups__in": [ak_group],
+                            }
+                        )
+                    )
+                    membership_count += 1
+                    membership_count += users.count()
+                    ak_group.users.set(users)
+                    ak_group.save()
         self._logger.debug("Successfully updated group membership")
         return membership_count
 
+    def _members_query(self, members: list[str]) -> RawSQL:
+        """Load the DNs of `members` into a temporary table, and return a query for the
+        users with these DNs. Joining the table uses the index on the users' DN, which
+        a lookup with a large list of values doesn't."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {MEMBERS_TABLE} (dn text) "
+                "ON COMMIT DROP"
+            )
+            cursor.execute(f"TRUNCATE {MEMBERS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {MEMBERS_TABLE} (dn) SELECT unnest(%s::text[])",
+                [members],
+            )
+            cursor.execute(f"ANALYZE {MEMBERS_TABLE}")
+        return RawSQL(
+            f"""
+            SELECT u.id FROM {User._meta.db_table} u
+            INNER JOIN {MEMBERS_TABLE} m
+                ON (u.attributes -> '{LDAP_DISTINGUISHED_NAME}') = to_jsonb(m.dn)
+            """,  # nosec
+            [],
+        )
+
     def get_group(self, group_dict: dict[str, Any]) -> Optional[Group]:
         """Check if we fetched the group already, and if not cache it for later"""
         group_dn = group_dict.get("attributes", {}).get(LDAP_DISTINGUISHED_NAME, [])
@@ -1,5 +1,6 @@
 """Sync LDAP Users into authentik"""
 from datetime import datetime
+from typing import Any
 
 import ldap3
 import ldap3.core.exceptions
@@ -15,65 +16,88 @@ from authentik.sources.ldap.sync.base import LDAP_UNIQUENESS, BaseLDAPSynchroniz
 class UserLDAPSynchronizer(BaseLDAPSynchronizer):
     """Sync LDAP Users into authentik"""
 
+    model = User
+    mark_key = "users"
+    required_field = "username"
+
     def sync(self) -> int:
         """Iterate over all LDAP Users and create authentik_core.User instances"""
         if not self._source.sync_users:
             self._logger.warning("User syncing is disabled for this Source")
             return -1
-        users = self._source.connection.extend.standard.paged_search(
-            search_base=self.base_dn_users,
-            search_filter=self._source.user_object_filter,
-            search_scope=ldap3.SUBTREE,
-            attributes=[ldap3.ALL_ATTRIBUTES, ldap3.ALL_OPERATIONAL_ATTRIBUTES],
+        with self._source.connection() as connection:
+            users = connection.extend.standard.paged_search(
+                search_base=self.base_dn_users,
+                search_filter=self.search_filter(self._source.user_object_filter),
+                search_scope=ldap3.SUBTREE,
+                attributes=[ldap3.ALL_ATTRIBUTES, ldap3.ALL_OPERATIONAL_ATTRIBUTES],
+            )
+            return self.sync_entries(users)
+
+    def build_properties(self, object_dn: str, **kwargs) -> dict[str, Any]:
+        return self.build_user_properties(object_dn, **kwargs)
+
+    def new_object(self, entry: dict[str, Any], properties: dict[str, Any]) -> User:
+        user = User(**properties)
+        user.set_unusable_password()
+        return user
+
+    def update_object(
+        self, instance: User, entry: dict[str, Any], properties: dict[str, Any]
+    ) -> set[str]:
+        changed = super().update_object(instance, entry, properties)
+        pwd_last_set: datetime = entry.get("attributes", {}).get(
+            "pwdLastSet", datetime.now()
         )
-        user_count = 0
-        for user in users:
-            attributes = user.get("attributes", {})
-            user_dn = self._flatten(user.get("entryDN", user.get("dn")))
-            if self._source.object_uniqueness_field not in attributes:
-                self._logger.warning(
-                    "Cannot find uniqueness Field in attributes",
-                    attributes=attributes.keys(),
-                    dn=user_dn,
-                )
-                continue
-            uniq = self._flatten(attributes[self._source.object_uniqueness_field])
-            try:
-                defaults = self.build_user_properties(user_dn, **attributes)
-                self._logger.debug("Creating user with attributes", **defaults)
-                if "username" not in defaults:
-                    raise IntegrityError("Username was not set by propertymappings")
-                ak_user, created = User.objects.update_or_create(
-                    **{
-                        f"attributes__{LDAP_UNIQUENESS}": uniq,
-                        "defaults": defaults,
-                    }
-                )
-            except (IntegrityError, FieldError) as exc:
-                Event.new(
-                    EventAction.CONFIGURATION_ERROR,
-                    message=(
-                        f"Failed to create user: {str(exc)} "
-                        "To merge new user with existing user, set the user's "
-                        f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
-                    ),
-                    source=self._source,
-                    dn=user_dn,
-                ).save()
-            else:
-                self._logger.debug(
-                    "Synced User", user=ak_user.username, created=created
-                )
-                user_count += 1
-                pwd_last_set: datetime = attributes.get("pwdLastSet", datetime.now())
-                pwd_last_set = pwd_last_set.replace(tzinfo=UTC)
-                if created or pwd_last_set >= ak_user.password_change_date:
-                    self._logger.debug(
-                        "Reset user's password",
-                        user=ak_user.username,
-                        created=created,
-                        pwd_last_set=pwd_last_set,
-                    )
-                    ak_user.set_unusable_password()
-                    ak_user.save()
-        return user_count
+        pwd_last_set = pwd_last_set.replace(tzinfo=UTC)
+        # Resetting an unusable password changes nothing but the random hash
+        if (
+            pwd_last_set >= instance.password_change_date
+            and instance.has_usable_password()
+        ):
+            instance.set_unusable_password()
+            changed.add("password")
+        return changed
+
+    def sync_entry(self, entry: dict[str, Any]) -> bool:
+        parsed = self.parse_entry(entry)
+        if not parsed:
+            return False
+        user_dn, uniq, attributes = parsed
+        try:
+            defaults = self.build_user_properties(user_dn, **attributes)
+            self._logger.debug("Creating user with attributes", **defaults)
+            if "username" not in defaults:
+                raise IntegrityError("Username was not set by propertymappings")
+            ak_user, created = User.objects.update_or_create(
+                **{
+                    f"attributes__{LDAP_UNIQUENESS}": uniq,
+                    "defaults": defaults,
+                }
+            )
+        except (IntegrityError, FieldError) as exc:
+            Event.new(
+                EventAction.CONFIGURATION_ERROR,
+                message=(
+                    f"Failed to create user: {str(exc)} "
+                    "To merge new user with existing user, set the user's "
+                    f"Attribute '{LDAP_UNIQUENESS}' to '{uniq}'"
+                ),
+                source=self._source,
+                dn=user_dn,
+            ).save()
+            return False
+        self._logger.debug("Synced User", user=ak_user.username, created=created)
+        self.stats["created" if created else "updated"] += 1
+        pwd_last_set: datetime = attributes.get("pwdLastSet", datetime.now())
+        pwd_last_set = pwd_last_set.replace(tzinfo=UTC)
+        if created or pwd_last_set >= ak_user.password_change_date:
+            self._logger.debug(
+                "Reset user's password",
+                user=ak_user.username,
+                created=created,
+                pwd_last_set=pwd_last_set,
+            )
+            ak_user.set_unusable_password()
+            ak_user.save()
+        return True
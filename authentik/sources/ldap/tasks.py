@@ -1,16 +1,31 @@
 """LDAP Sync tasks"""
+from typing import Any, Optional
+
+from celery import chord
 from django.utils.text import slugify
+from django.utils.timezone import now
 from ldap3.core.exceptions import LDAPException
 from structlog.stdlib import get_logger
 
 from authentik.events.monitored_tasks import MonitoredTask, TaskResult, TaskResultStatus
 from authentik.root.celery import CELERY_APP
 from authentik.sources.ldap.models import LDAPSource
+from authentik.sources.ldap.sync.base import (
+    BaseLDAPSynchronizer,
+    get_shard_config,
+    max_high_water_mark,
+    shard_filters,
+)
 from authentik.sources.ldap.sync.groups import GroupLDAPSynchronizer
 from authentik.sources.ldap.sync.membership import MembershipLDAPSynchronizer
 from authentik.sources.ldap.sync.users import UserLDAPSynchronizer
 
 LOGGER = get_logger()
+# Synchronizers which can run concurrently, membership is synced after them
+SHARDED_SYNC_CLASSES = {
+    UserLDAPSynchronizer.__name__: UserLDAPSynchronizer,
+    GroupLDAPSynchronizer.__name__: GroupLDAPSynchronizer,
+}
 
 
 @CELERY_APP.task()
@@ -20,9 +35,69 @@ def ldap_sync_all():
         ldap_sync.delay(source.pk)
 
 
+def sync_shard(
+    source: LDAPSource, sync_class: type[BaseLDAPSynchronizer], **kwargs
+) -> dict[str, Any]:
+    """Run a single synchronizer, and return its results in a serializable form"""
+    sync_inst = sync_class(source, **kwargs)
+    count = sync_inst.sync()
+    return {
+        "sync_class": sync_class.__name__,
+        "count": count,
+        "stats": sync_inst.stats,
+        "mark_key": sync_inst.mark_key,
+        "mark": sync_inst.new_high_water_mark,
+    }
+
+
+@CELERY_APP.task()
+def ldap_sync_shard(
+    source_pk: str, sync_class: str, shard: int, full: bool
+) -> dict[str, Any]:
+    """Sync a single shard of users or groups of an LDAP Source"""
+    source: LDAPSource = LDAPSource.objects.get(pk=source_pk)
+    try:
+        return sync_shard(
+            source,
+            SHARDED_SYNC_CLASSES[sync_class],
+            incremental=not full,
+            shard=shard,
+        )
+    except LDAPException as exc:
+        # Returned instead of raised, so the chord's callback still runs
+        LOGGER.warning("Failed to sync shard", exc=exc, shard=shard)
+        return {"sync_class": sync_class, "error": str(exc)}
+
+
+@CELERY_APP.task()
+def ldap_sync_shards_done(results: list[dict[str, Any]], source_pk: str, full: bool):
+    """Finish a sharded sync once all shards are done"""
+    ldap_sync.delay(source_pk, full=full, shard_results=results)
+
+
+@CELERY_APP.task()
+def ldap_sync_shards_failed(
+    request, exc: Exception, traceback, source_pk: str, full: bool
+):
+    """Report a sharded sync as failed when a shard raised, as the chord's callback
+    doesn't run then"""
+    LOGGER.warning("Failed to sync shards", exc=exc, task=request.id)
+    ldap_sync.delay(
+        source_pk, full=full, shard_results=[{"error": f"Failed to sync shard: {exc}"}]
+    )
+
+
 @CELERY_APP.task(bind=True, base=MonitoredTask)
-def ldap_sync(self: MonitoredTask, source_pk: str):
-    """Synchronization of an LDAP Source"""
+def ldap_sync(
+    self: MonitoredTask,
+    source_pk: str,
+    full: bool = False,
+    shard_results: Optional[list[dict[str, Any]]] = None,
+):
+    """Synchronization of an LDAP Source. Unless `full` is set, sources with
+    incremental syncs only fetch objects which changed since the last sync.
+    With `ldap.sync.shards`, users and groups are synced concurrently in shards,
+    after which this task runs again with `shard_results` to sync memberships."""
     self.result_timeout_hours = 2
     try:
         source: LDAPSource = LDAPSource.objects.get(pk=source_pk)
@@ -31,16 +106,80 @@ def ldap_sync(self: MonitoredTask, source_pk: str):
         # to set the state with
         return
     self.set_uid(slugify(source.name))
+    full = full or source.sync_full
+    shards = len(shard_filters(*get_shard_config()))
+    if shard_results is None and shards > 1:
+        # Not successful yet, the final status is set once all shards are done
+        self.set_status(
+            TaskResult(
+                TaskResultStatus.WARNING,
+                [f"Syncing users and groups in {shards} shards"],
+            )
+        )
+        chord(
+            ldap_sync_shard.s(source.pk, sync_class, shard, full)
+            for sync_class in SHARDED_SYNC_CLASSES
+            for shard in range(shards)
+        )(
+            ldap_sync_shards_done.s(source.pk, full).on_error(
+                ldap_sync_shards_failed.s(source.pk, full)
+            )
+        )
+        return
     try:
-        messages = []
+        if shard_results is None:
+            shard_results = [
+                sync_shard(source, sync_class, incremental=not full)
+                for sync_class in SHARDED_SYNC_CLASSES.values()
+            ]
+        errors = [result["error"] for result in shard_results if "error" in result]
+        if errors:
+            self.set_status(TaskResult(TaskResultStatus.ERROR, errors))
+            return
+        shard_results.append(
+            sync_shard(source, MembershipLDAPSynchronizer, incremental=not full)
+        )
+        messages = [] if full else ["Incremental sync"]
+        marks = dict(source.sync_high_water_marks)
         for sync_class in [
             UserLDAPSynchronizer,
             GroupLDAPSynchronizer,
             MembershipLDAPSynchronizer,
         ]:
-            sync_inst = sync_class(source)
-            count = sync_inst.sync()
-            messages.append(f"Synced {count} objects from {sync_class.__name__}")
+            results = [
+                result
+                for result in shard_results
+                if result["sync_class"] == sync_class.__name__
+            ]
+            counts = [result["count"] for result in results if result["count"] >= 0]
+            count = sum(counts) if counts else -1
+            message = f"Synced {count} objects from {sync_class.__name__}"
+            stats = {
+                key: sum(result["stats"][key] for result in results)
+                for key in ["created", "updated", "unchanged"]
+            }
+            if any(stats.values()):
+                message += (
+                    f" ({stats['created']} created, "
+                    f"{stats['updated']} updated, "
+                    f"{stats['unchanged']} unchanged)"
+                )
+            messages.append(message)
+        for key in {result["mark_key"] for result in shard_results}:
+            mark = max_high_water_mark(
+                *[
+                    result["mark"]
+                    for result in shard_results
+                    if result["mark_key"] == key
+                ]
+            )
+            if mark is not None:
+                marks[key] = mark
+        # Only saved after all objects were synced, so failed syncs are repeated
+        LDAPSource.objects.filter(pk=source.pk).update(
+            sync_high_water_marks=marks,
+            last_full_sync=now() if full else source.last_full_sync,
+        )
         self.set_status(
             TaskResult(
                 TaskResultStatus.SUCCESSFUL,
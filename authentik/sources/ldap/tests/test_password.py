@@ -1,5 +1,5 @@
 """LDAP Source tests"""
-from unittest.mock import PropertyMock, patch
+from unittest.mock import Mock, patch
 
 from django.test import TestCase
 
@@ -10,7 +10,7 @@ from authentik.sources.ldap.password import LDAPPasswordChanger
 from authentik.sources.ldap.tests.mock_ad import mock_ad_connection
 
 LDAP_PASSWORD = generate_client_secret()
-LDAP_CONNECTION_PATCH = PropertyMock(return_value=mock_ad_connection(LDAP_PASSWORD))
+LDAP_CONNECTION_PATCH = Mock(return_value=mock_ad_connection(LDAP_PASSWORD))
 
 
 class LDAPPasswordTests(TestCase):
@@ -27,7 +27,7 @@ class LDAPPasswordTests(TestCase):
         self.source.property_mappings.set(LDAPPropertyMapping.objects.all())
         self.source.save()
 
-    @patch("authentik.sources.ldap.models.LDAPSource.connection", LDAP_CONNECTION_PATCH)
+    @patch("authentik.sources.ldap.models.LDAPSource.connect", LDAP_CONNECTION_PATCH)
     def test_password_complexity(self):
         """Test password without user"""
         pwc = LDAPPasswordChanger(self.source)
@@ -35,7 +35,7 @@ class LDAPPasswordTests(TestCase):
         self.assertFalse(pwc.ad_password_complexity("test1"))  # 2 categories
         self.assertTrue(pwc.ad_password_complexity("test1!"))  # 2 categories
 
-    @patch("authentik.sources.ldap.models.LDAPSource.connection", LDAP_CONNECTION_PATCH)
+    @patch("authentik.sources.ldap.models.LDAPSource.connect", LDAP_CONNECTION_PATCH)
     def test_password_complexity_user(self):
         """test password with user"""
         pwc = LDAPPasswordChanger(self.source)
@@ -0,0 +1,117 @@
+"""LDAP connection pool tests"""
+from unittest.mock import MagicMock, Mock, patch
+
+from django.db.models import Q
+from django.test import TestCase
+from ldap3.core.exceptions import LDAPSocketOpenError
+
+from authentik.core.models import User
+from authentik.managed.manager import ObjectManager
+from authentik.providers.oauth2.generators import generate_client_secret
+from authentik.sources.ldap.auth import LDAPBackend
+from authentik.sources.ldap.models import LDAPPropertyMapping, LDAPSource
+from authentik.sources.ldap.pool import LDAPConnectionPool, get_pools
+from authentik.sources.ldap.sync.users import UserLDAPSynchronizer
+from authentik.sources.ldap.tests.mock_ad import mock_ad_connection
+
+LDAP_PASSWORD = generate_client_secret()
+
+
+class LDAPPoolTests(TestCase):
+    """LDAP connection pool tests"""
+
+    def setUp(self):
+        ObjectManager().run()
+        self.source = LDAPSource.objects.create(
+            name="ldap",
+            slug="ldap",
+            base_dn="dc=goauthentik,dc=io",
+            additional_user_dn="ou=users",
+            additional_group_dn="ou=groups",
+        )
+
+    def _connection(self) -> MagicMock:
+        connection = MagicMock()
+        connection.closed = False
+        return connection
+
+    def test_reuse(self):
+        """Test connections are reused, up to the maximum size"""
+        factory = Mock(side_effect=self._connection)
+        pool = LDAPConnectionPool(factory, max_size=1, idle_timeout=60)
+        with pool.connection() as first:
+            with pool.connection() as second:
+                self.assertNotEqual(first, second)
+        # Only the connection returned first is kept, the other one is closed
+        first.unbind.assert_called_once()
+        with pool.connection() as connection:
+            self.assertEqual(connection, second)
+        self.assertEqual(factory.call_count, 2)
+
+    def test_unhealthy(self):
+        """Test closed, timed out and failed connections are not reused"""
+        pool = LDAPConnectionPool(self._connection, max_size=5, idle_timeout=60)
+        with pool.connection() as connection:
+            pass
+        connection.closed = True
+        with pool.connection() as new_connection:
+            self.assertNotEqual(connection, new_connection)
+        with patch("authentik.sources.ldap.pool.monotonic", Mock(return_value=1e12)):
+            with pool.connection() as timed_out:
+                self.assertNotEqual(timed_out, new_connection)
+        new_connection.unbind.assert_called_once()
+        with self.assertRaises(LDAPSocketOpenError):
+            with pool.connection() as failed:
+                raise LDAPSocketOpenError()
+        failed.unbind.assert_called_once()
+        self.assertEqual(pool._idle, [])
+
+    def test_settings_changed(self):
+        """Test pools are replaced when the connection settings change"""
+        pools = get_pools(self.source)
+        self.assertEqual(get_pools(self.source), pools)
+        self.source.server_uri = "ldap://other"
+        self.assertNotEqual(get_pools(self.source), pools)
+
+    def test_auth_bind(self):
+        """Test binding as users reuses pooled connections"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(name__startswith="authentik default LDAP Mapping")
+                | Q(name__startswith="authentik default Active Directory Mapping")
+            )
+        )
+        self.source.save()
+        connect = Mock(side_effect=lambda *_, **__: mock_ad_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connect):
+            UserLDAPSynchronizer(self.source).sync()
+            user = User.objects.get(username="user0_sn")
+            backend = LDAPBackend()
+            self.assertEqual(
+                backend.auth_user_by_bind(self.source, user, LDAP_PASSWORD), user
+            )
+            self.assertIsNone(backend.auth_user_by_bind(self.source, user, "foo"))
+            self.assertEqual(
+                backend.auth_user_by_bind(self.source, user, LDAP_PASSWORD), user
+            )
+            user.attributes["distinguishedName"] = ""
+            self.assertIsNone(
+                backend.auth_user_by_bind(self.source, user, LDAP_PASSWORD)
+            )
+        # One connection for the sync, and one reused for all binds
+        self.assertEqual(connect.call_count, 2)
+        # Pooled connections don't keep the user's credentials
+        connection = get_pools(self.source).bind.acquire()
+        self.assertEqual(connection.user, "")
+        self.assertIsNone(connection.password)
+
+    def test_reset(self):
+        """Test connections which can't be reset aren't reused"""
+        connection = self._connection()
+        reset = Mock(return_value=False)
+        pool = LDAPConnectionPool(Mock(return_value=connection), 10, 300, reset=reset)
+        with pool.connection():
+            pass
+        reset.assert_called_once_with(connection)
+        connection.unbind.assert_called_once()
+        self.assertEqual(pool._idle, [])
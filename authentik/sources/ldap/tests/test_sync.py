@@ -1,17 +1,30 @@
 """LDAP Source tests"""
-from unittest.mock import PropertyMock, patch
+from datetime import timedelta
+from unittest.mock import Mock, patch
 
+from django.core.cache import cache
 from django.db.models import Q
 from django.test import TestCase
+from django.utils.timezone import now
+from ldap3 import MODIFY_REPLACE
 
+from authentik.core.api.applications import CACHE_VERSION_USER_APPS, user_app_cache_key
 from authentik.core.models import Group, User
+from authentik.events.monitored_tasks import TaskInfo, TaskResultStatus
+from authentik.lib.config import CONFIG
+from authentik.lib.utils.cache import get_version
 from authentik.managed.manager import ObjectManager
 from authentik.providers.oauth2.generators import generate_client_secret
 from authentik.sources.ldap.models import LDAPPropertyMapping, LDAPSource
+from authentik.sources.ldap.sync.base import shard_filters, shard_index
 from authentik.sources.ldap.sync.groups import GroupLDAPSynchronizer
 from authentik.sources.ldap.sync.membership import MembershipLDAPSynchronizer
 from authentik.sources.ldap.sync.users import UserLDAPSynchronizer
-from authentik.sources.ldap.tasks import ldap_sync_all
+from authentik.sources.ldap.tasks import (
+    ldap_sync,
+    ldap_sync_all,
+    ldap_sync_shards_failed,
+)
 from authentik.sources.ldap.tests.mock_ad import mock_ad_connection
 from authentik.sources.ldap.tests.mock_slapd import mock_slapd_connection
 
@@ -40,8 +53,8 @@ class LDAPSyncTests(TestCase):
             )
         )
         self.source.save()
-        connection = PropertyMock(return_value=mock_ad_connection(LDAP_PASSWORD))
-        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+        connection = Mock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connection):
             user_sync = UserLDAPSynchronizer(self.source)
             user_sync.sync()
             self.assertTrue(User.objects.filter(username="user0_sn").exists())
@@ -57,13 +70,70 @@ class LDAPSyncTests(TestCase):
             )
         )
         self.source.save()
-        connection = PropertyMock(return_value=mock_slapd_connection(LDAP_PASSWORD))
-        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+        connection = Mock(return_value=mock_slapd_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connection):
             user_sync = UserLDAPSynchronizer(self.source)
             user_sync.sync()
             self.assertTrue(User.objects.filter(username="user0_sn").exists())
             self.assertFalse(User.objects.filter(username="user1_sn").exists())
 
+    def test_sync_users_bulk(self):
+        """Test user sync in chunks"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        self.source.save()
+        connection = Mock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch(
+            "authentik.sources.ldap.models.LDAPSource.connect", connection
+        ), CONFIG.patch("ldap.sync.bulk", True):
+            with CONFIG.patch("ldap.sync.chunk_size", 2):
+                user_sync = UserLDAPSynchronizer(self.source)
+                user_sync.sync()
+            user = User.objects.get(username="user0_sn")
+            self.assertFalse(user.has_usable_password())
+            self.assertFalse(User.objects.filter(username="user1_sn").exists())
+            self.assertEqual(user_sync.stats["unchanged"], 0)
+
+            user.name = "foo"
+            user.save()
+            cache.set(user_app_cache_key(user.pk), [])
+            user_sync = UserLDAPSynchronizer(self.source)
+            user_sync.sync()
+            self.assertEqual(user_sync.stats["created"], 0)
+            self.assertEqual(user_sync.stats["updated"], 1)
+            self.assertEqual(User.objects.get(pk=user.pk).name, "user0_sn")
+            # Updated users' application caches are cleared without post_save
+            self.assertIsNone(cache.get(user_app_cache_key(user.pk)))
+
+    def test_sync_groups_bulk(self):
+        """Test group sync in chunks"""
+        self.source.property_mappings_group.set(
+            LDAPPropertyMapping.objects.filter(
+                managed="goauthentik.io/sources/ldap/default-name"
+            )
+        )
+        parent = Group.objects.create(name="ldap-parent")
+        self.source.sync_parent_group = parent
+        self.source.save()
+        connection = Mock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch(
+            "authentik.sources.ldap.models.LDAPSource.connect", connection
+        ), CONFIG.patch("ldap.sync.bulk", True):
+            version = get_version(CACHE_VERSION_USER_APPS)
+            group_sync = GroupLDAPSynchronizer(self.source)
+            self.assertEqual(group_sync.sync(), 1)
+            self.assertNotEqual(get_version(CACHE_VERSION_USER_APPS), version)
+            self.assertEqual(group_sync.stats["created"], 1)
+            group = Group.objects.get(name="test-group")
+            self.assertEqual(list(group.ancestors()), [parent, group])
+            group_sync = GroupLDAPSynchronizer(self.source)
+            group_sync.sync()
+            self.assertEqual(group_sync.stats["unchanged"], 1)
+
     def test_sync_groups_ad(self):
         """Test group sync"""
         self.source.property_mappings.set(
@@ -78,8 +148,8 @@ class LDAPSyncTests(TestCase):
             )
         )
         self.source.save()
-        connection = PropertyMock(return_value=mock_ad_connection(LDAP_PASSWORD))
-        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+        connection = Mock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connection):
             group_sync = GroupLDAPSynchronizer(self.source)
             group_sync.sync()
             membership_sync = MembershipLDAPSynchronizer(self.source)
@@ -103,8 +173,8 @@ class LDAPSyncTests(TestCase):
             )
         )
         self.source.save()
-        connection = PropertyMock(return_value=mock_slapd_connection(LDAP_PASSWORD))
-        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+        connection = Mock(return_value=mock_slapd_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connection):
             group_sync = GroupLDAPSynchronizer(self.source)
             group_sync.sync()
             membership_sync = MembershipLDAPSynchronizer(self.source)
@@ -121,8 +191,8 @@ class LDAPSyncTests(TestCase):
             )
         )
         self.source.save()
-        connection = PropertyMock(return_value=mock_ad_connection(LDAP_PASSWORD))
-        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+        connection = Mock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connection):
             ldap_sync_all.delay().get()
 
     def test_tasks_openldap(self):
@@ -136,6 +206,116 @@ class LDAPSyncTests(TestCase):
             )
         )
         self.source.save()
-        connection = PropertyMock(return_value=mock_slapd_connection(LDAP_PASSWORD))
-        with patch("authentik.sources.ldap.models.LDAPSource.connection", connection):
+        connection = Mock(return_value=mock_slapd_connection(LDAP_PASSWORD))
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connection):
             ldap_sync_all.delay().get()
+
+    def test_sync_incremental(self):
+        """Test incremental sync only fetches changed objects"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        self.source.sync_incremental = True
+        self.source.change_tracking_field = "uSNChanged"
+        self.source.save()
+        mock = mock_ad_connection(LDAP_PASSWORD)
+        for usn, dn in enumerate(
+            [
+                "cn=user0,ou=users,dc=goauthentik,dc=io",
+                "cn=user2,ou=users,dc=goauthentik,dc=io",
+            ]
+        ):
+            mock.modify(dn, {"uSNChanged": [(MODIFY_REPLACE, [str(usn + 10)])]})
+        connection = Mock(return_value=mock)
+        with patch("authentik.sources.ldap.models.LDAPSource.connect", connection):
+            ldap_sync.delay(self.source.pk).get()
+            self.source.refresh_from_db()
+            self.assertEqual(self.source.sync_high_water_marks["users"], "11")
+            self.assertIsNotNone(self.source.last_full_sync)
+
+            User.objects.filter(username="user0_sn").update(name="foo")
+            mock.modify(
+                "cn=user2,ou=users,dc=goauthentik,dc=io",
+                {"uSNChanged": [(MODIFY_REPLACE, ["20"])]},
+            )
+            ldap_sync.delay(self.source.pk).get()
+            self.source.refresh_from_db()
+            self.assertEqual(self.source.sync_high_water_marks["users"], "20")
+            self.assertEqual(User.objects.get(username="user0_sn").name, "foo")
+
+            LDAPSource.objects.filter(pk=self.source.pk).update(
+                last_full_sync=now() - timedelta(days=2)
+            )
+            ldap_sync.delay(self.source.pk).get()
+            self.assertEqual(User.objects.get(username="user0_sn").name, "user0_sn")
+
+    def test_track_change(self):
+        """Test numeric high-water marks returned as strings are compared by value"""
+        self.source.change_tracking_field = "uSNChanged"
+        user_sync = UserLDAPSynchronizer(self.source)
+        for usn in ["9", "10", "8"]:
+            user_sync.track_change({"uSNChanged": [usn]})
+        self.assertEqual(user_sync.new_high_water_mark, "10")
+
+    def test_shard_filters(self):
+        """Test shard filters"""
+        self.assertEqual(shard_filters(1, "cn"), [""])
+        filters = shard_filters(3, "cn")
+        self.assertEqual(len(filters), 3)
+        self.assertTrue(filters[0].startswith("(|(cn=A*)(cn=a*)"))
+        self.assertTrue(filters[1].endswith("(cn=9*))"))
+        self.assertTrue(filters[2].startswith("(|(!(cn=*))(&(!(cn=A*))"))
+
+    def test_shard_index(self):
+        """Test that every object is synced by exactly one shard"""
+        self.assertEqual(shard_index(3, "alice"), 0)
+        self.assertEqual(shard_index(3, ["Zoe"]), 1)
+        self.assertEqual(shard_index(3, ["zoe", "alice"]), 0)
+        self.assertEqual(shard_index(3, ["_admin", "zoe"]), 1)
+        self.assertEqual(shard_index(3, ["_admin"]), 2)
+        self.assertEqual(shard_index(3, None), 2)
+        self.assertEqual(shard_index(3, []), 2)
+
+    def test_tasks_sharded(self):
+        """Test sync in shards"""
+        self.source.property_mappings.set(
+            LDAPPropertyMapping.objects.filter(
+                Q(managed__startswith="goauthentik.io/sources/ldap/default")
+                | Q(managed__startswith="goauthentik.io/sources/ldap/ms")
+            )
+        )
+        self.source.property_mappings_group.set(
+            LDAPPropertyMapping.objects.filter(
+                managed="goauthentik.io/sources/ldap/default-name"
+            )
+        )
+        self.source.save()
+        connection = Mock(return_value=mock_ad_connection(LDAP_PASSWORD))
+        with patch(
+            "authentik.sources.ldap.models.LDAPSource.connect", connection
+        ), CONFIG.patch("ldap.sync.shards", 4):
+            ldap_sync.delay(self.source.pk).get()
+        self.assertTrue(User.objects.filter(username="user0_sn").exists())
+        group = Group.objects.get(name="test-group")
+        self.assertEqual(
+            list(group.users.values_list("username", flat=True)), ["user0_sn"]
+        )
+        task = TaskInfo.by_name("ldap_sync_ldap")
+        self.assertEqual(task.result.status, TaskResultStatus.SUCCESSFUL)
+        self.assertIn(
+            "Synced 1 objects from GroupLDAPSynchronizer (1 created, 0 updated, "
+            "0 unchanged)",
+            task.result.messages,
+        )
+
+    def test_tasks_sharded_failed(self):
+        """Test that a failed shard is reported"""
+        ldap_sync_shards_failed(
+            Mock(id="shard"), ValueError("foo"), None, self.source.pk, False
+        )
+        task = TaskInfo.by_name("ldap_sync_ldap")
+        self.assertEqual(task.result.status, TaskResultStatus.ERROR)
+        self.assertEqual(task.result.messages, ["Failed to sync shard: foo"])
@@ -230,6 +230,15 @@ export class OAuth2ProviderFormPage extends ModelForm<OAuth2Provider, number> {
                         </div>
                         <p class="pf-c-form__helper-text">${t`Include User claims from scopes in the id_token, for applications that don't access the userinfo endpoint.`}</p>
                     </ak-form-element-horizontal>
+                    <ak-form-element-horizontal name="statelessTokens">
+                        <div class="pf-c-check">
+                            <input type="checkbox" class="pf-c-check__input" ?checked=${first(this.instance?.statelessTokens, false)}>
+                            <label class="pf-c-check__label">
+                                ${t`Stateless tokens`}
+                            </label>
+                        </div>
+                        <p class="pf-c-form__helper-text">${t`Verify access tokens by their signature instead of looking them up, and cache userinfo claims until the token expires. Deleted tokens are still rejected.`}</p>
+                    </ak-form-element-horizontal>
                     <ak-form-element-horizontal
                         label=${t`Issuer mode`}
                         ?required=${true}
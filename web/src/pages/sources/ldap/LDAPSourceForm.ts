@@ -220,6 +220,29 @@ export class LDAPSourceForm extends ModelForm<LDAPSource, string> {
                         <input type="text" value="${this.instance?.objectUniquenessField || "objectSid"}" class="pf-c-form-control" required>
                         <p class="pf-c-form__helper-text">${t`Field which contains a unique Identifier.`}</p>
                     </ak-form-element-horizontal>
+                    <ak-form-element-horizontal name="syncIncremental">
+                        <div class="pf-c-check">
+                            <input type="checkbox" class="pf-c-check__input" ?checked=${first(this.instance?.syncIncremental, false)}>
+                            <label class="pf-c-check__label">
+                                ${t`Incremental sync`}
+                            </label>
+                        </div>
+                        <p class="pf-c-form__helper-text">${t`Only fetch users and groups which changed since the last successful sync.`}</p>
+                    </ak-form-element-horizontal>
+                    <ak-form-element-horizontal
+                        label=${t`Change tracking field`}
+                        ?required=${true}
+                        name="changeTrackingField">
+                        <input type="text" value="${this.instance?.changeTrackingField || "modifyTimestamp"}" class="pf-c-form-control" required>
+                        <p class="pf-c-form__helper-text">${t`Field which increases when an object changes. For Active Directory, use uSNChanged.`}</p>
+                    </ak-form-element-horizontal>
+                    <ak-form-element-horizontal
+                        label=${t`Full sync interval`}
+                        ?required=${true}
+                        name="syncFullInterval">
+                        <input type="text" value="${this.instance?.syncFullInterval || "days=1"}" class="pf-c-form-control" required>
+                        <p class="pf-c-form__helper-text">${t`Interval after which all objects are synced again with incremental syncs (Format: hours=1;minutes=2;seconds=3).`}</p>
+                    </ak-form-element-horizontal>
                 </div>
             </ak-form-group>
         </form>`;